@@ -1,80 +1,112 @@
 import os
-import pickle
-import google_auth_oauthlib.flow
-import googleapiclient.discovery
-import googleapiclient.http
 from dotenv import load_dotenv
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Import our custom modules
-from enhanced_video_analyzer import SimpleVideoAnalyzer as VideoAnalyzer
+# Import our custom modules (the video analyzer, thumbnail generator, LLM
+# backend and Google API clients import heavy libraries and are loaded on first use)
 from grok_ai import GrokAI
-from thumbnail_generator import ThumbnailGenerator
+from chapter_generator import ChapterGenerator
+from transcriber import Transcriber, build_digest
+from youtube_transport import build_youtube_service, transport_adapter
+from credential_store import get_credential_store
+from quota_ledger import get_quota_ledger, is_quota_error, next_reset
+from bandwidth import get_upload_shaper
+from report_store import get_report_store
+from fingerprint import file_fingerprint
+from video_fingerprint import VideoFingerprint, get_duplicate_index
+from transcode import Transcoder
+import tracing
+import metrics
 
 # Load environment variables
 load_dotenv()
 
-# Scopes (permissions) needed for YouTube upload
-SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
-
 class AIYouTubeUploader:
-    def __init__(self):
-        self.youtube_service = None
-        self.grok_ai = GrokAI()
-        self.thumbnail_generator = ThumbnailGenerator()
+    def __init__(self, channel_id=None):
+        self.channel_id = channel_id
+        self.youtube_services = {}
+        self.quota = get_quota_ledger()
+        self.reports = get_report_store()
+        self._grok_ai = None
+        self._thumbnail_generator = None
+        self.chapter_generator = ChapterGenerator()
+        self.transcriber = Transcriber() if os.getenv('ENABLE_TRANSCRIPTION', 'false').lower() == 'true' else None
+        self.transcoder = Transcoder()
         
-    def get_authenticated_service(self):
-        """Get authenticated YouTube service"""
-        if self.youtube_service:
-            return self.youtube_service
-            
-        credentials = None
-
-        # Token stores user session so you don't have to login every time
-        if os.path.exists("token.pickle"):
-            with open("token.pickle", "rb") as token:
-                credentials = pickle.load(token)
-
-        if not credentials:
-            flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(
-                "credentials.json", SCOPES
-            )
-            # Try different ports in case 8080 is busy
-            ports_to_try = [8080, 8081, 8082, 8083, 8084]
+    def close(self):
+        """Stop the background transcription, transcode and LLM hedging workers"""
+        if self.transcriber:
+            self.transcriber.shutdown()
+        self.transcoder.shutdown()
+        if self._grok_ai is not None:
+            self._grok_ai.shutdown()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    @property
+    def grok_ai(self):
+        if self._grok_ai is None:
+            self._grok_ai = GrokAI()
+        return self._grok_ai
+    
+    @property
+    def thumbnail_generator(self):
+        if self._thumbnail_generator is None:
+            from thumbnail_generator import ThumbnailGenerator
+            self._thumbnail_generator = ThumbnailGenerator()
+        return self._thumbnail_generator
+    
+    def get_authenticated_service(self, project=None):
+        """Get authenticated YouTube service (per API project when several are configured)"""
+        project = project or self.quota.default_project
+        if project in self.youtube_services:
+            return self.youtube_services[project]
+        
+        if transport_adapter() is not None:
+            # An in-process fake API (fake_youtube.py) is installed: no OAuth token needed
             credentials = None
-            
-            for port in ports_to_try:
-                try:
-                    print(f"🔐 Authenticating using port {port}...")
-                    print("📝 Note: If you see 'Google hasn't verified this app' warning:")
-                    print("   1. Click 'Advanced' (bottom left)")
-                    print("   2. Click 'Go to [your project] (unsafe)'")
-                    print("   3. This is normal for development/testing!")
-                    credentials = flow.run_local_server(port=port)
-                    break
-                except OSError as e:
-                    if "10048" in str(e) or "Address already in use" in str(e):
-                        print(f"Port {port} is busy, trying next port...")
-                        continue
-                    else:
-                        raise e
-            
-            if not credentials:
-                raise Exception("Could not authenticate - all ports are busy")
-
-            with open("token.pickle", "wb") as token:
-                pickle.dump(credentials, token)
-
-        self.youtube_service = googleapiclient.discovery.build("youtube", "v3", credentials=credentials)
-        return self.youtube_service
+        else:
+            # Tokens are stored as JSON per channel and refreshed in the background
+            credentials = get_credential_store(project).get_credentials(self.channel_id)
+        self.youtube_services[project] = build_youtube_service(credentials)
+        return self.youtube_services[project]
 
     def analyze_and_generate_content(self, video_file, custom_prompt=None):
         """Analyze video and generate AI content"""
+        analyzer, video_info, analysis_prompt = self._analyze_video(video_file)
+        with tracing.span('generate'):
+            return self._generate_content(video_file, analyzer, video_info, analysis_prompt, custom_prompt)
+    
+    def _analyze_video(self, video_file):
+        """Run the video (and optional transcript) analysis and build the analysis prompt"""
         print("🔍 Analyzing video...")
         
-        # Analyze the video
-        analyzer = VideoAnalyzer(video_file)
-        video_info = analyzer.analyze_video()
+        # Transcription runs in its own process while the visual analysis decodes frames
+        transcript_future = None
+        if self.transcriber:
+            transcript_future = self.transcriber.start_background(video_file)
+            if transcript_future:
+                print("🎙️ Transcribing speech in the background...")
+            else:
+                print("⚠️ faster-whisper not installed - skipping transcription")
+        
+        # Analyze the video, unless incremental_analyzer.py already did while it was recorded
+        from enhanced_video_analyzer import SimpleVideoAnalyzer as VideoAnalyzer
+        from incremental_analyzer import IncrementalAnalyzer
+        analyzer = IncrementalAnalyzer.load_finished(video_file)
+        if analyzer:
+            print("📊 Using the analysis made while the video was being recorded")
+            video_info = analyzer.video_info
+        else:
+            with tracing.span('analyze', video=os.path.basename(video_file)):
+                analyzer = VideoAnalyzer(video_file)
+                video_info = analyzer.analyze_video()
         
         if not video_info:
             raise Exception("Could not analyze video file")
@@ -83,40 +115,59 @@ class AIYouTubeUploader:
         analysis_prompt = analyzer.generate_description_prompt()
         print("📊 Video analysis complete!")
         
-        # Generate AI content
-        print("🤖 Generating AI-powered title...")
-        title_result = self.grok_ai.generate_title(analysis_prompt, custom_prompt)
-        title = title_result['title']
-        
-        print("📝 Generating AI-powered description...")
-        description = self.grok_ai.generate_description(analysis_prompt, title, custom_prompt)
+        if transcript_future:
+            try:
+                transcript = transcript_future.result()
+                digest = build_digest(transcript)
+                if digest:
+                    analysis_prompt += "\n\nSPOKEN CONTENT:\n" + digest
+                video_info['transcript_language'] = transcript.get('language')
+                print(f"🎙️ Transcript ready ({transcript.get('realtime_factor', 0):.1f}x realtime"
+                      f"{', cached' if transcript.get('cached') else ''})")
+            except Exception as e:
+                print(f"⚠️ Transcription failed: {e}")
         
-        print("🏷️ Generating relevant tags...")
-        tags = self.grok_ai.generate_tags(title, description, analysis_prompt)
-        
-        print("🎨 Generating thumbnail concept...")
-        thumbnail_concept = self.grok_ai.generate_thumbnail_concept(analysis_prompt, title)
-        
-        # Generate thumbnail
-        print("🖼️ Creating AI-enhanced thumbnail...")
-        best_frame = analyzer.get_best_thumbnail_frame()
-        
-        if best_frame is not None:
-            thumbnail = self.thumbnail_generator.create_thumbnail(best_frame, title, thumbnail_concept)
-            if thumbnail:
-                thumbnail_path = f"thumbnail_{os.path.splitext(os.path.basename(video_file))[0]}.jpg"
-                self.thumbnail_generator.save_thumbnail(thumbnail, thumbnail_path)
-                print(f"💾 Thumbnail saved as: {thumbnail_path}")
-            else:
-                thumbnail_path = None
-                print("⚠️ Could not create thumbnail from video frame")
-        else:
-            # Create text-only thumbnail as fallback
-            print("📄 Creating text-based thumbnail...")
-            thumbnail = self.thumbnail_generator.create_text_thumbnail(title)
-            thumbnail_path = f"thumbnail_{os.path.splitext(os.path.basename(video_file))[0]}.jpg"
-            self.thumbnail_generator.save_thumbnail(thumbnail, thumbnail_path)
-            print(f"💾 Text thumbnail saved as: {thumbnail_path}")
+        return analyzer, video_info, analysis_prompt
+    
+    def _generate_content(self, video_file, analyzer, video_info, analysis_prompt, custom_prompt=None):
+        """Generate title, description, chapters, tags and thumbnail for one analyzed video"""
+        # Description and thumbnail only need the title, so they are started
+        # from the title stream as soon as the "selected" field arrives
+        print("🤖 Generating AI-powered title...")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            jobs = {}
+            
+            def start_title_dependents(title):
+                jobs['title'] = title
+                jobs['description'] = executor.submit(
+                    tracing.wrap(self.grok_ai.generate_description), analysis_prompt, title, custom_prompt
+                )
+                jobs['thumbnail'] = executor.submit(
+                    tracing.wrap(self._create_thumbnail), analyzer, video_file, analysis_prompt, title
+                )
+            
+            title_result = self.grok_ai.generate_title(
+                analysis_prompt, custom_prompt, on_title=start_title_dependents
+            )
+            title = title_result['title']
+            if jobs.get('title') != title:
+                start_title_dependents(title)
+            
+            print("📝 Generating AI-powered description...")
+            description = jobs['description'].result()
+            
+            chapters = self._build_chapters(video_info)
+            if chapters:
+                print(f"📑 Naming {len(chapters)} chapters from detected shots...")
+                chapter_titles = self.grok_ai.generate_chapter_titles(
+                    self.chapter_generator.summarize_chapters(chapters), title, len(chapters)
+                )
+                description = self._append_chapters(description, chapters, chapter_titles)
+            
+            print("🏷️ Generating relevant tags...")
+            tags = self.grok_ai.generate_tags(title, description, analysis_prompt)
+            
+            thumbnail_path, thumbnail_concept = jobs['thumbnail'].result()
         
         return {
             'title': title,
@@ -126,17 +177,210 @@ class AIYouTubeUploader:
             'thumbnail_concept': thumbnail_concept,
             'title_options': title_result.get('options', []),
             'title_reasoning': title_result.get('reasoning', ''),
+            'time_to_title': title_result.get('time_to_title'),
+            'chapters': chapters,
+            'llm_latency': self.grok_ai.latency_stats(),
             'video_analysis': video_info
         }
     
-    def upload_video_with_ai(self, video_file, custom_prompt=None, category="22", privacy="unlisted"):
-        """Upload video with AI-generated content"""
+    def generate_content_batch(self, video_files, custom_prompt=None, allow_duplicate=False):
+        """Analyze several videos and generate their metadata in shared completions.
+        
+        Returns {video_file: ai_content}. Videos whose batched result is missing
+        or fails validation fall back to the normal per-video calls. Near-duplicates
+        of earlier uploads are kept out of the batch prompt and map to the duplicate
+        result upload_video_with_ai() would return (with 'duplicate': True); one of
+        another video in the same batch is left out and checked again at upload.
+        """
+        analyzed = []
+        items = []
+        contents = {}
+        fingerprints = []  # (video_file, VideoFingerprint) of the videos in the batch prompt
+        for index, video_file in enumerate(video_files, 1):
+            print(f"\n📹 [{index}/{len(video_files)}] {os.path.basename(video_file)}")
+            # Each video's analysis is traced like the analysis inside upload_video_with_ai()
+            with tracing.span('video', video=os.path.basename(video_file), batch=True):
+                analyzer, video_info, analysis_prompt = self._analyze_video(video_file)
+                duplicate = None if allow_duplicate else self._find_near_duplicate(video_file, video_info)
+            if duplicate:
+                contents[video_file] = duplicate
+                continue
+            perceptual = video_info.get('video_fingerprint')
+            if perceptual and not allow_duplicate:
+                fingerprint = VideoFingerprint.from_dict(perceptual)
+                earlier = next((other_file for other_file, other in fingerprints
+                                if get_duplicate_index().same_video(fingerprint, other)), None)
+                if earlier:
+                    # Left to upload_video_with_ai(), which sees the earlier one uploaded by then
+                    print(f"⏭️ Looks like {os.path.basename(earlier)} from this batch - generating nothing for it")
+                    continue
+                fingerprints.append((video_file, fingerprint))
+            chapters = self._build_chapters(video_info)
+            analyzed.append((video_file, analyzer, video_info, analysis_prompt, chapters))
+            items.append({
+                'id': str(index),
+                'analysis': analysis_prompt,
+                'custom_prompt': custom_prompt,
+                'chapter_summaries': self.chapter_generator.summarize_chapters(chapters) if chapters else None,
+                'chapter_count': len(chapters)
+            })
+        
+        if not items:
+            return contents
+        print(f"\n🤖 Generating metadata for {len(items)} videos in batched completions...")
+        calls_before = len(self.grok_ai.usage_log)
+        with tracing.span('generate.batch', videos=len(items)):
+            results = self.grok_ai.generate_batch_metadata(items)
+        
+        for (video_file, analyzer, video_info, analysis_prompt, chapters), item in zip(analyzed, items):
+            result = results.get(item['id'])
+            if result is None:
+                print(f"↪️ {os.path.basename(video_file)}: batched result unusable, generating individually")
+                contents[video_file] = self._generate_content(
+                    video_file, analyzer, video_info, analysis_prompt, custom_prompt
+                )
+                continue
+            
+            description = result['description']
+            if chapters:
+                description = self._append_chapters(description, chapters, result['chapter_titles'])
+            thumbnail_path = self._render_thumbnail(analyzer, video_file, result['title'],
+                                                    result['thumbnail_concept'])
+            contents[video_file] = {
+                'title': result['title'],
+                'description': description,
+                'tags': result['tags'],
+                'thumbnail_path': thumbnail_path,
+                'thumbnail_concept': result['thumbnail_concept'],
+                'title_options': result['options'],
+                'title_reasoning': 'Generated in batch',
+                'chapters': chapters,
+                'llm_latency': self.grok_ai.latency_stats(),
+                'video_analysis': video_info
+            }
+        
+        calls = self.grok_ai.usage_log[calls_before:]
+        total_tokens = sum(c['prompt_tokens'] + c['completion_tokens'] for c in calls)
+        print(f"📦 Batch used {len(calls)} completions and {total_tokens} tokens "
+              f"(~{total_tokens // len(items)} tokens per video)")
+        return contents
+    
+    def _build_chapters(self, video_info):
+        return self.chapter_generator.build_chapters(
+            video_info.get('shots', []), video_info.get('duration')
+        )
+    
+    def _append_chapters(self, description, chapters, chapter_titles):
+        """Append the chapter list, keeping the description under YouTube's 5000 character limit"""
+        chapter_block = "Chapters:\n" + self.chapter_generator.format_chapters(chapters, chapter_titles)
+        return description[:4900 - len(chapter_block)].rstrip() + "\n\n" + chapter_block
+    
+    def _create_thumbnail(self, analyzer, video_file, analysis_prompt, title):
+        """Generate the thumbnail concept and render the thumbnail image"""
+        print("🎨 Generating thumbnail concept...")
+        thumbnail_concept = self.grok_ai.generate_thumbnail_concept(analysis_prompt, title)
+        return self._render_thumbnail(analyzer, video_file, title, thumbnail_concept), thumbnail_concept
+    
+    def _render_thumbnail(self, analyzer, video_file, title, thumbnail_concept):
+        """Render and save the thumbnail image; returns its path or None"""
+        with tracing.span('thumbnail.render', video=os.path.basename(video_file)):
+            print("🖼️ Creating AI-enhanced thumbnail...")
+            best_frame = analyzer.get_best_thumbnail_frame()
+            
+            if best_frame is not None:
+                thumbnail = self.thumbnail_generator.create_thumbnail(best_frame, title, thumbnail_concept)
+                if thumbnail:
+                    thumbnail_path = f"thumbnail_{os.path.splitext(os.path.basename(video_file))[0]}.jpg"
+                    self.thumbnail_generator.save_thumbnail(thumbnail, thumbnail_path)
+                    print(f"💾 Thumbnail saved as: {thumbnail_path}")
+                else:
+                    thumbnail_path = None
+                    print("⚠️ Could not create thumbnail from video frame")
+            else:
+                # Create text-only thumbnail as fallback
+                print("📄 Creating text-based thumbnail...")
+                thumbnail = self.thumbnail_generator.create_text_thumbnail(title)
+                thumbnail_path = f"thumbnail_{os.path.splitext(os.path.basename(video_file))[0]}.jpg"
+                self.thumbnail_generator.save_thumbnail(thumbnail, thumbnail_path)
+                print(f"💾 Text thumbnail saved as: {thumbnail_path}")
+            
+            return thumbnail_path
+    
+    def find_previous_upload(self, video_file):
+        """Summary of an earlier upload of this file's content (from the report store), or None"""
+        matches = self.reports.find_by_fingerprint(file_fingerprint(video_file))
+        return matches[0] if matches else None
+    
+    def upload_video_with_ai(self, video_file, custom_prompt=None, category="22", privacy="unlisted",
+                             ai_content=None, bandwidth_weight=1.0, allow_duplicate=False):
+        """Upload video with AI-generated content (pass ai_content to reuse pre-generated metadata).
+        
+        bandwidth_weight sets this upload's share of the shared upload bandwidth. A file
+        that was already uploaded is skipped (the earlier upload is returned, with
+        'duplicate': True) unless allow_duplicate is set.
+        """
+        # Every stage of this video is traced under one root span
+        with tracing.span('video', video=os.path.basename(video_file)):
+            return self._upload_video_with_ai(video_file, custom_prompt, category, privacy,
+                                              ai_content, bandwidth_weight, allow_duplicate)
+    
+    def _upload_video_with_ai(self, video_file, custom_prompt, category, privacy, ai_content,
+                              bandwidth_weight, allow_duplicate):
+        # Re-exports of a published file would waste quota, LLM calls and bandwidth
+        fingerprint = file_fingerprint(video_file)
+        previous = self.reports.find_by_fingerprint(fingerprint)
+        if previous and not allow_duplicate:
+            previous = previous[0]
+            print(f"⏭️ {os.path.basename(video_file)} was already uploaded on {previous['uploaded_at'][:19]}: "
+                  f"https://youtube.com/watch?v={previous['video_id']}")
+            print("   Use allow_duplicate=True (--allow-duplicate) to upload it again")
+            report = self.reports.get(previous['video_id']) or {}
+            return {
+                'video_id': previous['video_id'],
+                'video_url': f"https://youtube.com/watch?v={previous['video_id']}",
+                'ai_content': report.get('ai_generated_content', {}),
+                'duplicate': True
+            }
+        
+        # Reserve the insert quota up front, on the first project that can afford
+        # it, so no AI work or upload bandwidth is spent on a call that would be rejected
+        project = self.quota.reserve('videos.insert', self.channel_id)
+        if project is None:
+            print(f"⏸️ Not enough YouTube API quota left today - deferring {os.path.basename(video_file)} "
+                  f"until {next_reset():%Y-%m-%d %H:%M %Z}")
+            return None
+        upload_started = False
+        transcode_future = None
+        
         try:
+            import googleapiclient.http
+            from media_source import MmapMediaUpload, detect_mimetype
+            
             # Get YouTube service
-            youtube = self.get_authenticated_service()
+            youtube = self.get_authenticated_service(project)
             
-            # Generate AI content
-            ai_content = self.analyze_and_generate_content(video_file, custom_prompt)
+            # Generate AI content; the near-duplicate check runs between analysis and
+            # the LLM calls, since the fingerprint comes out of the analysis decode pass
+            if ai_content is None:
+                analyzer, video_info, analysis_prompt = self._analyze_video(video_file)
+                duplicate = None if allow_duplicate else self._find_near_duplicate(video_file, video_info)
+                if duplicate:
+                    self.quota.refund('videos.insert', self.channel_id, project)
+                    return duplicate
+                # ffmpeg shrinks the file while the LLM calls are in flight
+                transcode_future = self._start_transcode(video_file, video_info)
+                generate_started = time.perf_counter()
+                with tracing.span('generate'):
+                    ai_content = self._generate_content(video_file, analyzer, video_info,
+                                                        analysis_prompt, custom_prompt)
+                self.transcoder.stats.record('generate_seconds', time.perf_counter() - generate_started)
+            else:
+                if not allow_duplicate:
+                    duplicate = self._find_near_duplicate(video_file, ai_content.get('video_analysis') or {})
+                    if duplicate:
+                        self.quota.refund('videos.insert', self.channel_id, project)
+                        return duplicate
+                transcode_future = self._start_transcode(video_file, ai_content.get('video_analysis') or {})
             
             print("\n" + "="*60)
             print("🚀 AI-GENERATED CONTENT PREVIEW")
@@ -149,6 +393,17 @@ class AIYouTubeUploader:
                 print(f"💡 Alternative Titles: {', '.join(ai_content['title_options'])}")
             print("="*60)
             
+            transcode = None
+            upload_file = video_file
+            if transcode_future:
+                transcode = transcode_future.result()
+                upload_file = transcode['path']
+                if transcode['action'] == 'encode':
+                    print(f"🗜️ Re-encode saved {transcode['saved_bytes'] / 1024 ** 2:.1f} MB "
+                          f"of upload in {transcode['seconds']:.1f}s")
+                elif transcode['action'] == 'remux':
+                    print(f"🗜️ Moved the MP4 index to the front in {transcode['seconds']:.1f}s")
+            
             # Prepare video metadata
             video_metadata = {
                 "snippet": {
@@ -166,40 +421,71 @@ class AIYouTubeUploader:
             print("⬆️ Uploading video to YouTube...")
             print("⏳ This may take several minutes depending on file size and connection speed...")
             
-            # Use resumable upload for better reliability with large files
-            media = googleapiclient.http.MediaFileUpload(
-                video_file,
+            # Use resumable upload for better reliability with large files; chunks are
+            # zero-copy slices of a memory map and the mimetype comes from the file itself
+            media = MmapMediaUpload(
+                upload_file,
                 chunksize=10 * 1024 * 1024,  # 10MB chunks
-                resumable=True,
-                mimetype='video/mp4'
+                resumable=True
             )
             
-            request = youtube.videos().insert(
-                part="snippet,status",
-                body=video_metadata,
-                media_body=media
-            )
+            try:
+                request = youtube.videos().insert(
+                    part="snippet,status",
+                    body=video_metadata,
+                    media_body=media
+                )
             
-            # Execute with progress tracking
-            response = None
-            retry_count = 0
-            max_retries = 3
+                # Execute with progress tracking
+                response = None
+                retry_count = 0
+                max_retries = 3
             
-            while response is None:
-                try:
-                    status, response = request.next_chunk()
-                    if status:
-                        file_size = os.path.getsize(video_file)
-                        progress = int(status.progress() * 100)
-                        print(f"  ⏳ Upload progress: {progress}%", end='\r')
-                except Exception as e:
-                    retry_count += 1
-                    if retry_count <= max_retries:
-                        print(f"\n  ⚠️ Upload interrupted, retrying ({retry_count}/{max_retries})...")
-                        continue
-                    else:
-                        raise Exception(f"Upload failed after {max_retries} retries: {e}")
+                # Waits for a free upload slot; chunk bodies are paced by the shared bandwidth budget
+                with get_upload_shaper().job(os.path.basename(video_file), bandwidth_weight) as upload_job, \
+                        tracing.span('upload', bytes=media.size(), mimetype=media.mimetype()) as upload_span:
+                    upload_started = True
+                    upload_clock = time.perf_counter()
+                    while response is None:
+                        try:
+                            with tracing.span('upload.chunk') as chunk_span:
+                                sent_before = request.resumable_progress
+                                status, response = request.next_chunk()
+                                sent_after = media.size() if response is not None else request.resumable_progress
+                                chunk_span.set('bytes', sent_after - sent_before)
+                            if status:
+                                progress = int(status.progress() * 100)
+                                print(f"  ⏳ Upload progress: {progress}%", end='\r')
+                        except Exception as e:
+                            if is_quota_error(e):
+                                self.quota.mark_exhausted(project)
+                                raise
+                            retry_count += 1
+                            if retry_count <= max_retries:
+                                metrics.UPLOAD_RETRIES.inc(error_class=metrics.error_class(e))
+                                print(f"\n  ⚠️ Upload interrupted, retrying ({retry_count}/{max_retries})...")
+                                continue
+                            else:
+                                raise Exception(f"Upload failed after {max_retries} retries: {e}")
+                    upload_span.set('retries', retry_count)
+                    upload_span.set('throttled_seconds', round(upload_job.throttled_seconds, 3))
+                    upload_seconds = time.perf_counter() - upload_clock
+            finally:
+                # Unmaps the file even when the upload fails
+                media.close()
+            # Throughput as seen by this upload (including any bandwidth limit) drives later transcode decisions
+            self.transcoder.stats.record('upload_bytes_per_second', media.size() / upload_seconds)
+            if transcode:
+                self.transcoder.remove_output(transcode)
+                transcode['upload_seconds'] = round(upload_seconds, 2)
+                if transcode['saved_bytes'] > 0:
+                    # Upload time saved minus the encode time AI generation didn't hide
+                    exposed = max(0.0, transcode['seconds'] - self.transcoder.stats.get('generate_seconds'))
+                    transcode['net_seconds_saved'] = round(
+                        transcode['saved_bytes'] / (media.size() / upload_seconds) - exposed, 1)
             
+            if upload_job.throttled_seconds >= 1:
+                print(f"\n🎚️ Bandwidth limit paced this upload for {upload_job.throttled_seconds:.0f}s")
             print("\n✅ Video upload successful!")
             video_id = response["id"]
             
@@ -208,20 +494,33 @@ class AIYouTubeUploader:
             print(f"🔗 Video URL: https://youtube.com/watch?v={video_id}")
             
             # Upload thumbnail if generated
-            if ai_content['thumbnail_path'] and os.path.exists(ai_content['thumbnail_path']):
+            thumbnail_path = ai_content['thumbnail_path']
+            if thumbnail_path and os.path.exists(thumbnail_path) and \
+                    not self.quota.reserve('thumbnails.set', self.channel_id, project=project):
+                print("⚠️ Skipping custom thumbnail - not enough API quota left today")
+                thumbnail_path = None
+            if thumbnail_path and os.path.exists(thumbnail_path):
                 try:
                     print("🖼️ Uploading custom thumbnail...")
                     thumbnail_request = youtube.thumbnails().set(
                         videoId=video_id,
-                        media_body=googleapiclient.http.MediaFileUpload(ai_content['thumbnail_path'])
+                        media_body=googleapiclient.http.MediaFileUpload(
+                            thumbnail_path, mimetype=detect_mimetype(thumbnail_path)
+                        )
                     )
-                    thumbnail_response = thumbnail_request.execute()
+                    with tracing.span('thumbnail.set', bytes=os.path.getsize(thumbnail_path)):
+                        thumbnail_response = thumbnail_request.execute()
                     print("✅ Custom thumbnail uploaded successfully!")
                 except Exception as e:
+                    if is_quota_error(e):
+                        self.quota.mark_exhausted(project)
                     print(f"⚠️ Thumbnail upload failed: {e}")
             
             # Save upload report
-            self.save_upload_report(video_file, video_id, ai_content)
+            self.save_upload_report(video_file, video_id, ai_content, fingerprint, transcode)
+            perceptual = (ai_content.get('video_analysis') or {}).get('video_fingerprint')
+            if perceptual:
+                get_duplicate_index().add(video_id, VideoFingerprint.from_dict(perceptual))
             
             return {
                 'video_id': video_id,
@@ -230,6 +529,12 @@ class AIYouTubeUploader:
             }
             
         except Exception as e:
+            if not upload_started:
+                # The insert never reached YouTube, so its reserved quota is unused
+                self.quota.refund('videos.insert', self.channel_id, project)
+            if transcode_future:
+                transcode_future.add_done_callback(
+                    lambda future: future.exception() or self.transcoder.remove_output(future.result()))
             print(f"\n❌ Upload failed: {e}")
             print("\n💡 Troubleshooting tips:")
             print("  • Check your internet connection")
@@ -241,8 +546,40 @@ class AIYouTubeUploader:
             traceback.print_exc()
             return None
     
-    def save_upload_report(self, video_file, video_id, ai_content):
-        """Save detailed upload report"""
+    def _start_transcode(self, video_file, video_info):
+        """Start the optional remux/re-encode (see transcode.py); returns a Future or None"""
+        if not self.transcoder.enabled:
+            return None
+        # A bandwidth limit caps what an upload can achieve, whatever was measured before
+        limit = get_upload_shaper().limiter.current_rate()
+        measured = self.transcoder.stats.get('upload_bytes_per_second')
+        return self.transcoder.start_background(video_file, video_info, min(limit, measured) if limit else None)
+    
+    def _find_near_duplicate(self, video_file, video_info):
+        """Duplicate result for a re-encode/re-export of an uploaded video, or None"""
+        perceptual = video_info.get('video_fingerprint')
+        if not perceptual:
+            return None
+        with tracing.span('dedupe') as dedupe_span:
+            matches = get_duplicate_index().find_similar(VideoFingerprint.from_dict(perceptual))
+            dedupe_span.set('matches', len(matches))
+        if not matches:
+            return None
+        video_id, bits = matches[0]
+        print(f"⏭️ {os.path.basename(video_file)} looks like an earlier upload ({bits} bits/frame apart): "
+              f"https://youtube.com/watch?v={video_id}")
+        print("   Use allow_duplicate=True (--allow-duplicate) to upload it anyway")
+        report = self.reports.get(video_id) or {}
+        return {
+            'video_id': video_id,
+            'video_url': f"https://youtube.com/watch?v={video_id}",
+            'ai_content': report.get('ai_generated_content', {}),
+            'duplicate': True,
+            'near_duplicate': True
+        }
+    
+    def save_upload_report(self, video_file, video_id, ai_content, fingerprint=None, transcode=None):
+        """Save detailed upload report to the report store (and a JSON file if UPLOAD_REPORT_FILES=true)"""
         # Convert numpy arrays and int64 to JSON-serializable types
         def convert_to_serializable(obj):
             if hasattr(obj, 'tolist'):  # numpy arrays
@@ -265,6 +602,8 @@ class AIYouTubeUploader:
         
         report = {
             'video_file': video_file,
+            'fingerprint': fingerprint or file_fingerprint(video_file),
+            'channel_id': self.channel_id,
             'video_id': video_id,
             'video_url': f"https://youtube.com/watch?v={video_id}",
             'upload_timestamp': str(__import__('datetime').datetime.now()),
@@ -275,47 +614,96 @@ class AIYouTubeUploader:
                 'thumbnail_path': ai_content['thumbnail_path'],
                 'title_options': ai_content.get('title_options', []),
                 'title_reasoning': ai_content.get('title_reasoning', ''),
+                'chapters': ai_content.get('chapters', []),
                 'thumbnail_concept': ai_content.get('thumbnail_concept', '')
             },
+            'llm_latency': ai_content.get('llm_latency', {}),
+            # Per-stage durations and bytes from the trace of this upload
+            'timings': tracing.summarize(tracing.current_span()),
             'video_analysis': clean_analysis
         }
+        if transcode:
+            # What the pre-upload stage did and what it saved (see transcode.py)
+            report['transcode'] = {key: value for key, value in transcode.items() if key != 'path'}
         
-        report_filename = f"upload_report_{video_id}.json"
         try:
-            with open(report_filename, 'w', encoding='utf-8') as f:
-                json.dump(report, f, indent=2, ensure_ascii=False)
-            print(f"📊 Upload report saved: {report_filename}")
+            # Round-trip through JSON so numpy values are stored as plain numbers
+            report = json.loads(json.dumps(report, ensure_ascii=False, default=convert_to_serializable))
+            self.reports.add(report)
+            print(f"📊 Upload report saved to {self.reports.path} "
+                  f"(python report_store.py show {video_id})")
         except Exception as e:
             print(f"⚠️ Could not save report: {e}")
+        
+        if os.getenv('UPLOAD_REPORT_FILES', 'false').lower() == 'true':
+            report_filename = f"upload_report_{video_id}.json"
+            try:
+                with open(report_filename, 'w', encoding='utf-8') as f:
+                    json.dump(report, f, indent=2, ensure_ascii=False, default=convert_to_serializable)
+                print(f"📊 Upload report saved: {report_filename}")
+            except Exception as e:
+                print(f"⚠️ Could not save report: {e}")
 
 def main():
     """Main function for standalone usage"""
-    # Initialize uploader
-    uploader = AIYouTubeUploader()
+    import argparse
     
-    # Example usage
-    video_file = "test_video.mp4"  # Change this to your video file
-    custom_prompt = "This is an educational video about technology"  # Optional: provide context
+    parser = argparse.ArgumentParser(description="AI-powered YouTube upload")
+    parser.add_argument("video_file", nargs="?", default="test_video.mp4",
+                        help="video to upload (default: test_video.mp4)")
+    parser.add_argument("--prompt", default="This is an educational video about technology",
+                        help="optional context for the AI")
+    parser.add_argument("--privacy", default="public", choices=["public", "unlisted", "private"])
+    parser.add_argument("--channel", help="channel ID whose stored token to use (see credential_store.py)")
+    parser.add_argument("--allow-duplicate", action="store_true",
+                        help="upload even if this file was uploaded before")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="generate title, description, tags and thumbnail without uploading")
+    parser.add_argument("--analyze-only", action="store_true",
+                        help="only print what the analyzer sees (no AI calls, no upload)")
+    args = parser.parse_args()
+    
+    video_file = args.video_file
+    custom_prompt = args.prompt
     
     if not os.path.exists(video_file):
         print(f"❌ Video file not found: {video_file}")
         return
     
-    print("🤖 Starting AI-Powered YouTube Upload...")
-    print(f"📁 Video file: {video_file}")
+    # Initialize uploader (close() stops its background workers)
+    with AIYouTubeUploader(channel_id=args.channel) as uploader:
+        if args.analyze_only:
+            analyzer, video_info, analysis_prompt = uploader._analyze_video(video_file)
+            print("\n" + analysis_prompt)
+            return
+    
+        if args.dry_run:
+            print("🧪 Dry run - nothing will be uploaded")
+            ai_content = uploader.analyze_and_generate_content(video_file, custom_prompt)
+            print(f"\n📹 Title: {ai_content['title']}")
+            print(f"📝 Description:\n{ai_content['description']}")
+            print(f"🏷️ Tags: {', '.join(ai_content['tags'])}")
+            print(f"🎨 Thumbnail: {ai_content['thumbnail_path']}")
+            return
     
-    result = uploader.upload_video_with_ai(
-        video_file=video_file,
-        custom_prompt=custom_prompt,
-        category="22",  # People & Blogs
-        privacy="public"  # Change to "public", "private", or "unlisted"
-    )
+        print("🤖 Starting AI-Powered YouTube Upload...")
+        print(f"📁 Video file: {video_file}")
     
-    if result:
-        print("\n🎉 Upload completed successfully!")
-        print(f"🎬 Your video is now live at: {result['video_url']}")
-    else:
-        print("\n❌ Upload failed. Please check the errors above.")
+        result = uploader.upload_video_with_ai(
+            video_file=video_file,
+            custom_prompt=custom_prompt,
+            category="22",  # People & Blogs
+            privacy=args.privacy,  # "public", "private", or "unlisted"
+            allow_duplicate=args.allow_duplicate
+        )
+    
+        if result and result.get('duplicate'):
+            print(f"\n⏭️ Nothing uploaded - this video is already at: {result['video_url']}")
+        elif result:
+            print("\n🎉 Upload completed successfully!")
+            print(f"🎬 Your video is now live at: {result['video_url']}")
+        else:
+            print("\n❌ Upload failed. Please check the errors above.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
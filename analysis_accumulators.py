@@ -0,0 +1,275 @@
+"""
+Mergeable accumulators for per-frame video metrics.
+
+Each metric keeps a fixed-size summary instead of a list of samples:
+running count/mean/M2/min/max (Welford), summed histograms in NumPy
+buffers, and a bounded top-K heap. Memory per metric stays constant however
+many frames are sampled, and any two accumulators of the same kind can be
+merged (Chan et al.'s parallel variance formula for the statistics), so
+partial results from segments, worker processes or incremental runs combine
+into the same summary a single pass would have produced. to_dict()/from_dict()
+round-trip through JSON.
+"""
+
+import heapq
+import math
+import time
+
+import cv2
+import numpy as np
+
+
+class RunningStats:
+    """Count, mean, variance (via M2), min and max of a stream of numbers"""
+
+    __slots__ = ('count', 'mean', 'm2', 'minimum', 'maximum')
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=math.inf, maximum=-math.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def add(self, value):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def add_array(self, values):
+        """Add many values at once (vectorized, then merged)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size:
+            mean = float(values.mean())
+            self.merge(RunningStats(int(values.size), mean, float(((values - mean) ** 2).sum()),
+                                    float(values.min()), float(values.max())))
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+        else:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance (np.var of the samples)"""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        if not self.count:
+            return {'count': 0}
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2,
+                'min': self.minimum, 'max': self.maximum}
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data or not data.get('count'):
+            return cls()
+        return cls(data['count'], data['mean'], data['m2'], data['min'], data['max'])
+
+
+class HistogramSum:
+    """Element-wise sum of same-shaped histograms and how many were added"""
+
+    __slots__ = ('counts', 'samples')
+
+    def __init__(self, bins=512, counts=None, samples=0):
+        self.counts = np.zeros(bins, dtype=np.float64) if counts is None else \
+            np.asarray(counts, dtype=np.float64)
+        self.samples = samples
+
+    def add(self, histogram):
+        self.counts += np.asarray(histogram, dtype=np.float64).ravel()
+        self.samples += 1
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.samples += other.samples
+        return self
+
+    def mean(self):
+        """The average histogram per added sample"""
+        return self.counts / self.samples if self.samples else self.counts.copy()
+
+    def to_dict(self):
+        return {'counts': self.counts.tolist(), 'samples': self.samples}
+
+    @classmethod
+    def from_dict(cls, data, bins=512):
+        if not data:
+            return cls(bins)
+        return cls(len(data['counts']), data['counts'], data['samples'])
+
+
+class TopK:
+    """The k highest-scoring keys (e.g. frame timestamps), with optional in-memory payloads"""
+
+    __slots__ = ('k', '_heap', '_payloads')
+
+    def __init__(self, k=5, items=None):
+        self.k = k
+        self._heap = []  # min-heap of (score, key)
+        self._payloads = {}
+        for score, key in items or ():
+            self.add(score, key)
+
+    def accepts(self, score):
+        return len(self._heap) < self.k or score > self._heap[0][0]
+
+    def add(self, score, key, payload=None):
+        """Offer an item; returns True if it is among the top k now (each key is kept once)"""
+        for index, (kept_score, kept_key) in enumerate(self._heap):
+            if kept_key == key:
+                # Overlapping parts report the same frame: keep its best score
+                if score > kept_score:
+                    self._heap[index] = (score, key)
+                    heapq.heapify(self._heap)
+                if payload is not None:
+                    self._payloads.setdefault(key, payload)
+                return True
+        if not self.accepts(score):
+            return False
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (score, key))
+        else:
+            _, dropped = heapq.heapreplace(self._heap, (score, key))
+            self._payloads.pop(dropped, None)
+        if payload is not None:
+            self._payloads[key] = payload
+        return True
+
+    def merge(self, other):
+        for score, key in other._heap:
+            self.add(score, key, other._payloads.get(key))
+        return self
+
+    def items(self):
+        """[(score, key)], highest score first"""
+        return sorted(self._heap, reverse=True)
+
+    def keys(self):
+        """The kept keys in ascending order (timestamps: chronological)"""
+        return sorted(key for _, key in self._heap)
+
+    def payload(self, key):
+        return self._payloads.get(key)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def to_dict(self):
+        return {'k': self.k, 'items': [list(item) for item in self._heap]}
+
+    @classmethod
+    def from_dict(cls, data, k=5):
+        if not data:
+            return cls(k)
+        return cls(data['k'], [tuple(item) for item in data['items']])
+
+
+class FrameMetrics:
+    """Brightness, motion, colour, text and thumbnail-candidate accumulators for sampled frames"""
+
+    __slots__ = ('brightness', 'motion', 'colors', 'text_frames', 'key_frames', 'seconds', '_previous_gray')
+
+    def __init__(self, key_frame_count=5):
+        self.brightness = RunningStats()
+        self.motion = RunningStats()
+        self.colors = HistogramSum(512)
+        self.text_frames = 0
+        self.key_frames = TopK(key_frame_count)
+        # Time spent per metric, for trace spans (not serialized)
+        self.seconds = {'brightness': 0.0, 'motion': 0.0, 'color': 0.0, 'text': 0.0, 'key_frames': 0.0}
+        self._previous_gray = None
+
+    def add_frame(self, frame, timestamp, keep_key_frames=False):
+        """Fold one sampled BGR frame in; motion is measured against the previous add_frame call.
+
+        With keep_key_frames the RGB pixels of the top-K frames are kept in
+        memory, otherwise only their timestamps.
+        """
+        clock = time.perf_counter
+        started = clock()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        brightness = float(np.mean(gray))
+        self.brightness.add(brightness)
+
+        checkpoint = clock()
+        self.seconds['brightness'] += checkpoint - started
+        previous = self._previous_gray
+        if previous is not None and previous.shape == gray.shape:
+            self.motion.add(float(np.mean(cv2.absdiff(previous, gray))))
+        self._previous_gray = gray
+
+        started = clock()
+        self.seconds['motion'] += started - checkpoint
+        self.colors.add(cv2.calcHist([frame], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256]))
+
+        checkpoint = clock()
+        self.seconds['color'] += checkpoint - started
+        edges = cv2.Canny(gray, 50, 150)
+        if np.sum(edges) > gray.shape[0] * gray.shape[1] * 10:  # Many edges might indicate text
+            self.text_frames += 1
+
+        started = clock()
+        self.seconds['text'] += started - checkpoint
+        # Thumbnail candidates: sharp frames, with black or blown-out ones only as a last resort
+        score = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        if not 40 <= brightness <= 220:
+            score *= 0.01
+        if self.key_frames.accepts(score):
+            payload = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if keep_key_frames else None
+            self.key_frames.add(score, round(timestamp, 3), payload)
+        self.seconds['key_frames'] += clock() - started
+
+    def merge(self, other):
+        """Combine with metrics of another part of the video (motion across the seam is not counted)"""
+        self.brightness.merge(other.brightness)
+        self.motion.merge(other.motion)
+        self.colors.merge(other.colors)
+        self.text_frames += other.text_frames
+        self.key_frames.merge(other.key_frames)
+        for metric, seconds in other.seconds.items():
+            self.seconds[metric] = self.seconds.get(metric, 0.0) + seconds
+        return self
+
+    @property
+    def frames(self):
+        return self.brightness.count
+
+    def to_dict(self):
+        return {
+            'brightness': self.brightness.to_dict(),
+            'motion': self.motion.to_dict(),
+            'colors': self.colors.to_dict(),
+            'text_frames': self.text_frames,
+            'key_frames': self.key_frames.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data, key_frame_count=5):
+        metrics = cls(key_frame_count)
+        if data:
+            metrics.brightness = RunningStats.from_dict(data['brightness'])
+            metrics.motion = RunningStats.from_dict(data['motion'])
+            metrics.colors = HistogramSum.from_dict(data['colors'])
+            metrics.text_frames = data['text_frames']
+            metrics.key_frames = TopK.from_dict(data['key_frames'], key_frame_count)
+        return metrics
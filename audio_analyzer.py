@@ -0,0 +1,227 @@
+import heapq
+import shutil
+import subprocess
+import tempfile
+import numpy as np
+
+
+class AudioTotals:
+    """Running sums of AudioAnalyzer's block features; round-trips through JSON"""
+
+    def __init__(self, bins, data=None):
+        self.bins = bins
+        self.load(data or {})
+
+    def load(self, data):
+        """Replace the totals with a to_dict() snapshot"""
+        self.blocks = data.get('blocks', 0)
+        self.silent_blocks = data.get('silent_blocks', 0)
+        self.sum_square = data.get('sum_square', 0.0)
+        self.low_energy_sum = data.get('low_energy_sum', 0.0)
+        self.zcr_sum = data.get('zcr_sum', 0.0)
+        self.zcr_square_sum = data.get('zcr_square_sum', 0.0)
+        self.loudness_hist = np.zeros(self.bins, dtype=np.int64)
+        for index, count in data.get('loudness', {}).items():
+            self.loudness_hist[int(index)] = count
+        self.loudest = [tuple(entry) for entry in data.get('loudest', [])]  # min-heap of (rms_db, timestamp)
+        heapq.heapify(self.loudest)
+
+    def to_dict(self):
+        return {
+            'blocks': self.blocks,
+            'silent_blocks': self.silent_blocks,
+            'sum_square': self.sum_square,
+            'low_energy_sum': self.low_energy_sum,
+            'zcr_sum': self.zcr_sum,
+            'zcr_square_sum': self.zcr_square_sum,
+            # Sparse: most of the 0.1 dB bins stay empty
+            'loudness': {str(i): int(self.loudness_hist[i]) for i in np.flatnonzero(self.loudness_hist)},
+            'loudest': [list(entry) for entry in self.loudest]
+        }
+
+
+class AudioAnalyzer:
+    """Stream a video's audio track as mono PCM through ffmpeg and summarize it.
+
+    Audio is read in fixed-size blocks and reduced to running sums, a fixed
+    loudness histogram and a small heap of loud moments, so memory stays
+    constant no matter how long the file is.
+    """
+
+    SILENCE_DBFS = -50.0
+    LOUDNESS_BINS = np.arange(-70.0, 0.1, 0.1)  # 0.1 dB histogram for gated loudness
+
+    def __init__(self, video_path, sample_rate=16000, block_seconds=0.4, loud_moments=5):
+        self.video_path = video_path
+        self.sample_rate = sample_rate
+        self.block_samples = int(sample_rate * block_seconds)
+        self.block_seconds = block_seconds
+        self.loud_moments = loud_moments
+        self.ffmpeg_path = shutil.which('ffmpeg')
+
+    def analyze_audio(self):
+        """Decode the audio track block by block and return a summary dict"""
+        totals = AudioTotals(len(self.LOUDNESS_BINS))
+        if not self.accumulate(totals):
+            return None
+        return self.summarize(totals)
+
+    def accumulate(self, totals, until=None, final=True):
+        """Fold the audio after the blocks already in totals into it; False if ffmpeg failed.
+
+        Decoding starts at the end of the last block seen (ffmpeg -ss), so a
+        growing file can be analyzed piecewise. until stops at a timestamp;
+        with final=False a trailing partial block is left for the next call.
+        A failed run leaves totals as they were, so it can be retried.
+        """
+        if not self.ffmpeg_path:
+            print("⚠️ ffmpeg not found - skipping audio analysis")
+            return False
+
+        start = totals.blocks * self.block_seconds
+        command = [self.ffmpeg_path, '-v', 'error', '-nostdin']
+        if start:
+            command += ['-ss', f"{start:.3f}"]
+        command += ['-i', self.video_path]
+        if until is not None:
+            if until <= start:
+                return True
+            command += ['-t', f"{until - start:.3f}"]
+        command += ['-vn', '-ac', '1', '-ar', str(self.sample_rate), '-f', 's16le', '-']
+
+        # stderr goes to a file: a pipe nobody reads could fill up and stall ffmpeg
+        with tempfile.TemporaryFile() as errors:
+            try:
+                process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+            except OSError as e:
+                print(f"Error starting ffmpeg for audio analysis: {e}")
+                return False
+
+            checkpoint = totals.to_dict()
+            try:
+                self._read_blocks(process.stdout, totals, final)
+            except BaseException:
+                process.kill()
+                raise
+            finally:
+                process.stdout.close()
+                process.wait()
+
+            if process.returncode != 0:
+                errors.seek(0)
+                message = errors.read().decode('utf-8', 'replace').strip()
+                if totals.blocks == 0 and 'does not contain any stream' in message:
+                    return True  # no audio track: summarizes as has_audio False
+                totals.load(checkpoint)
+                reason = message.splitlines()[-1] if message else f"ffmpeg exited with status {process.returncode}"
+                print(f"⚠️ Audio analysis failed: {reason}")
+                return False
+        return True
+
+    def _read_blocks(self, stream, totals, final):
+        """Reduce the PCM on stream block by block into totals"""
+        block_bytes = self.block_samples * 2
+        min_bytes = block_bytes // 4 if final else block_bytes
+        loudest = totals.loudest
+
+        while True:
+            data = stream.read(block_bytes)
+            if len(data) < min_bytes:
+                break
+
+            samples = np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+            samples = samples.astype(np.float32) / 32768.0
+            mean_square = float(np.mean(samples * samples))
+            rms_db = 10 * np.log10(mean_square + 1e-12)
+            timestamp = totals.blocks * self.block_seconds
+            totals.blocks += 1
+
+            totals.sum_square += mean_square
+            if rms_db < self.SILENCE_DBFS:
+                totals.silent_blocks += 1
+                continue
+
+            if rms_db >= self.LOUDNESS_BINS[0]:
+                totals.loudness_hist[min(int((rms_db + 70.0) * 10), len(totals.loudness_hist) - 1)] += 1
+
+            # Speech alternates syllables and pauses, so many 20 ms frames sit
+            # well below the block's average energy; music is more sustained
+            frame_len = self.sample_rate // 50
+            usable = len(samples) - len(samples) % frame_len
+            if usable:
+                frame_energy = (samples[:usable] ** 2).reshape(-1, frame_len).mean(axis=1)
+                totals.low_energy_sum += float(np.mean(frame_energy < 0.5 * frame_energy.mean()))
+
+            zcr = float(np.mean(np.abs(np.diff(np.signbit(samples).astype(np.int8)))))
+            totals.zcr_sum += zcr
+            totals.zcr_square_sum += zcr * zcr
+
+            entry = (float(rms_db), timestamp)
+            if len(loudest) < self.loud_moments * 4:
+                heapq.heappush(loudest, entry)
+            elif entry > loudest[0]:
+                heapq.heapreplace(loudest, entry)
+
+    def summarize(self, totals):
+        """The summary dict of analyze_audio() from accumulated totals"""
+        blocks, silent_blocks = totals.blocks, totals.silent_blocks
+        if blocks == 0:
+            return {'has_audio': False}
+
+        voiced_blocks = blocks - silent_blocks
+        zcr_mean = totals.zcr_sum / voiced_blocks if voiced_blocks else 0.0
+        zcr_std = np.sqrt(max(0.0, totals.zcr_square_sum / voiced_blocks - zcr_mean ** 2)) if voiced_blocks else 0.0
+        low_energy_ratio = totals.low_energy_sum / voiced_blocks if voiced_blocks else 0.0
+
+        return {
+            'has_audio': True,
+            'audio_duration': blocks * self.block_seconds,
+            'rms_db': float(10 * np.log10(totals.sum_square / blocks + 1e-12)),
+            'loudness_lufs': self._gated_loudness(totals.loudness_hist),
+            'silence_ratio': silent_blocks / blocks,
+            'low_energy_ratio': low_energy_ratio,
+            'zero_crossing_mean': zcr_mean,
+            'zero_crossing_std': float(zcr_std),
+            'audio_type': self._classify(silent_blocks / blocks, low_energy_ratio, zcr_std),
+            'loud_moments': self._spread_moments(totals.loudest)
+        }
+
+    def _gated_loudness(self, loudness_hist):
+        """Integrated loudness with BS.1770-style absolute and relative gating.
+
+        The signal is not K-weighted, so this is an approximation of LUFS that
+        is good enough to tell quiet narration from mastered music.
+        """
+        if not loudness_hist.any():
+            return None
+
+        def mean_loudness(mask):
+            counts = loudness_hist[mask]
+            if not counts.sum():
+                return None
+            energy = np.sum(counts * 10 ** (self.LOUDNESS_BINS[mask] / 10)) / counts.sum()
+            return 10 * np.log10(energy)
+
+        ungated = mean_loudness(self.LOUDNESS_BINS >= -70.0)
+        gated = mean_loudness(self.LOUDNESS_BINS >= ungated - 10.0)
+        return round(float(gated if gated is not None else ungated), 1)
+
+    def _classify(self, silence_ratio, low_energy_ratio, zcr_std):
+        """Rough speech vs music call from block energy features"""
+        if silence_ratio > 0.9:
+            return "silent"
+        if low_energy_ratio > 0.35 and zcr_std > 0.02:
+            return "speech"
+        if low_energy_ratio < 0.2:
+            return "music"
+        return "mixed speech/music"
+
+    def _spread_moments(self, loudest, min_gap=5.0):
+        """Pick the loudest timestamps that are at least min_gap seconds apart"""
+        moments = []
+        for rms_db, timestamp in sorted(loudest, reverse=True):
+            if all(abs(timestamp - m['time']) >= min_gap for m in moments):
+                moments.append({'time': round(timestamp, 1), 'rms_db': round(float(rms_db), 1)})
+            if len(moments) >= self.loud_moments:
+                break
+        return sorted(moments, key=lambda m: m['time'])
@@ -0,0 +1,294 @@
+"""
+Upload bandwidth shaping and concurrency limits.
+
+All uploads in the process draw from one bandwidth budget. Each upload job
+gets a share proportional to its weight, and the budget can follow a
+time-of-day schedule. The shared YouTube transport feeds request bodies
+through throttle() in small slices, so the link sees a smooth rate instead
+of 10 MB bursts. A resizable slot pool caps how many uploads run at once.
+
+Limits come from the environment and can be changed at runtime by editing
+the JSON control file (UPLOAD_LIMITS_FILE, default upload_limits.json):
+    {"max_concurrent_uploads": 4,
+     "bandwidth": "08:00-20:00=2MB, 20:00-08:00=unlimited"}
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+SLICE_SIZE = 64 * 1024
+
+_UNITS = {
+    '': 1, 'b': 1,
+    'kb': 1024, 'k': 1024,
+    'mb': 1024 ** 2, 'm': 1024 ** 2,
+    'gb': 1024 ** 3, 'g': 1024 ** 3,
+    'kbps': 1000 / 8, 'kbit': 1000 / 8,
+    'mbps': 1000 ** 2 / 8, 'mbit': 1000 ** 2 / 8,
+    'gbps': 1000 ** 3 / 8, 'gbit': 1000 ** 3 / 8
+}
+
+
+def parse_rate(value):
+    """Parse '2MB', '500KB', '20Mbps' or a byte count into bytes/second (0 = unlimited)"""
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return max(0, float(value))
+    value = str(value).strip().lower().replace('/s', '')
+    if value in ('', '0', 'unlimited', 'none', 'off'):
+        return 0
+    match = re.fullmatch(r'([\d.]+)\s*([a-z]*)', value)
+    if not match or match.group(2) not in _UNITS:
+        raise ValueError(f"Invalid bandwidth '{value}' (examples: 2MB, 500KB, 20Mbps)")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def parse_schedule(spec):
+    """Parse 'HH:MM-HH:MM=RATE, ...' into [(start_minute, end_minute, bytes_per_second)].
+
+    A plain rate ('2MB') applies all day. Windows may wrap past midnight.
+    """
+    if spec is None or isinstance(spec, (int, float)):
+        return [(0, 24 * 60, parse_rate(spec))]
+    windows = []
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '=' not in part:
+            windows.append((0, 24 * 60, parse_rate(part)))
+            continue
+        span, rate = part.split('=', 1)
+        if '-' not in span:
+            raise ValueError(f"Invalid time window '{span.strip()}' (expected HH:MM-HH:MM)")
+        start, end = (_minutes(t) for t in span.split('-', 1))
+        windows.append((start, end, parse_rate(rate)))
+    return windows or [(0, 24 * 60, 0)]
+
+
+def _minutes(text):
+    hours, _, minutes = text.strip().partition(':')
+    total = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= int(minutes or 0) < 60 or not 0 <= total <= 24 * 60:
+        raise ValueError(f"Invalid time '{text.strip()}' (expected HH:MM between 00:00 and 24:00)")
+    return total
+
+
+class UploadJob:
+    """One upload stream's share of the bandwidth budget"""
+
+    def __init__(self, name, weight=1.0):
+        self.name = name
+        self.weight = max(0.01, float(weight))
+        self.next_send = 0.0
+        self.bytes_sent = 0
+        self.throttled_seconds = 0.0
+
+
+class BandwidthLimiter:
+    """Weighted token bucket shared by all concurrent upload streams"""
+
+    def __init__(self, schedule=None):
+        self._lock = threading.Lock()
+        self._jobs = []
+        self.set_schedule(schedule)
+
+    def set_schedule(self, schedule):
+        """Replace the schedule ('2MB', '08:00-20:00=2MB,20:00-08:00=0', ...)"""
+        windows = parse_schedule(schedule)
+        with self._lock:
+            self._windows = windows
+
+    def current_rate(self, now=None):
+        """Bytes/second allowed right now (0 = unlimited)"""
+        local = time.localtime(now)
+        minute = local.tm_hour * 60 + local.tm_min
+        for start, end, rate in self._windows:
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return rate
+        return 0
+
+    def register(self, name, weight=1.0):
+        job = UploadJob(name, weight)
+        with self._lock:
+            self._jobs.append(job)
+        return job
+
+    def unregister(self, job):
+        with self._lock:
+            if job in self._jobs:
+                self._jobs.remove(job)
+
+    def consume(self, job, nbytes):
+        """Block until `job` may send `nbytes` under its weighted share"""
+        rate = self.current_rate()
+        job.bytes_sent += nbytes
+        if not rate:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            # Jobs idle for a second (waiting on the API) don't hold back the others
+            active = [j for j in self._jobs if j is job or j.next_send > now - 1.0]
+            share = rate * job.weight / sum(j.weight for j in active)
+            start = max(now, job.next_send)
+            job.next_send = start + nbytes / share
+
+        wait = start - now
+        if wait > 0:
+            job.throttled_seconds += wait
+            time.sleep(wait)
+
+    def throttle(self, job, data):
+        """Sized iterable over `data` that paces each slice (memoryview slices, no copies)"""
+        return ThrottledBody(self, job, data)
+
+
+class ThrottledBody:
+    """Request body that requests/urllib3 stream slice by slice.
+
+    Having __len__ keeps the request Content-Length framed (a bare generator
+    would be sent chunked, which resumable upload endpoints reject).
+    """
+
+    def __init__(self, limiter, job, data):
+        self.limiter = limiter
+        self.job = job
+        self.view = memoryview(data)
+
+    def __len__(self):
+        return self.view.nbytes
+
+    def __iter__(self):
+        for offset in range(0, len(self.view), SLICE_SIZE):
+            piece = self.view[offset:offset + SLICE_SIZE]
+            self.limiter.consume(self.job, len(piece))
+            yield piece
+
+
+class UploadSlots:
+    """Semaphore whose size can change while uploads are running"""
+
+    def __init__(self, limit=0):
+        self._condition = threading.Condition()
+        self._limit = limit
+        self._in_use = 0
+
+    @property
+    def limit(self):
+        return self._limit
+
+    def set_limit(self, limit):
+        """New maximum (0 = unlimited); running uploads finish, new ones wait"""
+        with self._condition:
+            self._limit = max(0, int(limit))
+            self._condition.notify_all()
+
+    def acquire(self):
+        with self._condition:
+            while self._limit and self._in_use >= self._limit:
+                self._condition.wait(timeout=1.0)
+            self._in_use += 1
+
+    def release(self):
+        with self._condition:
+            self._in_use = max(0, self._in_use - 1)
+            self._condition.notify_all()
+
+
+class UploadShaper:
+    """Bandwidth limiter + concurrency slots, reloaded from the control file when it changes"""
+
+    def __init__(self, schedule=None, max_concurrent=None, control_file=None):
+        self.limiter = BandwidthLimiter(schedule if schedule is not None else os.getenv('UPLOAD_BANDWIDTH'))
+        self.slots = UploadSlots(max_concurrent if max_concurrent is not None
+                                 else int(os.getenv('MAX_CONCURRENT_UPLOADS', '0')))
+        self.control_file = control_file or os.getenv('UPLOAD_LIMITS_FILE', 'upload_limits.json')
+        self._control_mtime = None
+        self._checked = 0.0
+        self._local = threading.local()
+
+    def reload_if_changed(self):
+        """Apply edits to the control file (checked at most every 5 seconds)"""
+        now = time.monotonic()
+        if now - self._checked < 5.0:
+            return
+        self._checked = now
+        try:
+            mtime = os.path.getmtime(self.control_file)
+        except OSError:
+            return
+        if mtime == self._control_mtime:
+            return
+        self._control_mtime = mtime
+        try:
+            with open(self.control_file, 'r', encoding='utf-8') as f:
+                limits = json.load(f)
+            if not isinstance(limits, dict):
+                raise ValueError("expected a JSON object")
+            # Validate both before applying either, so a bad file changes nothing
+            if 'bandwidth' in limits:
+                parse_schedule(limits['bandwidth'])
+            if 'max_concurrent_uploads' in limits:
+                int(limits['max_concurrent_uploads'])
+            if 'bandwidth' in limits:
+                self.limiter.set_schedule(limits['bandwidth'])
+            if 'max_concurrent_uploads' in limits:
+                self.slots.set_limit(limits['max_concurrent_uploads'])
+            print(f"🎚️ Upload limits reloaded: {self.slots.limit or 'unlimited'} concurrent, "
+                  f"{self.limiter.current_rate() / 1024 ** 2:.2f} MB/s now")
+        except (OSError, ValueError, TypeError) as e:
+            # The limits in effect stay as they were
+            print(f"⚠️ Could not read {self.control_file}: {e}")
+
+    def current_job(self):
+        """The upload job running on this thread, if any"""
+        return getattr(self._local, 'job', None)
+
+    @contextmanager
+    def job(self, name, weight=1.0):
+        """Hold an upload slot and route this thread's request bodies through the limiter"""
+        self.reload_if_changed()
+        self.slots.acquire()
+        job = self.limiter.register(name, weight)
+        self._local.job = job
+        metrics.UPLOADS_ACTIVE.inc()
+        try:
+            yield job
+        finally:
+            metrics.UPLOADS_ACTIVE.dec()
+            self._local.job = None
+            self.limiter.unregister(job)
+            self.slots.release()
+
+    def wrap_body(self, body):
+        """Request body for the transport: paced slices inside a throttled job, else unchanged"""
+        job = self.current_job()
+        if job is None or not body or isinstance(body, str):
+            return body
+        self.reload_if_changed()
+        if not self.limiter.current_rate():
+            job.bytes_sent += len(body)
+            return body
+        return self.limiter.throttle(job, body)
+
+
+_shared_shaper = None
+_shared_lock = threading.Lock()
+
+
+def get_upload_shaper():
+    """Process-wide shaper, so every concurrent upload shares one budget"""
+    global _shared_shaper
+    with _shared_lock:
+        if _shared_shaper is None:
+            _shared_shaper = UploadShaper()
+        return _shared_shaper
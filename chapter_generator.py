@@ -0,0 +1,134 @@
+class ChapterGenerator:
+    """Merge detected shots into YouTube chapters.
+
+    YouTube only renders chapters when the first one starts at 0:00, there are
+    at least three of them and each lasts at least ten seconds.
+    """
+
+    def __init__(self, min_chapters=3, max_chapters=15, min_chapter_length=10):
+        self.min_chapters = min_chapters
+        self.max_chapters = max_chapters
+        self.min_chapter_length = min_chapter_length
+
+    def build_chapters(self, shots, duration=None):
+        """Merge shot boundaries into 3-15 chapters honoring the minimum length"""
+        if not shots:
+            return []
+
+        duration = duration or shots[-1]['end']
+        if duration < self.min_chapters * self.min_chapter_length:
+            return []
+
+        chapters = [self._chapter_from_shot(shot) for shot in shots]
+
+        # Fold the shortest chapter into its closest neighbour until every
+        # chapter is long enough and there aren't too many of them
+        while len(chapters) > 1:
+            shortest = min(range(len(chapters)), key=lambda i: chapters[i]['duration'])
+            too_short = chapters[shortest]['duration'] < self.min_chapter_length
+            if not too_short and len(chapters) <= self.max_chapters:
+                break
+            neighbour = self._closest_neighbour(chapters, shortest)
+            first, second = sorted((shortest, neighbour))
+            chapters[first:second + 1] = [self._merge(chapters[first], chapters[second])]
+
+        # Too few cuts (e.g. a single long take): split the longest chapters evenly
+        while len(chapters) < self.min_chapters:
+            longest = max(range(len(chapters)), key=lambda i: chapters[i]['duration'])
+            if chapters[longest]['duration'] < 2 * self.min_chapter_length:
+                return []
+            chapters[longest:longest + 1] = self._split(chapters[longest])
+
+        chapters[0]['start'] = 0.0
+        for chapter in chapters:
+            chapter['duration'] = chapter['end'] - chapter['start']
+        return chapters
+
+    def _chapter_from_shot(self, shot):
+        """Start a chapter from a single detected shot"""
+        return {
+            'start': shot['start'],
+            'end': shot['end'],
+            'duration': shot['duration'],
+            'shots': 1,
+            'brightness': shot.get('brightness', 0.0),
+            'activity': shot.get('activity', 0.0)
+        }
+
+    def _closest_neighbour(self, chapters, index):
+        """Pick the adjacent chapter whose visual stats are most similar"""
+        candidates = [i for i in (index - 1, index + 1) if 0 <= i < len(chapters)]
+
+        def distance(i):
+            brightness_gap = abs(chapters[i]['brightness'] - chapters[index]['brightness']) / 255
+            activity_gap = abs(chapters[i]['activity'] - chapters[index]['activity'])
+            return brightness_gap + activity_gap
+
+        return min(candidates, key=distance)
+
+    def _merge(self, first, second):
+        """Merge two adjacent chapters, weighting stats by duration"""
+        total = max(first['duration'] + second['duration'], 1e-6)
+        return {
+            'start': first['start'],
+            'end': second['end'],
+            'duration': second['end'] - first['start'],
+            'shots': first['shots'] + second['shots'],
+            'brightness': (first['brightness'] * first['duration'] +
+                           second['brightness'] * second['duration']) / total,
+            'activity': (first['activity'] * first['duration'] +
+                         second['activity'] * second['duration']) / total
+        }
+
+    def _split(self, chapter):
+        """Split a chapter into two equal halves"""
+        middle = chapter['start'] + chapter['duration'] / 2
+        halves = []
+        for start, end in ((chapter['start'], middle), (middle, chapter['end'])):
+            half = dict(chapter)
+            half.update({'start': start, 'end': end, 'duration': end - start,
+                         'shots': max(1, chapter['shots'] // 2)})
+            halves.append(half)
+        return halves
+
+    def summarize_chapters(self, chapters):
+        """Compact one-line summary per chapter for the title prompt"""
+        lines = []
+        for i, chapter in enumerate(chapters, 1):
+            if chapter['brightness'] < 80:
+                lighting = "dark"
+            elif chapter['brightness'] > 180:
+                lighting = "bright"
+            else:
+                lighting = "balanced"
+
+            if chapter['activity'] < 0.05:
+                pace = "steady"
+            elif chapter['activity'] < 0.15:
+                pace = "some movement"
+            else:
+                pace = "lots of change"
+
+            lines.append(
+                f"{i}. {format_timestamp(chapter['start'])}-{format_timestamp(chapter['end'])}"
+                f" | {chapter['shots']} shot(s) | {lighting} lighting, {pace}"
+            )
+        return '\n'.join(lines)
+
+    def format_chapters(self, chapters, titles):
+        """Render chapters as YouTube description timestamp lines"""
+        lines = []
+        for i, chapter in enumerate(chapters):
+            title = titles[i] if i < len(titles) and titles[i] else f"Part {i + 1}"
+            lines.append(f"{format_timestamp(chapter['start'])} {title}")
+        return '\n'.join(lines)
+
+
+def format_timestamp(seconds):
+    """Format seconds as M:SS or H:MM:SS the way YouTube expects"""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
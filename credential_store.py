@@ -0,0 +1,269 @@
+"""
+OAuth credential store for YouTube uploads.
+
+Tokens are kept as JSON (Credentials.to_json) in one file per channel under
+tokens/, instead of a pickle. Refreshes happen under a FileLock, and the
+token file is re-read inside the lock, so parallel workers and processes
+share one refresh instead of racing. A background thread refreshes tokens
+shortly before they expire, so long batches and daemons never stall on an
+expired token or fall back to the interactive login.
+
+    python credential_store.py add [--channel NAME] [--project NAME]
+    python credential_store.py list
+    python credential_store.py refresh
+"""
+
+import datetime
+import os
+import pickle
+import threading
+
+from file_lock import FileLock
+
+# Scopes (permissions) needed for YouTube upload
+SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+
+DEFAULT_CHANNEL = "default"
+
+
+class CredentialStore:
+    """JSON token files keyed by channel ID, with locked, proactive refresh"""
+
+    def __init__(self, directory=None, client_secrets="credentials.json", scopes=None,
+                 refresh_margin=None):
+        self.directory = directory or os.getenv('YOUTUBE_TOKEN_DIR', 'tokens')
+        self.client_secrets = client_secrets
+        self.scopes = scopes or SCOPES
+        self.refresh_margin = refresh_margin if refresh_margin is not None else \
+            int(os.getenv('YOUTUBE_TOKEN_REFRESH_MARGIN', '300'))
+        self._live = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._stop = threading.Event()
+
+    def _path(self, channel_id):
+        return os.path.join(self.directory, f"{channel_id}.json")
+
+    def channels(self):
+        """Channel IDs that have a stored token"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+
+    def default_channel(self):
+        """YOUTUBE_CHANNEL_ID, or the only stored channel"""
+        channel_id = os.getenv('YOUTUBE_CHANNEL_ID')
+        if channel_id:
+            return channel_id
+        channels = self.channels()
+        if len(channels) > 1:
+            raise Exception(f"Several channels are authorized ({', '.join(channels)}) - "
+                            "set YOUTUBE_CHANNEL_ID or pass a channel ID")
+        return channels[0] if channels else None
+
+    def _load(self, channel_id):
+        from google.oauth2.credentials import Credentials
+
+        path = self._path(channel_id)
+        if not os.path.exists(path):
+            return None
+        return Credentials.from_authorized_user_file(path, self.scopes)
+
+    def _save(self, channel_id, credentials):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(channel_id)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(credentials.to_json())
+        os.replace(temp_path, path)
+        if os.name != 'nt':
+            os.chmod(path, 0o600)
+
+    def _needs_refresh(self, credentials):
+        if not credentials.token or credentials.expiry is None:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        remaining = credentials.expiry - now
+        return remaining.total_seconds() < self.refresh_margin
+
+    def _refresh(self, channel_id, credentials):
+        """Refresh under the file lock, adopting a token another worker already refreshed"""
+        from google.auth.transport.requests import Request
+
+        os.makedirs(self.directory, exist_ok=True)
+        with FileLock(self._path(channel_id) + '.lock'):
+            stored = self._load(channel_id)
+            if stored is not None and stored.token != credentials.token and not self._needs_refresh(stored):
+                credentials.token = stored.token
+                credentials.expiry = stored.expiry
+                return credentials
+            if not self._needs_refresh(credentials):
+                return credentials
+            if not credentials.refresh_token:
+                raise Exception(f"Token for channel '{channel_id}' cannot be refreshed - "
+                                f"run: python credential_store.py add --channel {channel_id}")
+            credentials.refresh(Request())
+            self._save(channel_id, credentials)
+            print(f"🔄 Refreshed YouTube token for channel {channel_id}")
+        return credentials
+
+    def get_credentials(self, channel_id=None, interactive=True):
+        """Return valid credentials for a channel, authorizing interactively only if none are stored"""
+        self._migrate_pickle()
+        channel_id = channel_id or self.default_channel()
+
+        with self._lock:
+            credentials = self._live.get(channel_id) if channel_id else None
+            if credentials is None and channel_id:
+                credentials = self._load(channel_id)
+
+            if credentials is None:
+                if not interactive:
+                    raise Exception(f"No stored token for channel '{channel_id or DEFAULT_CHANNEL}' "
+                                    "and interactive login is disabled")
+                channel_id, credentials = self.authorize(channel_id)
+            elif self._needs_refresh(credentials):
+                credentials = self._refresh(channel_id, credentials)
+
+            self._live[channel_id] = credentials
+            return credentials
+
+    def authorize(self, channel_id=None):
+        """Run the browser login flow and store the token; returns (channel_id, credentials)"""
+        import google_auth_oauthlib.flow
+
+        flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(
+            self.client_secrets, self.scopes
+        )
+        # Try different ports in case 8080 is busy
+        ports_to_try = [8080, 8081, 8082, 8083, 8084]
+        credentials = None
+
+        for port in ports_to_try:
+            try:
+                print(f"🔐 Authenticating using port {port}...")
+                print("📝 Note: If you see 'Google hasn't verified this app' warning:")
+                print("   1. Click 'Advanced' (bottom left)")
+                print("   2. Click 'Go to [your project] (unsafe)'")
+                print("   3. This is normal for development/testing!")
+                credentials = flow.run_local_server(port=port)
+                break
+            except OSError as e:
+                if "10048" in str(e) or "Address already in use" in str(e):
+                    print(f"Port {port} is busy, trying next port...")
+                    continue
+                else:
+                    raise e
+
+        if not credentials:
+            raise Exception("Could not authenticate - all ports are busy")
+
+        channel_id = channel_id or self._lookup_channel_id(credentials) or DEFAULT_CHANNEL
+        self._save(channel_id, credentials)
+        print(f"💾 Token saved for channel {channel_id}")
+        return channel_id, credentials
+
+    def _lookup_channel_id(self, credentials):
+        # channels.list needs a read scope; with upload-only scopes this fails
+        # and the token is stored under the default name instead
+        try:
+            from youtube_transport import build_youtube_service
+            response = build_youtube_service(credentials).channels().list(part="id", mine=True).execute()
+            items = response.get('items') or []
+            return items[0]['id'] if items else None
+        except Exception:
+            return None
+
+    def _migrate_pickle(self, legacy_path="token.pickle"):
+        """Convert a token.pickle from older versions into the JSON store (once)"""
+        if not os.path.exists(legacy_path) or self.channels():
+            return
+        try:
+            with open(legacy_path, "rb") as token:
+                credentials = pickle.load(token)
+            self._save(DEFAULT_CHANNEL, credentials)
+            os.replace(legacy_path, legacy_path + ".migrated")
+            print(f"🔁 Migrated {legacy_path} to {self._path(DEFAULT_CHANNEL)}")
+        except Exception as e:
+            print(f"⚠️ Could not migrate {legacy_path}: {e}")
+
+    def refresh_due(self):
+        """Refresh every live token that is close to expiry"""
+        with self._lock:
+            live = list(self._live.items())
+        for channel_id, credentials in live:
+            if self._needs_refresh(credentials):
+                try:
+                    with self._lock:
+                        self._refresh(channel_id, credentials)
+                except Exception as e:
+                    print(f"⚠️ Background token refresh failed for {channel_id}: {e}")
+
+    def start_auto_refresh(self, interval=60):
+        """Refresh live tokens in a daemon thread before they expire"""
+        if self._refresher and self._refresher.is_alive():
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                self.refresh_due()
+
+        self._stop.clear()
+        self._refresher = threading.Thread(target=run, name="youtube-token-refresh", daemon=True)
+        self._refresher.start()
+
+    def stop_auto_refresh(self):
+        self._stop.set()
+
+
+_shared_stores = {}
+_shared_lock = threading.Lock()
+
+
+def get_credential_store(project=None):
+    """Process-wide store per API project, so uploaders share live credentials and refreshers.
+
+    The first configured project keeps its tokens in YOUTUBE_TOKEN_DIR; other
+    projects (see quota_ledger.load_projects) use a subdirectory of it.
+    """
+    from quota_ledger import load_projects
+
+    projects = load_projects()
+    first = next(iter(projects))
+    project = project or first
+    if project not in projects:
+        raise Exception(f"Unknown YouTube project '{project}' (configured: {', '.join(projects)})")
+
+    with _shared_lock:
+        if project not in _shared_stores:
+            directory = os.getenv('YOUTUBE_TOKEN_DIR', 'tokens')
+            if project != first:
+                directory = os.path.join(directory, project)
+            store = CredentialStore(directory, client_secrets=projects[project]['client_secrets'])
+            store.start_auto_refresh()
+            _shared_stores[project] = store
+        return _shared_stores[project]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage stored YouTube channel tokens")
+    parser.add_argument("command", choices=["add", "list", "refresh"])
+    parser.add_argument("--channel", help="channel ID to store the token under")
+    parser.add_argument("--project", help="API project from YOUTUBE_PROJECTS (default: the first)")
+    args = parser.parse_args()
+
+    store = get_credential_store(args.project)
+    if args.command == "add":
+        store.authorize(args.channel)
+    elif args.command == "list":
+        store._migrate_pickle()
+        for channel_id in store.channels():
+            credentials = store._load(channel_id)
+            print(f"  {channel_id}: expires {credentials.expiry} UTC")
+    else:
+        for channel_id in store.channels():
+            store.get_credentials(channel_id, interactive=False)
+            print(f"✅ {channel_id} token valid")
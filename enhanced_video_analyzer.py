@@ -3,27 +3,37 @@ import os
 import numpy as np
 from PIL import Image
 import json
+import tracing
+from scene_detector import SceneDetector
+from video_fingerprint import FingerprintSampler
+from analysis_accumulators import FrameMetrics
+from audio_analyzer import AudioAnalyzer
 
 class SimpleVideoAnalyzer:
-    def __init__(self, video_path):
+    def __init__(self, video_path, scene_stride=5, analyze_audio=True):
         self.video_path = video_path
         self.video_info = {}
+        self.scene_detector = SceneDetector(stride=scene_stride)
+        self.audio_analyzer = AudioAnalyzer(video_path) if analyze_audio else None
         
     def analyze_video(self):
         """Analyze video and extract comprehensive information"""
         try:
-            cap = cv2.VideoCapture(self.video_path)
-            
-            if not cap.isOpened():
-                print(f"Error: Could not open video file {self.video_path}")
-                return None
-            
-            # Get basic video properties
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            duration = frame_count / fps if fps > 0 else 0
+            with tracing.span('probe') as probe_span:
+                cap = cv2.VideoCapture(self.video_path)
+                
+                if not cap.isOpened():
+                    print(f"Error: Could not open video file {self.video_path}")
+                    return None
+                
+                # Get basic video properties
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                duration = frame_count / fps if fps > 0 else 0
+                probe_span.set('resolution', f"{width}x{height}")
+                probe_span.set('frames', frame_count)
             
             self.video_info = {
                 'duration': duration,
@@ -33,6 +43,14 @@ class SimpleVideoAnalyzer:
                 'file_size': os.path.getsize(self.video_path) if os.path.exists(self.video_path) else 0
             }
             
+            # Audio runs first so content type detection can use it
+            if self.audio_analyzer:
+                with tracing.span('audio'):
+                    audio = self.audio_analyzer.analyze_audio()
+                if audio:
+                    self.video_info['has_audio'] = audio['has_audio']
+                    self.video_info['audio'] = audio
+            
             # Enhanced analysis
             self.video_info.update(self._analyze_content_deeply(cap))
             
@@ -47,6 +65,8 @@ class SimpleVideoAnalyzer:
         """Perform deep content analysis"""
         analysis = {
             'scene_changes': 0,
+            'scene_cuts': [],
+            'shots': [],
             'motion_level': 'static',
             'brightness_levels': [],
             'color_variety': 'low',
@@ -60,80 +80,68 @@ class SimpleVideoAnalyzer:
         try:
             total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             sample_frames = min(20, max(5, total_frames // 50))  # Sample more frames
+            sample_step = max(1, total_frames // sample_frames)
+            fps = self.video_info.get('fps') or 30.0
             
-            previous_frame = None
-            brightness_values = []
-            motion_scores = []
-            color_histograms = []
-            key_frames = []
+            # Shot boundaries, the near-duplicate fingerprint and the sampled frame
+            # metrics (fixed-size accumulators) all come from one streaming pass
+            sampler = FingerprintSampler(self.video_info.get('duration', 0))
+            metrics = FrameMetrics()
             
-            for i in range(sample_frames):
-                frame_pos = i * (total_frames // sample_frames)
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_pos)
-                ret, frame = cap.read()
-                
-                if not ret:
-                    continue
-                
-                # Analyze brightness
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                brightness = np.mean(gray)
-                brightness_values.append(brightness)
-                
-                # Analyze motion
-                if previous_frame is not None:
-                    diff = cv2.absdiff(previous_frame, gray)
-                    motion_score = np.mean(diff)
-                    motion_scores.append(motion_score)
-                    
-                    if motion_score > 10:  # Significant change
-                        analysis['scene_changes'] += 1
-                
-                # Analyze colors
-                color_hist = cv2.calcHist([frame], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256])
-                color_histograms.append(color_hist.flatten())
-                
-                # Store key frame for thumbnail
-                if len(key_frames) < 5:
-                    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    key_frames.append(frame_rgb)
-                
-                # Check for text (simplified)
-                edges = cv2.Canny(gray, 50, 150)
-                if np.sum(edges) > gray.shape[0] * gray.shape[1] * 10:  # Many edges might indicate text
-                    analysis['text_presence'] = True
-                
-                previous_frame = gray
-            
-            # Process analysis results
-            if brightness_values:
-                avg_brightness = np.mean(brightness_values)
-                analysis['brightness_levels'] = {
-                    'average': float(avg_brightness),
-                    'variation': float(np.std(brightness_values)),
-                    'description': self._describe_brightness(avg_brightness)
-                }
+            def on_frame(frame, timestamp):
+                sampler.offer(frame, timestamp)
+                if metrics.frames < sample_frames and timestamp >= metrics.frames * sample_step / fps:
+                    metrics.add_frame(frame, timestamp, keep_key_frames=True)
             
-            if motion_scores:
-                avg_motion = np.mean(motion_scores)
-                analysis['motion_level'] = self._describe_motion(avg_motion)
-                analysis['average_motion_score'] = float(avg_motion)
+            with tracing.span('decode', bytes=self.video_info.get('file_size', 0)) as decode_span:
+                scenes = self.scene_detector.detect(cap, fps, frame_hook=on_frame)
+                decode_span.set('frames_analyzed', scenes['frames_analyzed'])
+                tracing.record('metric.scene_histogram', self.scene_detector.metric_seconds,
+                               frames=scenes['frames_analyzed'])
+                fingerprint = sampler.fingerprint()
+                tracing.record('metric.phash', sampler.seconds, frames=len(sampler.hashes))
+                for metric, seconds in metrics.seconds.items():
+                    tracing.record(f'metric.{metric}', seconds, frames=metrics.frames)
+            if fingerprint:
+                analysis['video_fingerprint'] = fingerprint.to_dict()
+            analysis['scene_cuts'] = scenes['cuts']
+            analysis['shots'] = scenes['shots']
+            analysis['scene_changes'] = len(scenes['cuts'])
+            if scenes['shots']:
+                total_shot_time = sum(shot['duration'] for shot in scenes['shots'])
+                analysis['average_shot_length'] = total_shot_time / len(scenes['shots'])
+                if total_shot_time > 0:
+                    analysis['cuts_per_minute'] = len(scenes['cuts']) / (total_shot_time / 60)
             
-            # Analyze color variety
-            if color_histograms:
-                analysis['color_variety'] = self._analyze_color_variety(color_histograms)
-                analysis['dominant_colors'] = self._extract_dominant_colors(color_histograms[0])
+            analysis.update(self._describe_frame_metrics(metrics))
             
             # Determine content type based on analysis
             analysis['content_type'] = self._determine_content_type(analysis)
             analysis['visual_complexity'] = self._determine_complexity(analysis)
-            analysis['key_frames'] = key_frames
+            analysis['key_frames'] = [metrics.key_frames.payload(key) for key in metrics.key_frames.keys()]
             
         except Exception as e:
             print(f"Error in deep analysis: {e}")
         
         return analysis
     
+    def _describe_frame_metrics(self, metrics):
+        """Brightness, motion, colour and text fields of the analysis from FrameMetrics"""
+        analysis = {'text_presence': metrics.text_frames > 0}
+        if metrics.brightness.count:
+            analysis['brightness_levels'] = {
+                'average': metrics.brightness.mean,
+                'variation': metrics.brightness.std,
+                'description': self._describe_brightness(metrics.brightness.mean)
+            }
+        if metrics.motion.count:
+            analysis['motion_level'] = self._describe_motion(metrics.motion.mean)
+            analysis['average_motion_score'] = metrics.motion.mean
+        if metrics.colors.samples:
+            analysis['color_variety'] = self._analyze_color_variety(metrics.colors)
+            analysis['dominant_colors'] = self._extract_dominant_colors(metrics.colors.counts)
+        return analysis
+    
     def _describe_brightness(self, brightness):
         """Describe brightness level"""
         if brightness < 80:
@@ -154,14 +162,14 @@ class SimpleVideoAnalyzer:
         else:
             return "high-motion/fast-paced"
     
-    def _analyze_color_variety(self, color_histograms):
-        """Analyze color variety in video"""
-        if not color_histograms:
+    def _analyze_color_variety(self, colors):
+        """Analyze color variety over all sampled frames (a HistogramSum)"""
+        if not colors.samples:
             return "unknown"
         
-        # Calculate color variance
-        hist_array = np.array(color_histograms[0])
-        non_zero_bins = np.count_nonzero(hist_array)
+        # A bin counts when it holds at least one pixel in an average sampled frame
+        hist_array = colors.mean()
+        non_zero_bins = np.count_nonzero(hist_array >= 1)
         total_bins = len(hist_array)
         
         variety_ratio = non_zero_bins / total_bins
@@ -186,23 +194,26 @@ class SimpleVideoAnalyzer:
             r = (idx // 64) * 32
             g = ((idx % 64) // 8) * 32
             b = (idx % 8) * 32
-            colors.append([r, g, b])
+            colors.append([int(r), int(g), int(b)])
         
         return colors
     
     def _determine_content_type(self, analysis):
         """Determine likely content type based on analysis"""
         motion = analysis.get('average_motion_score', 0)
-        scene_changes = analysis.get('scene_changes', 0)
+        cuts_per_minute = analysis.get('cuts_per_minute', 0)
         text_presence = analysis.get('text_presence', False)
+        audio_type = self.video_info.get('audio', {}).get('audio_type')
         
         if text_presence and motion < 10:
             return "tutorial/presentation"
-        elif scene_changes > 5 and motion > 20:
+        elif audio_type == "music" and cuts_per_minute > 6:
+            return "music video/montage"
+        elif cuts_per_minute > 10 and motion > 20:
             return "dynamic/entertainment"
-        elif motion < 5:
+        elif motion < 5 or (audio_type == "speech" and motion < 10):
             return "talking-head/interview"
-        elif scene_changes > 3:
+        elif cuts_per_minute > 3:
             return "documentary/narrative"
         else:
             return "general content"
@@ -211,14 +222,14 @@ class SimpleVideoAnalyzer:
         """Determine visual complexity"""
         color_variety = analysis.get('color_variety', 'low')
         motion = analysis.get('average_motion_score', 0)
-        scene_changes = analysis.get('scene_changes', 0)
+        cuts_per_minute = analysis.get('cuts_per_minute', 0)
         
         complexity_score = 0
         if color_variety in ['rich/diverse colors', 'moderate variety']:
             complexity_score += 2
         if motion > 15:
             complexity_score += 2
-        if scene_changes > 3:
+        if cuts_per_minute > 3:
             complexity_score += 2
         
         if complexity_score >= 4:
@@ -244,6 +255,27 @@ class SimpleVideoAnalyzer:
         
         duration_str = f"{int(info.get('duration', 0) // 60)}:{int(info.get('duration', 0) % 60):02d}"
         
+        audio = info.get('audio')
+        if audio and audio.get('has_audio'):
+            loud_moments = ', '.join(
+                f"{int(m['time'] // 60)}:{int(m['time'] % 60):02d}" for m in audio.get('loud_moments', [])
+            ) or 'none'
+            loudness = audio.get('loudness_lufs')
+            audio_section = f"""
+AUDIO CHARACTERISTICS:
+- Audio type: {audio.get('audio_type', 'unknown')}
+- Loudness: {f'{loudness} LUFS (approx.)' if loudness is not None else 'very quiet'}
+- Silence: {audio.get('silence_ratio', 0) * 100:.0f}% of the runtime
+- Loudest moments: {loud_moments}
+"""
+        elif audio:
+            audio_section = """
+AUDIO CHARACTERISTICS:
+- No audio track
+"""
+        else:
+            audio_section = ""
+        
         prompt = f"""Detailed Video Content Analysis:
 
 TECHNICAL SPECS:
@@ -256,8 +288,8 @@ VISUAL CHARACTERISTICS:
 - Motion level: {info.get('motion_level', 'unknown')}
 - Color palette: {info.get('color_variety', 'unknown')}
 - Visual complexity: {info.get('visual_complexity', 'unknown')}
-- Scene changes: {info.get('scene_changes', 0)} detected
-
+- Scene changes: {info.get('scene_changes', 0)} cuts detected (average shot length {info.get('average_shot_length', info.get('duration', 0)):.1f}s)
+{audio_section}
 CONTENT ANALYSIS:
 - Likely content type: {info.get('content_type', 'unknown')}
 - Text/graphics present: {'Yes' if info.get('text_presence') else 'No'}
@@ -0,0 +1,416 @@
+"""
+In-process fake of the YouTube Data API upload endpoints.
+
+FakeYouTube is a requests transport adapter: installed with
+youtube_transport.use_transport_adapter() it receives every request the
+uploader makes through the shared PooledHttp transport (bandwidth shaping
+included), without sockets, OAuth or quota on a real project. It implements
+the resumable videos.insert protocol (308 + Range, status queries after an
+error, 256 KB commit granularity), videos.update, videos.list and
+thumbnails.set, and can inject latency, a bandwidth cap, HTTP errors and
+dropped connections at chosen byte offsets:
+
+    fake = FakeYouTube(latency=0.02, bandwidth='8MB')
+    fake.fail('upload.chunk', 503, times=2)
+    fake.drop_at(25 * 1024 * 1024)
+    with fake.installed():
+        AIYouTubeUploader().upload_video_with_ai('video.mp4')
+    print(fake.stats())
+"""
+
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import BaseAdapter
+
+API_HOST = "https://www.googleapis.com"
+COMMIT_GRANULARITY = 256 * 1024
+SLICE_SIZE = 64 * 1024
+
+# Quota cost per fake endpoint (upload chunks are covered by videos.insert)
+_ENDPOINT_COSTS = {
+    'videos.insert': 1600,
+    'videos.update': 50,
+    'videos.list': 1,
+    'thumbnails.set': 50,
+    'channels.list': 1
+}
+
+_ERROR_REASONS = {
+    400: ('global', 'badRequest'),
+    401: ('global', 'authError'),
+    403: ('youtube.quota', 'quotaExceeded'),
+    404: ('youtube.video', 'videoNotFound'),
+    429: ('global', 'rateLimitExceeded'),
+    500: ('global', 'backendError'),
+    502: ('global', 'backendError'),
+    503: ('global', 'backendError'),
+    504: ('global', 'backendError')
+}
+
+_STATUS_TEXT = {
+    200: 'OK', 308: 'Resume Incomplete', 400: 'Bad Request', 401: 'Unauthorized',
+    403: 'Forbidden', 404: 'Not Found', 429: 'Too Many Requests', 500: 'Internal Server Error',
+    502: 'Bad Gateway', 503: 'Service Unavailable', 504: 'Gateway Timeout'
+}
+
+
+def _body_slices(body):
+    """Request body as memoryview slices, whatever requests was given (bytes, memoryview, iterable)"""
+    if body is None:
+        return
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        view = memoryview(body)
+        for offset in range(0, len(view), SLICE_SIZE):
+            yield view[offset:offset + SLICE_SIZE]
+        return
+    if hasattr(body, 'read'):
+        while True:
+            data = body.read(SLICE_SIZE)
+            if not data:
+                return
+            yield memoryview(data)
+    for piece in body:
+        yield memoryview(piece.encode('utf-8') if isinstance(piece, str) else piece)
+
+
+def _read_body(body):
+    return b''.join(bytes(piece) for piece in _body_slices(body))
+
+
+class FakeYouTube(BaseAdapter):
+    """Fake videos.insert / videos.update / videos.list / thumbnails.set behind a requests adapter"""
+
+    def __init__(self, latency=0.0, bandwidth=None, daily_quota=None):
+        super().__init__()
+        from bandwidth import parse_rate
+
+        self.latency = latency
+        self.bandwidth = parse_rate(bandwidth)
+        self.daily_quota = daily_quota
+        self.quota_used = 0
+        self.videos = {}
+        self.requests = []
+        self._sessions = {}
+        self._faults = []
+        self._drops = []
+        self._lock = threading.Lock()
+        self._link_free_at = 0.0
+
+    # -- fault injection -------------------------------------------------
+
+    def fail(self, endpoint, status, times=1, after=0, reason=None):
+        """Answer the next `times` matching requests (after skipping `after`) with an HTTP error.
+
+        endpoint: 'videos.insert' (session start), 'upload.chunk', 'upload.status',
+        'videos.update', 'videos.list', 'thumbnails.set', 'channels.list' or '*'.
+        """
+        with self._lock:
+            self._faults.append({'endpoint': endpoint, 'status': status, 'times': times,
+                                 'after': after, 'reason': reason})
+
+    def drop_at(self, offset, times=1):
+        """Drop the connection once `offset` bytes of a video upload have been received"""
+        with self._lock:
+            self._drops.append({'offset': offset, 'times': times})
+
+    def clear_faults(self):
+        with self._lock:
+            self._faults.clear()
+            self._drops.clear()
+
+    @contextmanager
+    def installed(self):
+        """Route the process's YouTube API traffic to this fake for the duration of the block"""
+        from youtube_transport import use_transport_adapter
+
+        use_transport_adapter(self)
+        try:
+            yield self
+        finally:
+            use_transport_adapter(None)
+
+    # -- requests adapter interface ---------------------------------------
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        import requests
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = urlsplit(request.url)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        endpoint = self._endpoint(request.method, url.path, query, request.headers)
+
+        fault = self._take_fault(endpoint)
+        if fault:
+            status, body, headers = self._error(fault['status'], fault['reason'])
+        elif endpoint is None:
+            status, body, headers = self._error(404, 'notFound', f"No fake for {request.method} {url.path}")
+        else:
+            try:
+                status, body, headers = getattr(self, '_' + endpoint.replace('.', '_'))(request, query)
+            except requests.exceptions.ConnectionError:
+                with self._lock:
+                    self.requests.append({'endpoint': endpoint, 'status': 'dropped'})
+                raise
+
+        with self._lock:
+            self.requests.append({'endpoint': endpoint, 'status': status})
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = _STATUS_TEXT.get(status, '')
+        response.headers.update(headers)
+        response.headers.setdefault('Content-Type', 'application/json; charset=UTF-8')
+        response._content = body
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+    # -- helpers -----------------------------------------------------------
+
+    @staticmethod
+    def _endpoint(method, path, query, headers):
+        if path == '/upload/youtube/v3/videos':
+            if method == 'POST':
+                return 'videos.insert'
+            if method == 'PUT' and 'upload_id' in query:
+                return 'upload.status' if headers.get('Content-Range', '').startswith('bytes */') \
+                    else 'upload.chunk'
+        if path == '/youtube/v3/videos':
+            return {'PUT': 'videos.update', 'GET': 'videos.list'}.get(method)
+        if path == '/upload/youtube/v3/thumbnails/set' and method == 'POST':
+            return 'thumbnails.set'
+        if path == '/youtube/v3/channels' and method == 'GET':
+            return 'channels.list'
+        return None
+
+    def _take_fault(self, endpoint):
+        with self._lock:
+            for fault in self._faults:
+                if fault['times'] <= 0 or fault['endpoint'] not in ('*', endpoint):
+                    continue
+                if fault['after'] > 0:
+                    fault['after'] -= 1
+                    continue
+                fault['times'] -= 1
+                return fault
+        return None
+
+    @staticmethod
+    def _json(status, payload, headers=None):
+        return status, json.dumps(payload).encode('utf-8'), headers or {}
+
+    def _error(self, status, reason=None, message=None):
+        domain, default_reason = _ERROR_REASONS.get(status, ('global', 'backendError'))
+        reason = reason or default_reason
+        message = message or f"Injected {status} ({reason})"
+        return self._json(status, {'error': {
+            'code': status, 'message': message,
+            'errors': [{'domain': domain, 'reason': reason, 'message': message}]
+        }})
+
+    def _charge(self, endpoint):
+        """Charge quota for a call; False when the fake's daily quota is used up"""
+        with self._lock:
+            cost = _ENDPOINT_COSTS.get(endpoint, 0)
+            if self.daily_quota is not None and self.quota_used + cost > self.daily_quota:
+                return False
+            self.quota_used += cost
+            return True
+
+    def _pace(self, nbytes):
+        """Hold `nbytes` to the fake link's bandwidth (shared by all concurrent requests)"""
+        if not self.bandwidth:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._link_free_at)
+            self._link_free_at = done = start + nbytes / self.bandwidth
+        time.sleep(done - now)
+
+    def _next_drop(self, begin, end):
+        with self._lock:
+            for drop in self._drops:
+                if drop['times'] > 0 and begin <= drop['offset'] < end:
+                    drop['times'] -= 1
+                    return drop['offset']
+        return None
+
+    def _resource(self, video):
+        return {'kind': 'youtube#video', 'id': video['id'], 'snippet': video['snippet'],
+                'status': video['status']}
+
+    # -- endpoints ---------------------------------------------------------
+
+    def _videos_insert(self, request, query):
+        if not self._charge('videos.insert'):
+            return self._error(403, 'quotaExceeded', "The request cannot be completed because you "
+                                                     "have exceeded your quota.")
+        try:
+            metadata = json.loads(_read_body(request.body) or b'{}')
+        except ValueError:
+            return self._error(400, 'parseError', "Metadata is not valid JSON")
+        title = metadata.get('snippet', {}).get('title', '')
+        if not title or len(title) > 100:
+            return self._error(400, 'invalidTitle', "The video title is missing or longer than 100 characters")
+
+        with self._lock:
+            upload_id = f"upload{len(self._sessions) + 1}"
+            self._sessions[upload_id] = {
+                'metadata': metadata,
+                'size': int(request.headers.get('X-Upload-Content-Length', 0)) or None,
+                'mimetype': request.headers.get('X-Upload-Content-Type'),
+                'received': 0,
+                'sha256': hashlib.sha256(),
+                'pending': bytearray()
+            }
+        location = (f"{API_HOST}/upload/youtube/v3/videos?uploadType=resumable"
+                    f"&part={query.get('part', 'snippet')}&upload_id={upload_id}")
+        return 200, b'', {'Location': location, 'Content-Length': '0'}
+
+    def _progress_reply(self, session):
+        headers = {'Content-Length': '0'}
+        if session['received']:
+            headers['Range'] = f"bytes=0-{session['received'] - 1}"
+        return 308, b'', headers
+
+    def _upload_status(self, request, query):
+        session = self._sessions.get(query['upload_id'])
+        if session is None:
+            return self._error(404, 'notFound', "Unknown upload session")
+        if 'video_id' in session:
+            return self._json(200, self._resource(self.videos[session['video_id']]))
+        return self._progress_reply(session)
+
+    def _upload_chunk(self, request, query):
+        import requests
+
+        session = self._sessions.get(query['upload_id'])
+        if session is None:
+            return self._error(404, 'notFound', "Unknown upload session")
+        content_range = request.headers.get('Content-Range', '')
+        try:
+            span, total = content_range[len('bytes '):].split('/')
+            begin, end = (int(value) for value in span.split('-'))
+        except ValueError:
+            return self._error(400, 'invalidRange', f"Bad Content-Range '{content_range}'")
+        if begin > session['received']:
+            return self._error(400, 'invalidRange',
+                               f"Chunk starts at {begin} but only {session['received']} bytes were received")
+        if total != '*':
+            session['size'] = int(total)
+
+        drop = self._next_drop(begin, end + 1)
+        offset = begin
+        for piece in _body_slices(request.body):
+            if drop is not None and offset + len(piece) > drop:
+                piece = piece[:drop - offset]
+            self._pace(len(piece))
+            # Bytes the server already has (a resent chunk) are skipped
+            skip = max(0, session['received'] - offset)
+            if skip < len(piece):
+                self._receive(session, piece[skip:])
+            offset += len(piece)
+            if drop is not None and offset >= drop:
+                # Only whole 256 KB blocks of an interrupted chunk are committed
+                session['received'] -= len(session['pending'])
+                session['pending'].clear()
+                raise requests.exceptions.ConnectionError(
+                    f"Fake connection dropped at byte {drop}", request=request
+                )
+
+        if session['size'] is not None and session['received'] >= session['size']:
+            return self._finish(session)
+        return self._progress_reply(session)
+
+    @staticmethod
+    def _receive(session, data):
+        session['received'] += len(data)
+        session['pending'] += data
+        if len(session['pending']) >= COMMIT_GRANULARITY:
+            whole = len(session['pending']) - len(session['pending']) % COMMIT_GRANULARITY
+            session['sha256'].update(session['pending'][:whole])
+            del session['pending'][:whole]
+
+    def _finish(self, session):
+        session['sha256'].update(session['pending'])
+        session['pending'].clear()
+        with self._lock:
+            video_id = f"FAKE{len(self.videos) + 1:07d}"
+            metadata = session['metadata']
+            self.videos[video_id] = {
+                'id': video_id,
+                'snippet': metadata.get('snippet', {}),
+                'status': dict(metadata.get('status', {}), uploadStatus='uploaded'),
+                'bytes': session['received'],
+                'mimetype': session['mimetype'],
+                'sha256': session['sha256'].hexdigest(),
+                'thumbnail': None
+            }
+            session['video_id'] = video_id
+        return self._json(200, self._resource(self.videos[video_id]))
+
+    def _videos_update(self, request, query):
+        if not self._charge('videos.update'):
+            return self._error(403, 'quotaExceeded')
+        body = json.loads(_read_body(request.body) or b'{}')
+        video = self.videos.get(body.get('id'))
+        if video is None:
+            return self._error(404, 'videoNotFound', f"Video '{body.get('id')}' not found")
+        with self._lock:
+            for part in query.get('part', '').split(','):
+                if part in body:
+                    video[part] = dict(video.get(part, {}), **body[part])
+        return self._json(200, self._resource(video))
+
+    def _videos_list(self, request, query):
+        if not self._charge('videos.list'):
+            return self._error(403, 'quotaExceeded')
+        ids = [video_id for video_id in query.get('id', '').split(',') if video_id]
+        items = [self._resource(self.videos[video_id]) for video_id in ids if video_id in self.videos]
+        return self._json(200, {'kind': 'youtube#videoListResponse', 'items': items,
+                                'pageInfo': {'totalResults': len(items), 'resultsPerPage': len(items)}})
+
+    def _thumbnails_set(self, request, query):
+        if not self._charge('thumbnails.set'):
+            return self._error(403, 'quotaExceeded')
+        video = self.videos.get(query.get('videoId'))
+        if video is None:
+            return self._error(404, 'videoNotFound', f"Video '{query.get('videoId')}' not found")
+        size = 0
+        for piece in _body_slices(request.body):
+            self._pace(len(piece))
+            size += len(piece)
+        video['thumbnail'] = {'bytes': size, 'mimetype': request.headers.get('Content-Type')}
+        url = f"https://i.ytimg.com/vi/{video['id']}/maxresdefault.jpg"
+        return self._json(200, {'kind': 'youtube#thumbnailSetResponse',
+                                'items': [{'default': {'url': url}}]})
+
+    def _channels_list(self, request, query):
+        if not self._charge('channels.list'):
+            return self._error(403, 'quotaExceeded')
+        return self._json(200, {'kind': 'youtube#channelListResponse',
+                                'items': [{'kind': 'youtube#channel', 'id': 'UCFAKEFAKEFAKEFAKEFAKE00'}]})
+
+    # -- inspection --------------------------------------------------------
+
+    def stats(self):
+        """{'requests': {endpoint: {status or 'dropped': count}}, 'videos', 'quota_used'}"""
+        counts = {}
+        with self._lock:
+            for entry in self.requests:
+                by_status = counts.setdefault(entry['endpoint'] or 'unknown', {})
+                by_status[entry['status']] = by_status.get(entry['status'], 0) + 1
+            return {'requests': counts, 'videos': len(self.videos), 'quota_used': self.quota_used}
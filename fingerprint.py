@@ -0,0 +1,21 @@
+import hashlib
+import os
+
+SAMPLE_SIZE = 1024 * 1024  # bytes hashed from the start, middle and end of the file
+
+
+def file_fingerprint(path):
+    """Cheap content fingerprint: file size plus hashes of three 1 MB samples.
+
+    Reading three fixed-size windows keeps this O(1) in file size while still
+    changing whenever a video is re-exported or trimmed.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+
+    with open(path, 'rb') as f:
+        for offset in (0, max(0, size // 2 - SAMPLE_SIZE // 2), max(0, size - SAMPLE_SIZE)):
+            f.seek(offset)
+            digest.update(f.read(SAMPLE_SIZE))
+
+    return digest.hexdigest()[:32]
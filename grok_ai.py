@@ -1,33 +1,269 @@
 import os
-from groq import Groq
 from dotenv import load_dotenv
 import json
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from prompt_builder import PromptBuilder, count_tokens, truncate_to_tokens
+from json_stream import IncrementalJSONFields
+from rate_limiter import TASK_PRIORITIES, get_shared_limiter
+from llm_backends import LLMBackendError, create_backend
+import tracing
 
 # Load environment variables
 load_dotenv()
 
+# Batched metadata: completion tokens per video, the shared instruction preamble,
+# and the least analysis per video worth sending
+BATCH_COMPLETION_TOKENS = 750
+BATCH_PREAMBLE_TOKENS = 400
+BATCH_MIN_ANALYSIS_TOKENS = 500
+
 class GrokAI:
-    def __init__(self):
-        self.api_key = os.getenv('GROK_API_KEY')
-        if not self.api_key:
-            raise ValueError("GROK_API_KEY not found in environment variables. Please add it to your .env file.")
+    def __init__(self, backend=None):
+        # Groq cloud by default; LLM_BACKEND=local|fake swaps in a stand-in
+        self.backend = backend or create_backend()
+        self.model = "llama-3.1-8b-instant"  # Default for tasks without a route
+        
+        # Per-call prompt token budgets; instructions always fit, analysis is trimmed
+        self.prompt_budgets = {
+            'title': 1500,
+            'description': 1800,
+            'chapters': 900,
+            'thumbnail_concept': 900,
+            'tags': 1000,
+            'batch_metadata': 6000
+        }
+        self.usage_log = []
+        self.streaming = os.getenv('GROK_STREAMING', 'true').lower() == 'true'
+        self.max_rate_limit_retries = 3
+        self._rate_limiters = {}
+        
+        # Model tiers per task: first entry is preferred, the rest are fallbacks
+        # (also raced as hedges). Override with e.g. GROK_MODELS_TITLE=model_a,model_b
+        self.model_routes = {
+            'title': ['llama-3.3-70b-versatile', 'llama-3.1-8b-instant'],
+            'description': ['llama-3.1-8b-instant', 'llama-3.3-70b-versatile'],
+            'chapters': ['llama-3.1-8b-instant', 'llama-3.3-70b-versatile'],
+            'tags': ['llama-3.1-8b-instant', 'llama-3.3-70b-versatile'],
+            'thumbnail_concept': ['llama-3.1-8b-instant', 'llama-3.3-70b-versatile'],
+            'batch_metadata': ['llama-3.1-8b-instant', 'llama-3.3-70b-versatile']
+        }
+        for task in self.model_routes:
+            override = os.getenv(f'GROK_MODELS_{task.upper()}')
+            if override:
+                self.model_routes[task] = [m.strip() for m in override.split(',') if m.strip()]
+        
+        # Seconds to wait on the primary model before racing the next tier;
+        # only the title is on the critical path by default
+        self.hedge_after = {'title': float(os.getenv('GROK_HEDGE_AFTER', '4.0'))}
+        self.latency_samples = {}
+        self._latency_lock = threading.Lock()
+        self._hedge_executor = None
+    
+    def shutdown(self):
+        """Release the hedging threads; a losing call still running finishes and refunds its tokens"""
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False, cancel_futures=True)
+            self._hedge_executor = None
+    
+    def _rate_limiter_for(self, model):
+        if not self.backend.rate_limited:
+            return None
+        if model not in self._rate_limiters:
+            self._rate_limiters[model] = get_shared_limiter(model)
+        return self._rate_limiters[model]
+    
+    def latency_stats(self):
+        """p50/p95 latency per model over the recent calls"""
+        stats = {}
+        with self._latency_lock:
+            for model, samples in self.latency_samples.items():
+                ordered = sorted(samples)
+                stats[model] = {
+                    'count': len(ordered),
+                    'p50': ordered[int(0.50 * (len(ordered) - 1))],
+                    'p95': ordered[int(0.95 * (len(ordered) - 1))]
+                }
+        return stats
+    
+    def _hedge_delay(self, task, model):
+        """Hedge threshold: the configured delay, stretched to the model's p95 once known"""
+        base = self.hedge_after.get(task)
+        if base is None:
+            return None
+        with self._latency_lock:
+            samples = sorted(self.latency_samples.get(model, []))
+        if len(samples) >= 10:
+            return max(base, samples[int(0.95 * (len(samples) - 1))])
+        return base
+    
+    def _complete(self, task, prompt, temperature, max_tokens, on_text=None, on_restart=None):
+        """Run one chat completion on the task's model tiers.
+        
+        Models are tried in order: an error moves on to the next tier, and if
+        the current one is slower than the hedge threshold the next tier is
+        raced against it and the first to answer wins. When on_text is given
+        the completion is streamed and only the model that produced the first
+        token forwards its deltas. If that model fails mid-stream, on_restart()
+        is called so the caller can discard the text it has seen so far, and
+        the next model to start streaming from its first token takes over.
+        """
+        pending = list(self.model_routes.get(task, [self.model]))
+        running = {}
+        stashed = {}
+        errors = []
+        winner = {'model': None}
+        muted = set()  # models whose stream started while another was forwarding
+        winner_lock = threading.Lock()
         
-        self.client = Groq(api_key=self.api_key)
-        self.model = "llama-3.1-8b-instant"  # Updated to current model
+        def forward_from(model):
+            if on_text is None:
+                return None
+            
+            def forward(delta):
+                with winner_lock:
+                    if winner['model'] is None and model not in muted:
+                        winner['model'] = model
+                    elif winner['model'] != model:
+                        muted.add(model)
+                        return
+                on_text(delta)
+            return forward
+        
+        def launch():
+            model = pending.pop(0)
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=4)
+            future = self._hedge_executor.submit(tracing.wrap(self._call_model), task, model, prompt,
+                                                 temperature, max_tokens, forward_from(model))
+            running[future] = model
+        
+        launch()
+        hedged = False
+        while running:
+            primary = next(iter(running.values()))
+            timeout = self._hedge_delay(task, primary) if pending and not hedged else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            if not done:
+                hedged = True
+                print(f"   🏁 {task}: {primary} is slow, racing {pending[0]}...")
+                launch()
+                continue
+            
+            for future in done:
+                model = running.pop(future)
+                try:
+                    content = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    print(f"   ⚠️ {task}: {model} failed ({e})")
+                    with winner_lock:
+                        restarted = winner['model'] == model
+                        if restarted:
+                            winner['model'] = None
+                    if restarted and on_restart:
+                        on_restart()
+                    if pending and not running:
+                        print(f"   ↪️ {task}: falling back to {pending[0]}")
+                        launch()
+                    continue
+                
+                # When streaming, the text already shown came from the first-token model
+                if on_text is not None and winner['model'] not in (None, model):
+                    stashed[model] = content
+                    continue
+                return content
+            
+            if not running and stashed:
+                return next(iter(stashed.values()))
+        
+        if stashed:
+            return next(iter(stashed.values()))
+        raise errors[-1] if errors else LLMBackendError(f"No model available for {task}")
+    
+    def _call_model(self, task, model, prompt, temperature, max_tokens, on_text=None):
+        """Run one chat completion on one model and record token usage and latency"""
+        with tracing.span('llm.call', task=task, model=model, backend=self.backend.name) as span:
+            rate_limiter = self._rate_limiter_for(model)
+            
+            # Reserve the worst case (prompt + max_tokens) and refund once usage is known
+            reserved_tokens = count_tokens(prompt) + max_tokens
+            priority = TASK_PRIORITIES.get(task, 5)
+            
+            for attempt in range(self.max_rate_limit_retries + 1):
+                if rate_limiter:
+                    # Capped at the limiter's tokens/minute, so refunds use what was really taken
+                    taken_tokens = rate_limiter.acquire(reserved_tokens, priority)
+                start = time.perf_counter()
+                try:
+                    result = self.backend.complete(model, prompt, temperature, max_tokens, on_text)
+                    break
+                except LLMBackendError as e:
+                    if (not rate_limiter or e.status_code != 429 or
+                            attempt == self.max_rate_limit_retries):
+                        if rate_limiter:
+                            rate_limiter.record_usage(taken_tokens, 0)
+                        raise
+                    # The rejected call used nothing; the headers then say what is left
+                    rate_limiter.record_usage(taken_tokens, 0)
+                    rate_limiter.update_from_headers(e.headers, rate_limited=True)
+                    print(f"   ⏳ {task}: {model} rate limited by {self.backend.name}, waiting for the next window...")
+            
+            if rate_limiter:
+                rate_limiter.update_from_headers(result['headers'])
+            content = result['content'] or ''
+            latency = time.perf_counter() - start
+            
+            with self._latency_lock:
+                self.latency_samples.setdefault(model, deque(maxlen=200)).append(latency)
+            
+            entry = {
+                'task': task,
+                'model': model,
+                'backend': self.backend.name,
+                'prompt_tokens': result['prompt_tokens'] or count_tokens(prompt),
+                'completion_tokens': result['completion_tokens'] or count_tokens(content),
+                'latency': latency,
+                'time_to_first_token': result['time_to_first_token'],
+                'finish_reason': result['finish_reason']
+            }
+            self.usage_log.append(entry)
+            span.set('prompt_tokens', entry['prompt_tokens'])
+            span.set('completion_tokens', entry['completion_tokens'])
+            if entry['time_to_first_token'] is not None:
+                span.set('time_to_first_token', round(entry['time_to_first_token'], 4))
+            if rate_limiter:
+                rate_limiter.record_usage(taken_tokens,
+                                          entry['prompt_tokens'] + entry['completion_tokens'])
+            print(f"   🔢 {task} [{model}]: {entry['prompt_tokens']} prompt + {entry['completion_tokens']} "
+                  f"completion tokens in {latency:.1f}s")
+            if entry['finish_reason'] == 'length':
+                print(f"   ⚠️ {task} hit max_tokens={max_tokens} and was truncated")
+            
+            return content
     
-    def generate_title(self, video_analysis, custom_prompt=None):
-        """Generate an engaging YouTube title based on video analysis"""
+    def generate_title(self, video_analysis, custom_prompt=None, on_title=None):
+        """Generate an engaging YouTube title based on video analysis
+        
+        With streaming enabled, on_title(title) is called as soon as the
+        "selected" field has been received, before the rest of the JSON.
+        """
         
-        base_prompt = f"""
+        builder = PromptBuilder(self.prompt_budgets['title'])
+        builder.add("""
 You are a YouTube SEO expert specializing in creating viral, engaging titles. Based on the detailed video analysis below, create a compelling YouTube title that matches the ACTUAL CONTENT of the video.
 
 IMPORTANT: Use the video analysis to understand what the video is REALLY about, then create a title that accurately reflects that content while being engaging.
-
-{video_analysis}
-
+""")
+        builder.add(video_analysis, priority=2, truncatable=True)
+        builder.add(f"""
 Additional Context: {custom_prompt if custom_prompt else "No additional context provided."}
-
+""", priority=1, truncatable=True)
+        builder.add("""
 Create a title that:
 1. ACCURATELY reflects the video content based on the analysis above
 2. Is 40-100 characters long
@@ -41,33 +277,61 @@ Examples of good titles for different content types:
 - Entertainment/Dynamic: "[Number] [Adjective] [Things] That Will [Action]"
 - Interview/Talking: "[Person] Reveals [Secret/Truth] About [Topic]"
 
-Generate 3 title options and select the best one. Format as JSON:
-{{
-    "options": ["title1", "title2", "title3"],
+Generate 3 title options and select the best one. Format as JSON, with "selected" FIRST:
+{
     "selected": "best_title_here",
+    "options": ["title1", "title2", "title3"],
     "reasoning": "why this title matches the video content and will perform well"
-}}
-"""
+}
+""")
+        
+        start = time.perf_counter()
+        early = {}
+        parser = IncrementalJSONFields()
+        
+        def on_text(delta):
+            for key, value in parser.feed(delta):
+                if key == 'selected' and 'title' not in early and self._clean_title(value):
+                    early['title'] = self._clean_title(value)
+                    early['time_to_title'] = time.perf_counter() - start
+                    print(f"   ✨ Title ready after {early['time_to_title']:.2f}s: {early['title']}")
+                    if on_title and not early.get('restarted'):
+                        on_title(early['title'])
+        
+        def on_restart():
+            # The model that streamed so far failed: parse the fallback from
+            # scratch, but leave restarting the dependents to the caller, who
+            # compares the final title against the one already announced
+            parser.reset()
+            early.clear()
+            early['restarted'] = True
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": base_prompt}],
-                temperature=0.8,
-                max_tokens=500
-            )
-            
-            content = response.choices[0].message.content
+            content = self._complete('title', builder.build(), temperature=0.8, max_tokens=500,
+                                     on_text=on_text if self.streaming else None, on_restart=on_restart)
+            if not self.streaming:
+                on_text(content)
+            time_to_title = early.get('time_to_title', time.perf_counter() - start)
             
             # Try to parse JSON response
             try:
                 result = json.loads(content)
                 return {
-                    'title': result['selected'],
+                    'title': self._clean_title(result['selected']),
                     'options': result.get('options', []),
-                    'reasoning': result.get('reasoning', '')
+                    'reasoning': result.get('reasoning', ''),
+                    'time_to_title': time_to_title
                 }
-            except json.JSONDecodeError:
+            except (json.JSONDecodeError, KeyError):
+                if 'title' in early:
+                    # The stream gave us a title even though the full JSON is malformed
+                    return {
+                        'title': early['title'],
+                        'options': [early['title']],
+                        'reasoning': parser.fields.get('reasoning', ''),
+                        'time_to_title': time_to_title
+                    }
+                
                 # Fallback: extract title from text - look for actual title content
                 lines = content.strip().split('\n')
                 best_title = None
@@ -95,25 +359,32 @@ Generate 3 title options and select the best one. Format as JSON:
                 return {
                     'title': best_title[:100], 
                     'options': [best_title], 
-                    'reasoning': 'Extracted from AI response'
+                    'reasoning': 'Extracted from AI response',
+                    'time_to_title': time_to_title
                 }
                 
         except Exception as e:
             print(f"Error generating title: {e}")
             return {'title': 'Awesome Video Content', 'options': [], 'reasoning': 'Error occurred'}
     
+    def _clean_title(self, title):
+        """The form a title is compared and uploaded in (streamed or parsed)"""
+        return str(title).strip().strip('"').strip()[:100]
+    
     def generate_description(self, video_analysis, title, custom_prompt=None):
         """Generate a comprehensive YouTube description"""
         
-        base_prompt = f"""
+        builder = PromptBuilder(self.prompt_budgets['description'])
+        builder.add("""
 You are a YouTube content expert. Create a comprehensive, engaging video description based on the ACTUAL video content analysis provided.
 
-DETAILED VIDEO ANALYSIS:
-{video_analysis}
-
-Title: {title}
-Additional Context: {custom_prompt if custom_prompt else "No additional context provided."}
-
+DETAILED VIDEO ANALYSIS:""")
+        builder.add(video_analysis, priority=2, truncatable=True)
+        builder.add(f"""
+Title: {title}""")
+        builder.add(f"""Additional Context: {custom_prompt if custom_prompt else "No additional context provided."}
+""", priority=1, truncatable=True)
+        builder.add("""
 Write a description that:
 1. MATCHES the actual video content based on the analysis above
 2. Starts with a compelling hook that relates to the video's content type
@@ -121,6 +392,7 @@ Write a description that:
 4. Uses natural keywords that match the content type and style
 5. Is 200-800 words long
 6. Includes clear structure with paragraphs
+7. Does NOT contain timestamps or chapter lists (real chapters are added separately)
 
 Content-specific guidelines:
 - If it's a tutorial/presentation: Focus on what skills/knowledge viewers gain
@@ -136,60 +408,98 @@ Structure:
 - Relevant hashtags (3-5 based on content analysis)
 
 Write in an engaging, natural tone that matches the video's style and pacing.
-"""
+""")
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": base_prompt}],
-                temperature=0.7,
-                max_tokens=1000
-            )
-            
-            description = response.choices[0].message.content.strip()
-            
-            # Clean up the description - remove any leading instruction text
-            lines = description.split('\n')
-            cleaned_lines = []
+            description = self._complete('description', builder.build(),
+                                         temperature=0.7, max_tokens=1200).strip()
+            return self._clean_description(description)
             
-            skip_until_content = True
-            for line in lines:
-                line = line.strip()
-                # Skip intro text about being a YouTube expert, etc.
-                if skip_until_content:
-                    if (line and 
-                        not line.lower().startswith('you are') and
-                        not line.lower().startswith('create') and
-                        not line.lower().startswith('based on') and
-                        len(line) > 20):
-                        skip_until_content = False
-                        cleaned_lines.append(line)
-                else:
+        except Exception as e:
+            print(f"Error generating description: {e}")
+            return f"Check out this amazing video content!\n\n{title}\n\nDon't forget to like and subscribe for more great content!"
+    
+    def _clean_description(self, description):
+        """Strip leading instruction echoes and markdown from a generated description"""
+        # Clean up the description - remove any leading instruction text
+        lines = description.split('\n')
+        cleaned_lines = []
+        
+        skip_until_content = True
+        for line in lines:
+            line = line.strip()
+            # Skip intro text about being a YouTube expert, etc.
+            if skip_until_content:
+                if (line and 
+                    not line.lower().startswith('you are') and
+                    not line.lower().startswith('create') and
+                    not line.lower().startswith('based on') and
+                    len(line) > 20):
+                    skip_until_content = False
                     cleaned_lines.append(line)
+            else:
+                cleaned_lines.append(line)
+        
+        if cleaned_lines:
+            description = '\n'.join(cleaned_lines)
+        
+        # Remove markdown formatting
+        description = re.sub(r'\*\*', '', description)  # Remove markdown bold
+        description = re.sub(r'\n{3,}', '\n\n', description)  # Limit line breaks
+        return description[:4000]  # YouTube description limit
+    
+    def generate_chapter_titles(self, chapter_summaries, title, chapter_count):
+        """Generate short chapter titles from compact per-chapter summaries"""
+        
+        builder = PromptBuilder(self.prompt_budgets['chapters'])
+        builder.add(f"""
+You are naming YouTube chapters for the video "{title}".
+
+Each line below is one chapter with its time range and what the video looks like during it:""")
+        builder.add(chapter_summaries, priority=1, truncatable=True)
+        builder.add(f"""
+Write one short chapter title (2-6 words) for each of the {chapter_count} chapters, in order.
+The first chapter should read like an introduction. Do not include timestamps.
+
+Return ONLY a JSON array of {chapter_count} strings.
+""")
+        
+        try:
+            content = self._complete('chapters', builder.build(), temperature=0.6,
+                                     max_tokens=30 * chapter_count + 50).strip()
             
-            if cleaned_lines:
-                description = '\n'.join(cleaned_lines)
-            
-            # Remove markdown formatting
-            description = re.sub(r'\*\*', '', description)  # Remove markdown bold
-            description = re.sub(r'\n{3,}', '\n\n', description)  # Limit line breaks
-            description = description[:4000]  # YouTube description limit
+            # Pull the JSON array out even if the model wrapped it in prose
+            match = re.search(r'\[.*\]', content, re.DOTALL)
+            if match:
+                try:
+                    titles = json.loads(match.group(0))
+                    return [str(t).strip()[:60] for t in titles][:chapter_count]
+                except json.JSONDecodeError:
+                    pass
             
-            return description
+            # Fallback: one title per non-empty line
+            titles = []
+            for line in content.split('\n'):
+                clean_line = re.sub(r'^\d+[\.\)]\s*', '', line.strip()).strip('"\',').strip()
+                if clean_line and not clean_line.startswith(('[', ']')):
+                    titles.append(clean_line[:60])
+            return titles[:chapter_count]
             
         except Exception as e:
-            print(f"Error generating description: {e}")
-            return f"Check out this amazing video content!\n\n{title}\n\nDon't forget to like and subscribe for more great content!"
+            print(f"Error generating chapter titles: {e}")
+            return []
     
     def generate_thumbnail_concept(self, video_analysis, title):
         """Generate a concept for thumbnail design"""
         
-        prompt = f"""
+        builder = PromptBuilder(self.prompt_budgets['thumbnail_concept'])
+        builder.add(f"""
 Based on this video analysis and title, create a thumbnail concept:
 
 Title: {title}
-Video Analysis: {video_analysis}
-
+Video Analysis:""")
+        builder.add(video_analysis, priority=1, truncatable=True)
+        builder.add("""
 Describe a compelling YouTube thumbnail concept that:
 1. Complements the title
 2. Uses vibrant, contrasting colors
@@ -206,17 +516,11 @@ Provide a detailed description of:
 - Emotional tone
 
 Keep it concise and actionable for thumbnail creation.
-"""
+""")
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=400
-            )
-            
-            return response.choices[0].message.content.strip()
+            return self._complete('thumbnail_concept', builder.build(),
+                                  temperature=0.7, max_tokens=400).strip()
             
         except Exception as e:
             print(f"Error generating thumbnail concept: {e}")
@@ -225,13 +529,15 @@ Keep it concise and actionable for thumbnail creation.
     def generate_tags(self, title, description, video_analysis):
         """Generate relevant tags for the video"""
         
-        prompt = f"""
+        builder = PromptBuilder(self.prompt_budgets['tags'])
+        builder.add(f"""
 Generate 15-20 relevant YouTube tags based on:
 
-Title: {title}
-Description: {description[:300]}...
-Video Analysis: {video_analysis}
-
+Title: {title}""")
+        builder.add(f"Description: {description}", priority=2, truncatable=True)
+        builder.add("Video Analysis:")
+        builder.add(video_analysis, priority=1, truncatable=True)
+        builder.add("""
 Tags should be:
 1. Relevant to the content
 2. Mix of broad and specific terms
@@ -240,17 +546,10 @@ Tags should be:
 5. Avoid tag stuffing
 
 Return as a comma-separated list of tags.
-"""
+""")
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.6,
-                max_tokens=300
-            )
-            
-            tags_text = response.choices[0].message.content.strip()
+            tags_text = self._complete('tags', builder.build(), temperature=0.6, max_tokens=300).strip()
             
             # Clean and format tags - handle different response formats
             if ',' in tags_text:
@@ -275,20 +574,149 @@ Return as a comma-separated list of tags.
                 if current_tag:
                     tags.append(current_tag)
             
-            # Filter and clean tags
-            cleaned_tags = []
-            for tag in tags:
-                clean_tag = re.sub(r'^\d+\.?\s*', '', tag)  # Remove numbering
-                clean_tag = clean_tag.strip().strip('"\'').strip()
-                if (clean_tag and 
-                    len(clean_tag) > 1 and 
-                    len(clean_tag) <= 30 and
-                    not clean_tag.lower().startswith('here') and
-                    not clean_tag.lower().startswith('tags')):
-                    cleaned_tags.append(clean_tag)
-            
-            return cleaned_tags[:15]  # Limit to 15 tags
+            return self._clean_tags(tags)
             
         except Exception as e:
             print(f"Error generating tags: {e}")
-            return ['video', 'content', 'youtube', 'awesome']
\ No newline at end of file
+            return ['video', 'content', 'youtube', 'awesome']
+    
+    def _clean_tags(self, tags):
+        """Filter and clean tags"""
+        cleaned_tags = []
+        for tag in tags:
+            clean_tag = re.sub(r'^\d+\.?\s*', '', str(tag))  # Remove numbering
+            clean_tag = clean_tag.strip().strip('"\'').strip()
+            if (clean_tag and 
+                len(clean_tag) > 1 and 
+                len(clean_tag) <= 30 and
+                not clean_tag.lower().startswith('here') and
+                not clean_tag.lower().startswith('tags')):
+                cleaned_tags.append(clean_tag)
+        
+        return cleaned_tags[:15]  # Limit to 15 tags
+    
+    def generate_batch_metadata(self, items, batch_size=None):
+        """Generate title/description/tags/thumbnail concept for several videos at once.
+        
+        items: dicts with 'id', 'analysis', optional 'custom_prompt',
+        'chapter_summaries' and 'chapter_count'. Videos are packed into
+        multi-item prompts that share one instruction preamble, and the JSON
+        reply is split back per video. Returns {id: result}; ids whose result
+        is missing or invalid are left out so the caller can fall back.
+        """
+        batch_size, prompt_budget = self._fit_batch(batch_size or int(os.getenv('GROK_BATCH_SIZE', '4')))
+        results = {}
+        
+        for offset in range(0, len(items), batch_size):
+            batch = items[offset:offset + batch_size]
+            builder = PromptBuilder(prompt_budget)
+            builder.add(f"""
+You are a YouTube SEO expert. Below are {len(batch)} videos, each with an analysis of its ACTUAL content.
+For EVERY video, write metadata that accurately reflects that video's content:
+- "title": engaging, 40-100 characters, no misleading clickbait
+- "options": 3 alternative titles
+- "description": 150-300 words; hook, what viewers will see/learn, call to action, 3-5 hashtags; no timestamps
+- "tags": 10-15 tags mixing broad and specific terms
+- "thumbnail_concept": 1-2 sentences on visuals, colors and text overlay
+- "chapter_titles": one 2-6 word title per listed chapter (empty list if none are listed)
+
+Return ONLY a JSON object keyed by video id, e.g. {{"1": {{"title": "...", "options": [...], "description": "...", "tags": [...], "thumbnail_concept": "...", "chapter_titles": [...]}}}}
+""")
+            # Each video gets an equal share of the budget so no single analysis crowds out the rest
+            per_item_budget = (prompt_budget - BATCH_PREAMBLE_TOKENS) // len(batch)
+            for item in batch:
+                section = f"=== VIDEO {item['id']} ===\n{item['analysis']}"
+                if item.get('custom_prompt'):
+                    section += f"\nAdditional Context: {item['custom_prompt']}"
+                if item.get('chapter_summaries'):
+                    section += f"\nChapters ({item['chapter_count']}):\n{item['chapter_summaries']}"
+                builder.add(truncate_to_tokens(section, per_item_budget), priority=1, truncatable=True)
+            
+            try:
+                content = self._complete('batch_metadata', builder.build(), temperature=0.7,
+                                         max_tokens=self._batch_max_tokens(len(batch)))
+                match = re.search(r'\{.*\}', content, re.DOTALL)
+                parsed = json.loads(match.group(0)) if match else {}
+            except Exception as e:
+                print(f"Error generating batch metadata: {e}")
+                parsed = {}
+            
+            for item in batch:
+                result = self._validate_batch_result(parsed.get(item['id']), item.get('chapter_count', 0))
+                if result:
+                    results[item['id']] = result
+        
+        return results
+    
+    @staticmethod
+    def _batch_max_tokens(videos):
+        return min(8000, BATCH_COMPLETION_TOKENS * videos + 100)
+    
+    def _fit_batch(self, batch_size):
+        """Shrink a batch until its prompt and completion fit one minute of the token limit.
+        
+        Returns (batch_size, prompt_budget). A reservation above GROQ_TPM could
+        never be granted in full, and the provider would reject the call.
+        """
+        prompt_budget = self.prompt_budgets['batch_metadata']
+        rate_limiter = self._rate_limiter_for(self.model_routes['batch_metadata'][0])
+        if not rate_limiter:
+            return batch_size, prompt_budget
+        tokens_per_minute = rate_limiter.tokens_per_minute
+        while batch_size > 1 and BATCH_PREAMBLE_TOKENS + batch_size * BATCH_MIN_ANALYSIS_TOKENS + \
+                self._batch_max_tokens(batch_size) > tokens_per_minute:
+            batch_size -= 1
+        return batch_size, min(prompt_budget, tokens_per_minute - self._batch_max_tokens(batch_size))
+    
+    def _validate_batch_result(self, data, chapter_count):
+        """Check one video's slice of a batched reply; returns cleaned metadata or None"""
+        if not isinstance(data, dict):
+            return None
+        
+        title = str(data.get('title') or '').strip().strip('"\'')
+        description = str(data.get('description') or '').strip()
+        tags = data.get('tags') or []
+        if isinstance(tags, str):
+            tags = tags.split(',')
+        tags = self._clean_tags(tags)
+        
+        if not (10 <= len(title) <= 100) or len(description) < 100 or len(tags) < 3:
+            return None
+        
+        options = [str(o).strip() for o in data.get('options') or [] if str(o).strip()]
+        chapter_titles = [str(t).strip()[:60] for t in data.get('chapter_titles') or []]
+        return {
+            'title': title,
+            'options': options or [title],
+            'description': self._clean_description(description),
+            'tags': tags,
+            'thumbnail_concept': str(data.get('thumbnail_concept') or '').strip(),
+            'chapter_titles': chapter_titles[:chapter_count]
+        }
+
+if __name__ == "__main__":
+    # Compare time-to-first-usable-title between blocking and streaming completions
+    import sys
+    
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'r', encoding='utf-8') as f:
+            sample_analysis = f.read()
+    else:
+        sample_analysis = ("Detailed Video Content Analysis:\n- Duration: 8:30 minutes\n"
+                           "- Likely content type: tutorial/presentation\n- Text/graphics present: Yes")
+    runs = 3
+    grok = GrokAI()
+    
+    for streaming in (False, True):
+        grok.streaming = streaming
+        timings = []
+        for _ in range(runs):
+            result = grok.generate_title(sample_analysis)
+            if result.get('time_to_title') is not None:
+                timings.append(result['time_to_title'])
+        label = "streaming" if streaming else "blocking"
+        if timings:
+            timings.sort()
+            print(f"⏱️ {label}: median time-to-title {timings[len(timings) // 2]:.2f}s over {len(timings)} runs")
+        else:
+            print(f"⏱️ {label}: no successful runs")
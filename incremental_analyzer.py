@@ -0,0 +1,340 @@
+"""
+Incremental analysis of recordings that are still being written.
+
+OBS and capture tools append to the output file for as long as the stream
+runs, and a one-shot analysis of such a file sees a truncated frame count.
+IncrementalAnalyzer instead picks up from the last analyzed timestamp on
+every update(), feeds the new frames to the streaming scene detector and
+folds sampled frames into FrameMetrics accumulators (Welford mean/variance
+for brightness and motion, a summed colour histogram, the top-K thumbnail
+candidates). The audio track is decoded from where the last update stopped
+(ffmpeg -ss) into the same kind of running totals, and the frames the
+near-duplicate fingerprint may sample are hashed as they are decoded. The
+aggregates live in a small JSON state file, so a restarted watcher resumes
+where it stopped.
+
+Once recording ends, finalize() only decodes what was appended since the
+last update (video and audio) and reads back the thumbnail candidates. For
+recordings longer than about 11 minutes at 30 fps the fingerprint grid has
+been thinned, which adds up to 16 single-frame seeks.
+
+Record to MKV, FLV or TS: an MP4 has no index until recording stops, so it
+can only be analyzed after the fact.
+
+    python incremental_analyzer.py recording.mkv            # watch until the file stops growing
+    python incremental_analyzer.py recording.mkv --upload   # ...then upload it right away
+
+AIYouTubeUploader reuses a finalized analysis for the same, unchanged file.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import cv2
+
+import tracing
+from analysis_accumulators import FrameMetrics
+from audio_analyzer import AudioAnalyzer, AudioTotals
+from enhanced_video_analyzer import SimpleVideoAnalyzer
+from video_fingerprint import FingerprintGrid
+
+STATE_VERSION = 3
+
+
+class AnalysisState:
+    """Everything needed to continue analyzing a growing file, as plain JSON"""
+
+    def __init__(self, data=None, key_frame_count=5, stride=5):
+        data = data or {}
+        self.version = data.get('version', STATE_VERSION)
+        self.file_size = data.get('file_size', 0)
+        self.mtime = data.get('mtime', 0.0)
+        self.fps = data.get('fps', 0.0)
+        self.resolution = tuple(data.get('resolution', (0, 0)))
+        self.position = data.get('position', -1.0)  # timestamp of the last analyzed frame
+        self.frames = data.get('frames', 0)
+        self.next_sample = data.get('next_sample', 0.0)
+        self.metrics = FrameMetrics.from_dict(data.get('metrics'), key_frame_count)
+        self.fingerprint_grid = FingerprintGrid(stride, data=data.get('fingerprint_grid'))
+        self.audio = AudioTotals(len(AudioAnalyzer.LOUDNESS_BINS), data.get('audio'))
+        self.scenes = data.get('scenes')
+        self.finished = data.get('finished', False)
+        self.video_info = data.get('video_info')
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'file_size': self.file_size,
+            'mtime': self.mtime,
+            'fps': self.fps,
+            'resolution': list(self.resolution),
+            'position': self.position,
+            'frames': self.frames,
+            'next_sample': self.next_sample,
+            'metrics': self.metrics.to_dict(),
+            'fingerprint_grid': self.fingerprint_grid.to_dict(),
+            'audio': self.audio.to_dict(),
+            'scenes': self.scenes,
+            'finished': self.finished,
+            'video_info': self.video_info
+        }
+
+
+def default_state_path(video_path):
+    digest = hashlib.sha1(os.path.abspath(video_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join('.cache', 'incremental', f"{os.path.basename(video_path)}.{digest}.json")
+
+
+class IncrementalAnalyzer(SimpleVideoAnalyzer):
+    """SimpleVideoAnalyzer that can run repeatedly over a file while it grows"""
+
+    def __init__(self, video_path, state_path=None, scene_stride=5, sample_seconds=2.0, key_frame_count=5,
+                 analyze_audio=True):
+        super().__init__(video_path, scene_stride=scene_stride, analyze_audio=analyze_audio)
+        self.state_path = state_path or default_state_path(video_path)
+        self.sample_seconds = sample_seconds
+        self.key_frame_count = key_frame_count
+        self.audio_failed = False  # the last audio pass failed; its blocks are retried next update
+        self.state = self._load_state()
+
+    def _load_state(self):
+        stride = self.scene_detector.stride
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = AnalysisState(json.load(f), self.key_frame_count, stride)
+        except (OSError, ValueError):
+            return AnalysisState(key_frame_count=self.key_frame_count, stride=stride)
+        size = os.path.getsize(self.video_path) if os.path.exists(self.video_path) else 0
+        if state.version != STATE_VERSION or size < state.file_size:
+            # A new recording reused the name (or an older state format)
+            return AnalysisState(key_frame_count=self.key_frame_count, stride=stride)
+        if state.scenes:
+            self.scene_detector.load_state(state.scenes)
+        return state
+
+    def save_state(self):
+        """Write the state atomically (safe to call at any point between updates)"""
+        self.state.scenes = self.scene_detector.state_dict()
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp',
+                                         encoding='utf-8') as f:
+            # Numpy scalars (e.g. in dominant_colors) are stored as plain numbers
+            json.dump(self.state.to_dict(), f,
+                      default=lambda value: value.item() if hasattr(value, 'item') else str(value))
+        os.replace(f.name, self.state_path)
+
+    def _process(self, frame, timestamp, sample):
+        if frame is None:
+            return
+        if self.state.frames % self.scene_detector.stride == 0:
+            self.scene_detector.process_frame(frame, timestamp)
+            self.state.fingerprint_grid.offer(self.state.frames, frame)
+        if sample:
+            # Motion against the previous sample is only lost once after a restart
+            self.state.metrics.add_frame(frame, timestamp)
+
+    def update(self, final=False):
+        """Analyze frames (and audio) appended since the last call; returns how many frames were analyzed.
+
+        The newest frame is only analyzed once the frame after it decodes (or
+        when final=True), so a frame still being written is never used. Audio
+        is only read up to the last analyzed frame until final=True.
+        """
+        if self.state.finished or not os.path.exists(self.video_path):
+            return 0
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            return 0
+        state = self.state
+        state.fps = cap.get(cv2.CAP_PROP_FPS) or state.fps or 30.0
+        state.resolution = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        if state.position >= 0:
+            # Lands on the keyframe before the position; frames up to it are skipped below
+            cap.set(cv2.CAP_PROP_POS_MSEC, state.position * 1000)
+
+        analyzed = 0
+        pending = None
+        with tracing.span('decode', incremental=True) as decode_span:
+            while cap.grab():
+                timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+                if timestamp <= state.position:
+                    continue
+                if pending:
+                    self._process(*pending)
+                    state.frames += 1
+                    state.position = pending[1]
+                    analyzed += 1
+                sample = timestamp >= state.next_sample
+                frame = None
+                if sample or state.frames % self.scene_detector.stride == 0:
+                    ret, frame = cap.retrieve()
+                    frame = frame if ret else None
+                if sample:
+                    state.next_sample = timestamp + self.sample_seconds
+                pending = (frame, timestamp, sample)
+            if pending and final:
+                self._process(*pending)
+                state.frames += 1
+                state.position = pending[1]
+                analyzed += 1
+            decode_span.set('frames_analyzed', analyzed)
+        cap.release()
+
+        if self.audio_analyzer and self.audio_analyzer.ffmpeg_path and (analyzed or final):
+            with tracing.span('audio', incremental=True) as audio_span:
+                blocks = state.audio.blocks
+                self.audio_failed = not self.audio_analyzer.accumulate(
+                    state.audio, until=None if final else state.position, final=final)
+                audio_span.set('blocks', state.audio.blocks - blocks)
+                if self.audio_failed:
+                    audio_span.set('error', 'ffmpeg failed')
+
+        stat = os.stat(self.video_path)
+        state.file_size, state.mtime = stat.st_size, stat.st_mtime
+        return analyzed
+
+    def _read_frame(self, index):
+        """The BGR frame at an index, or None (for fingerprint samples no longer on the grid)"""
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = cap.read()
+            return frame if ret else None
+        finally:
+            cap.release()
+
+    def _read_key_frames(self):
+        """The thumbnail candidates as RGB frames, in timestamp order"""
+        cap = cv2.VideoCapture(self.video_path)
+        frames = []
+        for timestamp in self.state.metrics.key_frames.keys():
+            cap.set(cv2.CAP_PROP_POS_MSEC, timestamp * 1000)
+            ret, frame = cap.read()
+            if ret:
+                frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        cap.release()
+        return frames
+
+    def finalize(self):
+        """Analyze the tail and summarize; returns video_info like analyze_video().
+
+        Costs one update() plus reading back the key frames (and, for long
+        recordings, up to 16 fingerprint seeks) - never a second full pass.
+        """
+        with tracing.span('analyze', video=os.path.basename(self.video_path), incremental=True):
+            self.update(final=True)
+            state = self.state
+            duration = state.position + 1 / state.fps if state.frames else 0.0
+            self.video_info = {
+                'duration': duration,
+                'fps': state.fps,
+                'resolution': state.resolution,
+                'frame_count': state.frames,
+                'file_size': state.file_size
+            }
+            if self.audio_analyzer and not self.audio_analyzer.ffmpeg_path:
+                print("⚠️ ffmpeg not found - skipping audio analysis")
+            elif self.audio_analyzer:
+                audio = self.audio_analyzer.summarize(state.audio)
+                if self.audio_failed:
+                    # Summarizes only the audio read before the failed pass
+                    audio['incomplete'] = True
+                self.video_info['has_audio'] = audio['has_audio']
+                self.video_info['audio'] = audio
+            self.video_info.update(self._summarize(duration))
+            fingerprint = state.fingerprint_grid.fingerprint(state.frames, state.fps, self._read_frame)
+            if fingerprint:
+                self.video_info['video_fingerprint'] = fingerprint.to_dict()
+
+            state.finished = True
+            state.video_info = self.video_info
+            self.save_state()
+            self.video_info['key_frames'] = self._read_key_frames()
+        return self.video_info
+
+    def _summarize(self, duration):
+        """The analysis dict of SimpleVideoAnalyzer._analyze_content_deeply, from the aggregates"""
+        scenes = self.scene_detector.finalize(duration)
+        analysis = {
+            'scene_changes': len(scenes['cuts']),
+            'scene_cuts': scenes['cuts'],
+            'shots': scenes['shots'],
+            'motion_level': 'static',
+            'brightness_levels': [],
+            'color_variety': 'low',
+            'dominant_colors': []
+        }
+        if scenes['shots']:
+            total_shot_time = sum(shot['duration'] for shot in scenes['shots'])
+            analysis['average_shot_length'] = total_shot_time / len(scenes['shots'])
+            if total_shot_time > 0:
+                analysis['cuts_per_minute'] = len(scenes['cuts']) / (total_shot_time / 60)
+        analysis.update(self._describe_frame_metrics(self.state.metrics))
+        analysis['content_type'] = self._determine_content_type(analysis)
+        analysis['visual_complexity'] = self._determine_complexity(analysis)
+        return analysis
+
+    def analyze_video(self):
+        """One-shot use: analyze whatever is on disk now and finalize"""
+        return self.finalize()
+
+    def watch(self, poll_seconds=5.0, idle_seconds=15.0, on_update=None):
+        """Update until the file has stopped growing for idle_seconds, then finalize"""
+        last_change = time.monotonic()
+        last_size = -1
+        while True:
+            analyzed = self.update()
+            if analyzed:
+                self.save_state()
+                if on_update:
+                    on_update(self)
+            size = os.path.getsize(self.video_path) if os.path.exists(self.video_path) else 0
+            if size != last_size or analyzed:
+                last_size = size
+                last_change = time.monotonic()
+            elif time.monotonic() - last_change >= idle_seconds:
+                return self.finalize()
+            time.sleep(poll_seconds)
+
+    @classmethod
+    def load_finished(cls, video_path, state_path=None):
+        """The finalized analyzer for an unchanged file, or None"""
+        analyzer = cls(video_path, state_path, analyze_audio=False)
+        state = analyzer.state
+        if not state.finished or not state.video_info:
+            return None
+        stat = os.stat(video_path)
+        if stat.st_size != state.file_size or abs(stat.st_mtime - state.mtime) > 1e-3:
+            return None
+        analyzer.video_info = dict(state.video_info, key_frames=analyzer._read_key_frames())
+        return analyzer
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analyze a recording while it is being written")
+    parser.add_argument("video_file")
+    parser.add_argument("--poll", type=float, default=5.0, help="seconds between updates")
+    parser.add_argument("--idle", type=float, default=15.0,
+                        help="finalize once the file hasn't grown for this many seconds")
+    parser.add_argument("--upload", action="store_true", help="upload as soon as the analysis is final")
+    args = parser.parse_args()
+
+    def progress(analyzer):
+        print(f"  ⏳ Analyzed {analyzer.state.position:.0f}s ({analyzer.state.frames} frames)", end='\r')
+
+    print(f"👀 Watching {args.video_file} (finalizes after {args.idle:.0f}s without growth)")
+    analyzer = IncrementalAnalyzer(args.video_file)
+    started = time.perf_counter()
+    info = analyzer.watch(args.poll, args.idle, on_update=progress)
+    print(f"\n📊 Analysis final: {info['duration']:.0f}s, {info['scene_changes']} cuts, "
+          f"{info['content_type']} ({time.perf_counter() - started:.0f}s watching)")
+    if args.upload:
+        from ai_upload import AIYouTubeUploader
+        with AIYouTubeUploader() as uploader:
+            uploader.upload_video_with_ai(args.video_file)
@@ -0,0 +1,79 @@
+import json
+
+
+class IncrementalJSONFields:
+    """Pick top-level string fields out of a JSON object as it streams in.
+
+    Feed completion text chunk by chunk; each call returns the (key, value)
+    pairs whose string values finished in that chunk. Anything before the
+    first '{' (model chatter) is ignored and nested values are skipped.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget everything fed so far (e.g. when a different response starts)"""
+        self.fields = {}
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._after_colon = False
+        self._key = None
+        self._chars = []
+
+    def feed(self, text):
+        completed = []
+
+        for char in text:
+            if not self._started:
+                if char == '{':
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        completed.extend(self._finish_string())
+                    continue
+                self._chars.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._chars = []
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+            elif self._depth == 1 and char == ':':
+                self._after_colon = True
+            elif self._depth == 1 and char == ',':
+                self._after_colon = False
+                self._key = None
+
+        return completed
+
+    def _finish_string(self):
+        """Handle a string that just closed at the top level of the object"""
+        try:
+            value = json.loads('"' + ''.join(self._chars) + '"')
+        except json.JSONDecodeError:
+            value = ''.join(self._chars)
+
+        if not self._after_colon:
+            self._key = value
+            return []
+
+        self._after_colon = False
+        if self._key is None:
+            return []
+        self.fields[self._key] = value
+        return [(self._key, value)]
@@ -0,0 +1,278 @@
+"""
+Chat completion backends for GrokAI.
+
+Every backend exposes the same complete() call and returns a plain dict, so
+GrokAI can run against Groq cloud, a local OpenAI-compatible server
+(llama.cpp, vLLM, Ollama) or a deterministic fake for load tests.
+Select one with LLM_BACKEND=groq|local|fake.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+
+
+class LLMBackendError(Exception):
+    """A failed completion; status_code/headers let callers react to 429s"""
+
+    def __init__(self, message, status_code=None, headers=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _result(content, prompt_tokens=None, completion_tokens=None, finish_reason=None,
+            headers=None, time_to_first_token=None):
+    return {
+        'content': content,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'finish_reason': finish_reason,
+        'headers': headers or {},
+        'time_to_first_token': time_to_first_token
+    }
+
+
+class GroqBackend:
+    """Groq cloud with a pooled keep-alive HTTP client"""
+
+    name = 'groq'
+    rate_limited = True
+
+    def __init__(self, api_key=None, max_connections=10, timeout=60.0):
+        from groq import Groq
+        import httpx
+
+        self.api_key = api_key or os.getenv('GROK_API_KEY')
+        if not self.api_key:
+            raise ValueError("GROK_API_KEY not found in environment variables. Please add it to your .env file.")
+
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections,
+                                keepalive_expiry=120),
+            timeout=timeout
+        )
+        self.client = Groq(api_key=self.api_key, http_client=http_client)
+
+    def complete(self, model, prompt, temperature, max_tokens, on_text=None):
+        start = time.perf_counter()
+        try:
+            raw_response = self.client.chat.completions.with_raw_response.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=on_text is not None
+            )
+        except Exception as e:
+            response = getattr(e, 'response', None)
+            raise LLMBackendError(str(e), getattr(e, 'status_code', None),
+                                  getattr(response, 'headers', None)) from e
+
+        headers = raw_response.headers
+        response = None
+        try:
+            response = raw_response.parse()
+            if on_text is None:
+                usage = getattr(response, 'usage', None)
+                return _result(response.choices[0].message.content,
+                               getattr(usage, 'prompt_tokens', None),
+                               getattr(usage, 'completion_tokens', None),
+                               response.choices[0].finish_reason, headers)
+
+            parts = []
+            usage = None
+            finish_reason = None
+            first_token = None
+            for chunk in response:
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        parts.append(delta)
+                        on_text(delta)
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                # Groq reports usage on the final chunk under x_groq
+                x_groq = getattr(chunk, 'x_groq', None)
+                usage = getattr(x_groq, 'usage', None) or getattr(chunk, 'usage', None) or usage
+        except Exception as e:
+            # A dropped connection mid-stream surfaces here, not from create()
+            raise LLMBackendError(f"Groq response interrupted: {e}", getattr(e, 'status_code', None)) from e
+        finally:
+            # Streams hold their pooled connection until closed
+            close = getattr(response, 'close', None)
+            if close:
+                close()
+
+        return _result(''.join(parts), getattr(usage, 'prompt_tokens', None),
+                       getattr(usage, 'completion_tokens', None), finish_reason, headers, first_token)
+
+
+class OpenAICompatibleBackend:
+    """Local OpenAI-compatible /v1/chat/completions server over a pooled requests.Session"""
+
+    name = 'local'
+    rate_limited = False
+
+    def __init__(self, base_url=None, api_key=None, model=None, max_connections=10, timeout=120.0):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.base_url = (base_url or os.getenv('LOCAL_LLM_URL', 'http://127.0.0.1:8080')).rstrip('/')
+        self.model = model or os.getenv('LOCAL_LLM_MODEL')
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Connection'] = 'keep-alive'
+        api_key = api_key or os.getenv('LOCAL_LLM_API_KEY')
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    def complete(self, model, prompt, temperature, max_tokens, on_text=None):
+        import requests
+
+        payload = {
+            'model': self.model or model,
+            'messages': [{"role": "user", "content": prompt}],
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            'stream': on_text is not None
+        }
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}/v1/chat/completions", json=payload,
+                                         timeout=self.timeout, stream=on_text is not None)
+        except requests.RequestException as e:
+            raise LLMBackendError(f"Local LLM server unreachable: {e}") from e
+
+        try:
+            if response.status_code >= 400:
+                raise LLMBackendError(f"Local LLM server returned {response.status_code}: {response.text[:200]}",
+                                      response.status_code, response.headers)
+
+            if on_text is None:
+                body = response.json()
+                usage = body.get('usage') or {}
+                choice = body['choices'][0]
+                return _result(choice['message']['content'], usage.get('prompt_tokens'),
+                               usage.get('completion_tokens'), choice.get('finish_reason'), response.headers)
+
+            # Server-sent events: "data: {...}" lines terminated by "data: [DONE]"
+            parts = []
+            usage = {}
+            finish_reason = None
+            first_token = None
+            for line in response.iter_lines():
+                line = line.decode('utf-8') if isinstance(line, bytes) else line
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                chunk = json.loads(data)
+                usage = chunk.get('usage') or usage
+                for choice in chunk.get('choices', []):
+                    delta = (choice.get('delta') or {}).get('content')
+                    if delta:
+                        if first_token is None:
+                            first_token = time.perf_counter() - start
+                        parts.append(delta)
+                        on_text(delta)
+                    finish_reason = choice.get('finish_reason') or finish_reason
+        except (requests.RequestException, ValueError, KeyError, IndexError) as e:
+            raise LLMBackendError(f"Local LLM server sent a broken response: {e}") from e
+        finally:
+            # Streamed responses hold their pooled connection until closed
+            response.close()
+
+        return _result(''.join(parts), usage.get('prompt_tokens'), usage.get('completion_tokens'),
+                       finish_reason, response.headers, first_token)
+
+
+class FakeBackend:
+    """Deterministic offline backend: same prompt, same answer, fixed latency"""
+
+    name = 'fake'
+    rate_limited = False
+
+    def __init__(self, latency=None, tokens_per_second=400):
+        self.latency = latency if latency is not None else float(os.getenv('FAKE_LLM_LATENCY', '0.05'))
+        self.tokens_per_second = tokens_per_second
+
+    def _answer(self, prompt):
+        seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+        topic = ["Workflow", "Build", "Session", "Project", "Story"][seed % 5]
+
+        if 'keyed by video id' in prompt:
+            batch = {}
+            for section in prompt.split('=== VIDEO ')[1:]:
+                video_id = section.split(' ', 1)[0]
+                chapters = re.search(r'Chapters \((\d+)\)', section)
+                chapters = chapters.group(1) if chapters else 0
+                batch[video_id] = {
+                    'title': f"Video {video_id}: How This {topic} Came Together",
+                    'options': [f"Video {video_id}: Inside the {topic}", f"The {topic} Nobody Shows You"],
+                    'description': (f"In this video we walk through the whole {topic.lower()} from start "
+                                    "to finish, with every key moment called out along the way. "
+                                    "Like and subscribe for more!\n\n#video #creator #youtube"),
+                    'tags': ['video', topic.lower(), 'behind the scenes', 'tutorial', 'creator'],
+                    'thumbnail_concept': f"Bold close-up of the {topic.lower()} with a short text overlay.",
+                    'chapter_titles': [f"Part {i + 1}" for i in range(int(chapters))]
+                }
+            return json.dumps(batch)
+        if '"selected"' in prompt:
+            options = [f"How This {topic} Came Together in One Take",
+                       f"Inside the {topic}: What Actually Happens",
+                       f"The {topic} Nobody Shows You"]
+            return json.dumps({'selected': options[seed % 3], 'options': options,
+                               'reasoning': 'Deterministic fake backend'})
+        if 'JSON array' in prompt:
+            count = sum(1 for line in prompt.split('\n') if line[:1].isdigit() and '|' in line)
+            return json.dumps([f"Part {i + 1}" for i in range(max(count, 1))])
+        if 'tags' in prompt.lower() and 'comma-separated' in prompt:
+            return ', '.join(['video', topic.lower(), 'behind the scenes', 'tutorial',
+                              'how to', 'creator', 'youtube', 'walkthrough'])
+        if 'thumbnail' in prompt.lower():
+            return f"Close-up of the main subject with bold text about the {topic.lower()}."
+        return (f"In this video we walk through the whole {topic.lower()} from start to finish.\n\n"
+                "You'll see every step as it happens, with the key moments called out along the way.\n\n"
+                "Like and subscribe for more!\n\n#video #creator #youtube")
+
+    def complete(self, model, prompt, temperature, max_tokens, on_text=None):
+        from prompt_builder import count_tokens
+
+        content = self._answer(prompt)
+        completion_tokens = count_tokens(content)
+        time.sleep(self.latency)
+
+        first_token = None
+        if on_text is not None:
+            first_token = self.latency
+            step = max(1, len(content) // 20)
+            for i in range(0, len(content), step):
+                time.sleep(completion_tokens / self.tokens_per_second / 20)
+                on_text(content[i:i + step])
+        else:
+            time.sleep(completion_tokens / self.tokens_per_second)
+
+        return _result(content, count_tokens(prompt), completion_tokens, 'stop',
+                       time_to_first_token=first_token)
+
+
+def create_backend(name=None):
+    """Build the backend selected by LLM_BACKEND (default: groq)"""
+    name = (name or os.getenv('LLM_BACKEND', 'groq')).lower()
+    if name == 'groq':
+        return GroqBackend()
+    if name in ('local', 'openai', 'llamacpp'):
+        return OpenAICompatibleBackend()
+    if name == 'fake':
+        return FakeBackend()
+    raise ValueError(f"Unknown LLM_BACKEND '{name}' (expected groq, local or fake)")
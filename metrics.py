@@ -0,0 +1,283 @@
+"""
+Prometheus metrics for long-running upload processes.
+
+Stage metrics are fed by the tracing spans that already time the pipeline
+(decode, llm.call, upload, upload.chunk), so they need TRACING enabled
+(the default). Counters that aren't stage timings - upload retries, quota
+units, queue depth - are updated where they happen.
+
+    METRICS_PORT=9464 python quick_upload.py     # then scrape http://localhost:9464/metrics
+"""
+
+import os
+import threading
+
+import tracing
+
+# Seconds; LLM calls range from a cached 50 ms to long streamed descriptions
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+FPS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000)
+MBPS_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra) if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """[(suffix, label values, extra labels, value)] for the text format"""
+        with self._lock:
+            return [('', key, None, value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} "
+                         f"{_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+        return counts[-1]
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    samples.append(('_bucket', key, [('le', _format_value(bound))], count))
+                samples.append(('_sum', key, None, total))
+                samples.append(('_count', key, None, counts[-1]))
+        return samples
+
+
+class Registry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._add(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._add(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+ANALYSIS_FPS = REGISTRY.histogram(
+    'video_analysis_fps', 'Frames analyzed per second of decode time, per video', buckets=FPS_BUCKETS)
+ANALYSIS_FRAMES = REGISTRY.counter(
+    'video_analysis_frames_total', 'Frames decoded and analyzed')
+LLM_LATENCY = REGISTRY.histogram(
+    'llm_request_duration_seconds', 'LLM completion latency by task', labels=('task', 'model'))
+LLM_TTFT = REGISTRY.histogram(
+    'llm_time_to_first_token_seconds', 'Time to first streamed token by task', labels=('task',))
+LLM_TOKENS = REGISTRY.counter(
+    'llm_tokens_total', 'LLM tokens used by task', labels=('task', 'kind'))
+LLM_ERRORS = REGISTRY.counter(
+    'llm_errors_total', 'Failed LLM calls by task and error class', labels=('task', 'error_class'))
+UPLOAD_THROUGHPUT = REGISTRY.histogram(
+    'upload_throughput_mbps', 'Video upload throughput in MB/s, per upload', buckets=MBPS_BUCKETS)
+UPLOAD_BYTES = REGISTRY.counter(
+    'upload_bytes_total', 'Video bytes accepted by YouTube')
+UPLOADS = REGISTRY.counter(
+    'uploads_total', 'Finished video uploads by outcome', labels=('status',))
+UPLOAD_RETRIES = REGISTRY.counter(
+    'upload_retries_total', 'Retried upload chunks by error class', labels=('error_class',))
+UPLOAD_QUEUE_DEPTH = REGISTRY.gauge(
+    'upload_queue_depth', 'Videos waiting to be analyzed and uploaded')
+UPLOADS_ACTIVE = REGISTRY.gauge(
+    'uploads_active', 'Uploads currently holding an upload slot')
+TRANSCODES = REGISTRY.counter(
+    'transcodes_total', 'Pre-upload remux/re-encode jobs by action and outcome', labels=('action', 'status'))
+TRANSCODE_SAVED_BYTES = REGISTRY.counter(
+    'transcode_saved_bytes_total', 'Upload bytes saved by pre-upload re-encoding')
+QUOTA_CALLS = REGISTRY.counter(
+    'youtube_quota_calls_total', 'YouTube API calls charged to the quota by project and method',
+    labels=('project', 'method'))
+QUOTA_USED = REGISTRY.gauge(
+    'youtube_quota_used_units', 'Quota units used today (resets at midnight Pacific)', labels=('project',))
+QUOTA_REMAINING = REGISTRY.gauge(
+    'youtube_quota_remaining_units', 'Quota units left today', labels=('project',))
+
+
+def error_class(error):
+    """Short label for an exception: 'HttpError 503', 'TimeoutError', ..."""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    name = type(error).__name__
+    return f"{name} {status}" if status else name
+
+
+def observe_span(span):
+    """tracing listener: turn finished pipeline spans into metrics"""
+    attributes = span.attributes
+    if span.name == 'decode':
+        frames = attributes.get('frames_analyzed', 0)
+        if frames:
+            ANALYSIS_FRAMES.inc(frames)
+            if span.duration > 0:
+                ANALYSIS_FPS.observe(frames / span.duration)
+    elif span.name == 'llm.call':
+        task = attributes.get('task', 'unknown')
+        if span.status == 'error':
+            LLM_ERRORS.inc(task=task, error_class=attributes.get('error_type', 'Exception'))
+            return
+        LLM_LATENCY.observe(span.duration, task=task, model=attributes.get('model', 'unknown'))
+        if 'time_to_first_token' in attributes:
+            LLM_TTFT.observe(attributes['time_to_first_token'], task=task)
+        LLM_TOKENS.inc(attributes.get('prompt_tokens', 0), task=task, kind='prompt')
+        LLM_TOKENS.inc(attributes.get('completion_tokens', 0), task=task, kind='completion')
+    elif span.name == 'upload.chunk':
+        if span.status != 'error':
+            UPLOAD_BYTES.inc(attributes.get('bytes', 0))
+    elif span.name == 'transcode':
+        TRANSCODES.inc(action=attributes.get('action', 'unknown'),
+                       status='error' if 'error' in attributes else 'ok')
+        TRANSCODE_SAVED_BYTES.inc(max(0, attributes.get('saved_bytes', 0)))
+    elif span.name == 'upload':
+        UPLOADS.inc(status='error' if span.status == 'error' else 'ok')
+        if span.status != 'error' and span.duration > 0:
+            UPLOAD_THROUGHPUT.observe(attributes.get('bytes', 0) / 1024 ** 2 / span.duration)
+
+
+tracing.add_listener(observe_span)
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_server(port=None, host=None):
+    """Serve /metrics from a daemon thread (METRICS_PORT, default 9464); returns the server"""
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _server_lock:
+        if _server is not None:
+            return _server
+        port = int(port if port is not None else os.getenv('METRICS_PORT', '9464'))
+        host = host or os.getenv('METRICS_HOST', '127.0.0.1')
+        _server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"📈 Metrics at http://{host}:{_server.server_address[1]}/metrics")
+        return _server
+
+
+def start_server_from_env():
+    """Start the endpoint if METRICS_PORT is set; failures only warn"""
+    if not os.getenv('METRICS_PORT'):
+        return None
+    try:
+        return start_server()
+    except OSError as e:
+        print(f"⚠️ Could not start metrics endpoint: {e}")
+        return None
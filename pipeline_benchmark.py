@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+End-to-end pipeline benchmark on synthetic videos.
+
+Generates deterministic test videos with OpenCV's VideoWriter (cached under
+.cache/benchmark/) and runs the full upload pipeline on each one - analysis,
+LLM generation, thumbnail and the resumable upload loop - against the fake
+LLM backend and the in-process fake YouTube API (fake_youtube.py, with
+optional latency and bandwidth cap), so no API key or network is needed.
+Every case runs in a fresh process; per-stage times come from the tracing
+spans, plus throughput and the case's peak RSS. Results are compared
+against a stored baseline to flag regressions. Timings depend on the
+machine, so no baseline ships with the repo: the first run records one
+(benchmark_baseline.json) and later runs compare against it.
+
+    python pipeline_benchmark.py                         # standard matrix
+    python pipeline_benchmark.py --quick
+    python pipeline_benchmark.py --resolutions 720p,4k --durations 10,60 --gops 12,250
+    python pipeline_benchmark.py --api-latency 0.05 --api-bandwidth 20Mbps
+    python pipeline_benchmark.py --save-baseline         # store results as the new baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import struct
+import sys
+import tempfile
+import time
+
+RESOLUTIONS = {
+    '480p': (854, 480),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '1440p': (2560, 1440),
+    '4k': (3840, 2160)
+}
+
+STANDARD_MATRIX = {'resolutions': ['480p', '720p', '1080p', '4k'], 'durations': [10, 30], 'gops': [12]}
+QUICK_MATRIX = {'resolutions': ['480p', '720p'], 'durations': [10], 'gops': [12]}
+
+BENCHMARK_DIR = os.path.join(".cache", "benchmark")
+BENCHMARK_FPS = 30
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# Stages shorter than this in the baseline are too noisy to compare
+NOISE_FLOOR_SECONDS = 0.05
+
+
+def case_name(resolution, duration, gop):
+    return f"{resolution}-{duration}s-gop{gop}"
+
+
+def synthesize_video(path, width, height, duration, fps=30, gop=12, seed=0):
+    """Write a deterministic test video: gradient scenes every 3s, moving shapes and a text caption.
+
+    The GOP is requested with VIDEOWRITER_PROP_KEY_INTERVAL; OpenCV builds
+    that ignore it fall back to the codec default (see measure_gop).
+    """
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height),
+                             [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, int(gop)])
+    if not writer.isOpened():
+        raise RuntimeError(f"OpenCV cannot write {path}")
+
+    scene_frames = 3 * fps
+    ramp = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+    base = None
+    scale = height / 480
+    try:
+        for index in range(int(duration * fps)):
+            if index % scene_frames == 0:
+                start, end = rng.integers(0, 256, size=(2, 3))
+                base = (start + (end - start) * ramp).astype(np.uint8).repeat(height, axis=0)
+            frame = base.copy()
+            t = index / fps
+            x = int((0.5 + 0.4 * np.sin(t)) * width)
+            y = int((0.5 + 0.3 * np.cos(t * 1.3)) * height)
+            cv2.circle(frame, (x, y), int(40 * scale), (255, 255, 255), -1)
+            cv2.rectangle(frame, (int(width * 0.1), int(height * 0.7)),
+                          (int(width * 0.1 + (index % fps) * 8 * scale), int(height * 0.75)), (20, 20, 220), -1)
+            cv2.putText(frame, f"Benchmark scene {index // scene_frames + 1}  {t:5.1f}s",
+                        (int(width * 0.05), int(height * 0.15)), cv2.FONT_HERSHEY_SIMPLEX,
+                        1.2 * scale, (255, 255, 255), max(1, int(2 * scale)))
+            writer.write(frame)
+    finally:
+        writer.release()
+
+
+def _boxes(data, start, end):
+    """Yield (type, payload_start, box_end) for the ISO-BMFF boxes in data[start:end]"""
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def measure_gop(path):
+    """Average keyframe interval of the first video track, from its stss/stsz boxes"""
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    def find(start, end, route):
+        for kind, payload, box_end in _boxes(data, start, end):
+            if kind == route[0]:
+                if len(route) == 1:
+                    return payload, box_end
+                found = find(payload, box_end, route[1:])
+                if found:
+                    return found
+        return None
+
+    stbl = find(0, len(data), [b'moov', b'trak', b'mdia', b'minf', b'stbl'])
+    if not stbl:
+        return None
+    stss = find(stbl[0], stbl[1], [b'stss'])
+    stsz = find(stbl[0], stbl[1], [b'stsz'])
+    if not stsz:
+        return None
+    samples = struct.unpack('>I', data[stsz[0] + 8:stsz[0] + 12])[0]
+    if not stss:
+        return 1.0  # no sync sample table: every frame is a keyframe
+    keyframes = struct.unpack('>I', data[stss[0] + 4:stss[0] + 8])[0]
+    return round(samples / max(1, keyframes), 1)
+
+
+def prepare_video(resolution, duration, gop):
+    """Cached synthetic video for a case"""
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    path = os.path.abspath(os.path.join(BENCHMARK_DIR, f"{case_name(resolution, duration, gop)}.mp4"))
+    if not os.path.exists(path):
+        width, height = RESOLUTIONS[resolution]
+        print(f"🎞️ Generating {os.path.basename(path)}...")
+        temp_path = path[:-4] + '.tmp.mp4'
+        synthesize_video(temp_path, width, height, duration, fps=BENCHMARK_FPS, gop=gop)
+        os.replace(temp_path, path)
+    return path
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 ** 2 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_case(case, workdir, verbose=False, api=None):
+    """Run the whole pipeline on one video (call in a fresh process: RSS is per process)"""
+    import contextlib
+    import io
+
+    os.environ.setdefault('LLM_BACKEND', 'fake')
+    os.environ['YOUTUBE_QUOTA_LEDGER'] = os.path.join(workdir, 'quota_ledger.json')
+    os.environ['UPLOAD_LIMITS_FILE'] = os.path.join(workdir, 'upload_limits.json')
+    os.environ['REPORT_DB'] = os.path.join(workdir, 'upload_reports.db')
+    os.environ.pop('TRACE_FILE', None)
+    os.environ.pop('METRICS_PORT', None)
+    os.chdir(workdir)
+
+    import tracing
+    from ai_upload import AIYouTubeUploader
+    from fake_youtube import FakeYouTube
+
+    tracing.set_enabled(True)
+    fake = FakeYouTube(**(api or {}))
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output, fake.installed(), tracing.span('benchmark', case=case['name']) as root:
+        with AIYouTubeUploader() as uploader:
+            result = uploader.upload_video_with_ai(case['video'], privacy='private')
+        timings = tracing.summarize(root)
+    wall = time.perf_counter() - start
+
+    if not result:
+        raise RuntimeError(f"Pipeline failed for {case['name']}")
+    stages = {name: stage['seconds'] for name, stage in timings['stages'].items()}
+    decode = timings['stages'].get('decode', {})
+    size = os.path.getsize(case['video'])
+    return {
+        'wall_seconds': round(wall, 3),
+        'stages': stages,
+        'throughput': {
+            'analysis_realtime_factor': round(case['duration'] / stages['analyze'], 2) if stages.get('analyze') else None,
+            'decode_mb_per_second': round(decode.get('bytes', 0) / 1024 ** 2 / decode['seconds'], 2)
+            if decode.get('seconds') else None,
+            # Every frame is decoded (grab()), whatever the scene detector's stride
+            'decode_fps': round(case['duration'] * BENCHMARK_FPS / decode['seconds'], 1)
+            if decode.get('seconds') else None,
+            'upload_mb_per_second': round(size / 1024 ** 2 / stages['upload'], 2) if stages.get('upload') else None
+        },
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def _run_isolated(case, verbose=False, api=None):
+    import multiprocessing
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(prefix='yt-bench-') as workdir, context.Pool(1) as pool:
+        return pool.apply(run_case, (case, workdir, verbose, api))
+
+
+def run_benchmark(resolutions, durations, gops, repeat=1, verbose=False, api=None):
+    results = {}
+    for resolution in resolutions:
+        for duration in durations:
+            for gop in gops:
+                name = case_name(resolution, duration, gop)
+                video = prepare_video(resolution, duration, gop)
+                case = {'name': name, 'video': video, 'duration': duration}
+                print(f"⏱️ {name}...", end=' ', flush=True)
+                # Keep the fastest run: repeats remove warm-up and scheduling noise
+                runs = [_run_isolated(case, verbose, api) for _ in range(repeat)]
+                best = min(runs, key=lambda run: run['wall_seconds'])
+                best.update({
+                    'resolution': resolution,
+                    'duration': duration,
+                    'gop_requested': gop,
+                    'gop_actual': measure_gop(video),
+                    'file_mb': round(os.path.getsize(video) / 1024 ** 2, 2)
+                })
+                results[name] = best
+                print(f"{best['wall_seconds']:.2f}s, peak RSS {best['peak_rss_mb']} MB")
+    return results
+
+
+def environment_info():
+    import cv2
+    import numpy
+
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': numpy.__version__
+    }
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Metrics more than `tolerance` slower (or bigger) than the baseline: [(case, metric, old, new)]"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        checks = [('wall_seconds', previous['wall_seconds'], current['wall_seconds'])]
+        checks += [(f"stage {stage}", seconds, current['stages'].get(stage, 0.0))
+                   for stage, seconds in previous['stages'].items() if seconds >= NOISE_FLOOR_SECONDS]
+        if previous.get('peak_rss_mb') and current.get('peak_rss_mb'):
+            checks.append(('peak_rss_mb', previous['peak_rss_mb'], current['peak_rss_mb']))
+        for metric, old, new in checks:
+            if new > old * (1 + tolerance):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def print_results(results):
+    print(f"\n{'case':<22}{'wall s':>8}{'analyze':>9}{'generate':>10}{'upload':>8}"
+          f"{'x realtime':>12}{'dec fps':>9}{'up MB/s':>9}{'RSS MB':>8}  gop")
+    for name, result in results.items():
+        stages = result['stages']
+        throughput = result['throughput']
+        print(f"{name:<22}{result['wall_seconds']:>8.2f}{stages.get('analyze', 0):>9.2f}"
+              f"{stages.get('generate', 0):>10.2f}{stages.get('upload', 0):>8.2f}"
+              f"{throughput['analysis_realtime_factor'] or 0:>12.1f}{throughput.get('decode_fps') or 0:>9.0f}"
+              f"{throughput['upload_mb_per_second'] or 0:>9.1f}"
+              f"{result['peak_rss_mb'] or 0:>8.0f}  {result['gop_actual']}")
+
+
+def _csv(value, cast=str):
+    return [cast(item.strip()) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the upload pipeline on synthetic videos")
+    parser.add_argument("--quick", action="store_true", help="small matrix (480p/720p, 10s)")
+    parser.add_argument("--resolutions", help=f"comma-separated, from {', '.join(RESOLUTIONS)}")
+    parser.add_argument("--durations", help="comma-separated seconds, e.g. 10,60")
+    parser.add_argument("--gops", help="comma-separated keyframe intervals, e.g. 12,250")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case (fastest is kept)")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="fake YouTube API latency per request (s)")
+    parser.add_argument("--api-bandwidth", help="fake YouTube link bandwidth, e.g. 20Mbps (default: unlimited)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    args = parser.parse_args()
+
+    matrix = QUICK_MATRIX if args.quick else STANDARD_MATRIX
+    resolutions = _csv(args.resolutions) if args.resolutions else matrix['resolutions']
+    unknown = [r for r in resolutions if r not in RESOLUTIONS]
+    if unknown:
+        parser.error(f"unknown resolution(s): {', '.join(unknown)}")
+    durations = _csv(args.durations, int) if args.durations else matrix['durations']
+    gops = _csv(args.gops, int) if args.gops else matrix['gops']
+
+    api = {'latency': args.api_latency, 'bandwidth': args.api_bandwidth}
+    results = run_benchmark(resolutions, durations, gops, args.repeat, args.verbose, api)
+    print_results(results)
+
+    report = {'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'environment': environment_info(),
+              'fake_api': api, 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved to {args.output}")
+
+    first_run = not os.path.exists(args.baseline)
+    if args.save_baseline or first_run:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        if first_run:
+            print(f"📌 No baseline yet - recorded these results as {args.baseline}; "
+                  "later runs are compared against it")
+        else:
+            print(f"📌 Baseline updated: {args.baseline}")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('environment', {}).get('platform') != report['environment']['platform']:
+        print("⚠️ Baseline was recorded on a different platform; comparisons may not be meaningful")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if not regressions:
+        print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return 0
+    print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+    for name, metric, old, new in regressions:
+        print(f"   {name} {metric}: {old} → {new} (+{(new / old - 1):.0%})")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once, or None if tiktoken isn't installed"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            # cl100k is close enough to the Llama 3 tokenizer for budgeting
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+    return _encoding
+
+
+def count_tokens(text):
+    """Count tokens locally (tiktoken if installed, otherwise a conservative estimate - the default)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # English averages ~4 characters per token; assume ~3 so we never under-budget
+    return len(text) // 3 + 1
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Trim text to at most max_tokens, preferring whole lines"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    encoding = _get_encoding()
+    kept = []
+    used = 0
+    for line in text.split('\n'):
+        line_tokens = count_tokens(line) + 1
+        if used + line_tokens > max_tokens:
+            # Room for the separating newline and the "..." marker
+            remaining = max_tokens - used - 2
+            if remaining > 8:
+                if encoding is not None:
+                    partial = encoding.decode(encoding.encode(line)[:remaining])
+                else:
+                    partial = line[:(remaining - 1) * 3]
+                kept.append(partial.rstrip() + "...")
+            break
+        kept.append(line)
+        used += line_tokens
+
+    return '\n'.join(kept)
+
+
+class PromptBuilder:
+    """Assemble a prompt from sections under a token budget.
+
+    Priority 0 sections are always included. Higher numbers are filled in
+    priority order while budget remains; truncatable sections are cut to fit
+    and everything else is dropped. Sections keep their insertion order in
+    the final prompt and each newline joining them counts as a token.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.sections = []
+
+    def add(self, text, priority=0, truncatable=False):
+        if text:
+            self.sections.append({'text': text, 'priority': priority, 'truncatable': truncatable})
+        return self
+
+    def build(self):
+        included = {}
+        used = 0
+
+        for index, section in sorted(enumerate(self.sections), key=lambda item: item[1]['priority']):
+            separator = 1 if included else 0
+            tokens = count_tokens(section['text']) + separator
+            if section['priority'] == 0 or used + tokens <= self.budget:
+                included[index] = section['text']
+                used += tokens
+            elif section['truncatable']:
+                trimmed = truncate_to_tokens(section['text'], self.budget - used - separator)
+                if trimmed:
+                    included[index] = trimmed
+                    used += count_tokens(trimmed) + separator
+
+        return '\n'.join(included[i] for i in sorted(included))
@@ -6,8 +6,11 @@ Quick upload script for your AI YouTube uploader
 
 import os
 import sys
+import time
 from pathlib import Path
 from ai_upload import AIYouTubeUploader
+from quota_ledger import next_reset, seconds_until_reset
+import metrics
 
 
 def find_latest_video():
@@ -58,13 +61,16 @@ def interactive_upload():
     print("="*60)
     
     try:
-        uploader = AIYouTubeUploader()
-        result = uploader.upload_video_with_ai(
-            video_file=str(video_file),
-            custom_prompt=custom_prompt,
-            privacy=privacy
-        )
+        with AIYouTubeUploader() as uploader:
+            result = uploader.upload_video_with_ai(
+                video_file=str(video_file),
+                custom_prompt=custom_prompt,
+                privacy=privacy
+            )
         
+        if result and result.get('duplicate'):
+            print(f"\n⏭️ Not uploaded again - this video is already on YouTube: {result['video_url']}")
+            return True
         if result:
             print("\n" + "="*60)
             print("🎉 SUCCESS! VIDEO UPLOADED!")
@@ -105,25 +111,71 @@ def batch_upload():
         return False
     
     uploader = AIYouTubeUploader()
-    successful = 0
-    
-    for video in videos:
-        print(f"\n📹 Uploading: {video.name}")
-        try:
-            result = uploader.upload_video_with_ai(
-                video_file=str(video),
-                privacy="unlisted"
-            )
-            if result:
-                print(f"✅ Success: {result['video_url']}")
-                successful += 1
+    try:
+        successful = 0
+        # Long batches can be watched live on METRICS_PORT
+        metrics.start_server_from_env()
+    
+        # Metadata for a group of videos is generated in shared completions, then
+        # the group is uploaded before the next one is analyzed (bounds memory)
+        batch_size = int(os.getenv('GROK_BATCH_SIZE', '4'))
+        wait_for_quota = os.getenv('YOUTUBE_WAIT_FOR_QUOTA', 'false').lower() == 'true'
+        pending = []
+        for video in videos:
+            # Files already in the upload history are skipped before any analysis
+            previous = uploader.find_previous_upload(str(video))
+            if previous:
+                print(f"⏭️ Skipping {video.name} - already uploaded: https://youtube.com/watch?v={previous['video_id']}")
             else:
-                print(f"❌ Failed: {video.name}")
-        except Exception as e:
-            print(f"❌ Error: {e}")
-    
-    print(f"\n📊 Results: {successful}/{len(videos)} videos uploaded successfully!")
-    return successful > 0
+                pending.append(str(video))
+        while pending:
+            # Only analyze videos that today's API quota can still take
+            fits = uploader.quota.predict_uploads()
+            if fits == 0:
+                print(f"\n⏸️ YouTube API quota used up - {len(pending)} video(s) deferred until "
+                      f"{next_reset():%Y-%m-%d %H:%M %Z}:")
+                for video in pending:
+                    print(f"  • {os.path.basename(video)}")
+                if not wait_for_quota:
+                    break
+                print("⏳ Waiting for the next quota window (YOUTUBE_WAIT_FOR_QUOTA=true)...")
+                time.sleep(seconds_until_reset() + 60)
+                continue
+        
+            group = pending[:min(batch_size, fits)]
+            pending = pending[len(group):]
+            try:
+                contents = uploader.generate_content_batch(group)
+            except Exception as e:
+                print(f"⚠️ Batch generation failed ({e}), generating per video instead")
+                contents = {}
+        
+            for index, video in enumerate(group):
+                metrics.UPLOAD_QUEUE_DEPTH.set(len(pending) + len(group) - index)
+                if contents.get(video, {}).get('duplicate'):
+                    # A re-export of an earlier upload, found during the batch analysis
+                    continue
+                print(f"\n📹 Uploading: {os.path.basename(video)}")
+                try:
+                    result = uploader.upload_video_with_ai(
+                        video_file=video,
+                        privacy="unlisted",
+                        ai_content=contents.get(video)
+                    )
+                    if result:
+                        print(f"✅ Success: {result['video_url']}")
+                        successful += 1
+                    else:
+                        print(f"❌ Failed: {os.path.basename(video)}")
+                except Exception as e:
+                    print(f"❌ Error: {e}")
+    
+        metrics.UPLOAD_QUEUE_DEPTH.set(len(pending))
+        print(f"\n📊 Results: {successful}/{len(videos)} videos uploaded successfully!")
+        return successful > 0
+    finally:
+        # Stops the transcription/transcode workers so the script can exit
+        uploader.close()
 
 
 if __name__ == "__main__":
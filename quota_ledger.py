@@ -0,0 +1,240 @@
+"""
+YouTube Data API quota accounting.
+
+Quota is granted per Google Cloud project and resets at midnight Pacific
+time. The ledger records the unit cost of every call by project and channel
+in a JSON file (guarded by a FileLock, so concurrent uploaders share it) and
+reserves units *before* a call is made, so an upload is never started on a
+project that would reject it with quotaExceeded.
+
+Extra projects are configured as name=client_secrets_file[:daily_quota]:
+    YOUTUBE_PROJECTS=main=credentials.json,backup=credentials_backup.json:10000
+"""
+
+import datetime
+import json
+import os
+import tempfile
+import threading
+
+import metrics
+from file_lock import FileLock
+
+# Unit costs from the YouTube Data API quota calculator
+API_COSTS = {
+    'videos.insert': 1600,
+    'videos.update': 50,
+    'videos.list': 1,
+    'thumbnails.set': 50,
+    'channels.list': 1
+}
+
+DEFAULT_DAILY_QUOTA = 10000
+DEFAULT_PROJECT = 'default'
+
+
+def _pacific_now():
+    try:
+        from zoneinfo import ZoneInfo
+        return datetime.datetime.now(ZoneInfo('America/Los_Angeles'))
+    except Exception:
+        # No tz database (e.g. Windows without tzdata): assume PST
+        return datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=-8)))
+
+
+def quota_day():
+    """The current quota window, as the Pacific-time date"""
+    return _pacific_now().date().isoformat()
+
+
+def next_reset():
+    """When the next quota window starts (midnight Pacific time)"""
+    now = _pacific_now()
+    tomorrow = (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return tomorrow
+
+
+def seconds_until_reset():
+    return max(0.0, (next_reset() - _pacific_now()).total_seconds())
+
+
+def upload_cost(with_thumbnail=True):
+    """Units needed to upload one video (plus its custom thumbnail)"""
+    return API_COSTS['videos.insert'] + (API_COSTS['thumbnails.set'] if with_thumbnail else 0)
+
+
+def load_projects():
+    """Configured projects in routing order: {name: {'client_secrets', 'daily_quota'}}"""
+    default_quota = int(os.getenv('YOUTUBE_DAILY_QUOTA', str(DEFAULT_DAILY_QUOTA)))
+    projects = {}
+    for entry in os.getenv('YOUTUBE_PROJECTS', '').split(','):
+        if '=' not in entry:
+            continue
+        name, spec = entry.split('=', 1)
+        secrets, _, quota = spec.partition(':')
+        projects[name.strip()] = {
+            'client_secrets': secrets.strip(),
+            'daily_quota': int(quota) if quota.strip() else default_quota
+        }
+    if not projects:
+        projects[DEFAULT_PROJECT] = {'client_secrets': 'credentials.json', 'daily_quota': default_quota}
+    return projects
+
+
+class QuotaLedger:
+    """Daily quota usage per project and channel, persisted and shared between processes"""
+
+    def __init__(self, path=None, projects=None):
+        self.path = path or os.getenv('YOUTUBE_QUOTA_LEDGER', 'quota_ledger.json')
+        self.projects = projects or load_projects()
+        self.default_project = next(iter(self.projects))
+        self._lock = threading.Lock()
+
+    def _update(self, mutate):
+        """Load today's usage, apply mutate(usage) and save, atomically across processes"""
+        with self._lock, FileLock(self.path + '.lock'):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    ledger = json.load(f)
+            except (OSError, ValueError):
+                ledger = {}
+
+            day = quota_day()
+            # Keep a week of history for reports; older windows are dropped
+            for old_day in sorted(ledger)[:-7]:
+                if old_day != day:
+                    del ledger[old_day]
+            usage = ledger.setdefault(day, {})
+            result = mutate(usage)
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp',
+                                             encoding='utf-8') as f:
+                json.dump(ledger, f, indent=2)
+            os.replace(f.name, self.path)
+        return result
+
+    @staticmethod
+    def _project_usage(usage, project):
+        return usage.setdefault(project, {'used': 0, 'exhausted': False, 'channels': {}, 'calls': {}})
+
+    def _remaining(self, usage, project):
+        entry = self._project_usage(usage, project)
+        if entry['exhausted']:
+            return 0
+        return max(0, self.projects[project]['daily_quota'] - entry['used'])
+
+    def _publish(self, usage, project):
+        metrics.QUOTA_USED.set(self._project_usage(usage, project)['used'], project=project)
+        metrics.QUOTA_REMAINING.set(self._remaining(usage, project), project=project)
+
+    def remaining(self, project=None):
+        """Units left today for a project"""
+        project = project or self.default_project
+        return self._update(lambda usage: self._remaining(usage, project))
+
+    def summary(self):
+        """{project: {'used', 'remaining', 'channels', 'calls'}} for today"""
+        def collect(usage):
+            return {
+                project: {
+                    'used': self._project_usage(usage, project)['used'],
+                    'remaining': self._remaining(usage, project),
+                    'channels': dict(self._project_usage(usage, project)['channels']),
+                    'calls': dict(self._project_usage(usage, project)['calls'])
+                }
+                for project in self.projects
+            }
+        return self._update(collect)
+
+    def reserve(self, method, channel_id=None, project=None, units=None):
+        """Charge a call before it is made.
+
+        With project=None the first configured project with enough units left
+        is chosen. Returns the project charged, or None if no project can
+        afford the call (the caller should defer it).
+        """
+        units = units if units is not None else API_COSTS[method]
+        candidates = [project] if project else list(self.projects)
+
+        def charge(usage):
+            for name in candidates:
+                if self._remaining(usage, name) >= units:
+                    entry = self._project_usage(usage, name)
+                    entry['used'] += units
+                    channel = channel_id or 'default'
+                    entry['channels'][channel] = entry['channels'].get(channel, 0) + units
+                    entry['calls'][method] = entry['calls'].get(method, 0) + 1
+                    metrics.QUOTA_CALLS.inc(project=name, method=method)
+                    self._publish(usage, name)
+                    return name
+            return None
+
+        return self._update(charge)
+
+    def refund(self, method, channel_id=None, project=None, units=None):
+        """Give back units for a reserved call that never reached the API"""
+        project = project or self.default_project
+        units = units if units is not None else API_COSTS[method]
+
+        def give_back(usage):
+            entry = self._project_usage(usage, project)
+            entry['used'] = max(0, entry['used'] - units)
+            channel = channel_id or 'default'
+            entry['channels'][channel] = max(0, entry['channels'].get(channel, 0) - units)
+            entry['calls'][method] = max(0, entry['calls'].get(method, 0) - 1)
+            self._publish(usage, project)
+
+        self._update(give_back)
+
+    def mark_exhausted(self, project=None):
+        """Record a quotaExceeded from the API (other tools may share the project)"""
+        project = project or self.default_project
+        def exhaust(usage):
+            self._project_usage(usage, project)['exhausted'] = True
+            self._publish(usage, project)
+
+        self._update(exhaust)
+        print(f"🚫 Project '{project}' is out of YouTube quota until {next_reset():%Y-%m-%d %H:%M %Z}")
+
+    def predict_uploads(self, with_thumbnail=True):
+        """How many more uploads fit in today's quota across all projects"""
+        cost = upload_cost(with_thumbnail)
+
+        def count(usage):
+            return sum(self._remaining(usage, project) // cost for project in self.projects)
+
+        return self._update(count)
+
+
+def is_quota_error(error):
+    """True for the API's quotaExceeded / dailyLimitExceeded errors (not per-user rate limits)"""
+    text = str(error)
+    content = getattr(error, 'content', b'') or b''
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', 'ignore')
+    return any(reason in text or reason in content
+               for reason in ('quotaExceeded', 'dailyLimitExceeded'))
+
+
+_shared_ledger = None
+_shared_lock = threading.Lock()
+
+
+def get_quota_ledger():
+    """Process-wide ledger (the JSON file is what's shared between processes)"""
+    global _shared_ledger
+    with _shared_lock:
+        if _shared_ledger is None:
+            _shared_ledger = QuotaLedger()
+        return _shared_ledger
+
+
+if __name__ == "__main__":
+    ledger = get_quota_ledger()
+    print(f"📊 YouTube quota for {quota_day()} (resets {next_reset():%Y-%m-%d %H:%M %Z})")
+    for project, info in ledger.summary().items():
+        print(f"  {project}: {info['used']} used, {info['remaining']} remaining")
+        for channel, units in info['channels'].items():
+            print(f"     {channel}: {units} units")
+    print(f"  ≈ {ledger.predict_uploads()} more uploads possible today")
@@ -0,0 +1,198 @@
+import heapq
+import itertools
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from file_lock import FileLock
+
+# Lower number = served first when calls are queued
+TASK_PRIORITIES = {
+    'title': 0,
+    'description': 1,
+    'batch_metadata': 1,
+    'chapters': 2,
+    'tags': 3,
+    'thumbnail_concept': 4
+}
+
+
+def parse_reset_duration(value):
+    """Parse Groq reset headers like '7.66s', '2m59.56s' or '120ms' into seconds"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value):
+        matched = True
+        amount = float(amount)
+        total += {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}[unit] * amount
+    return total if matched else None
+
+
+class RateLimiter:
+    """Token-bucket scheduler for requests/minute and tokens/minute.
+
+    Bucket levels live in a small JSON state file guarded by a FileLock, so
+    every thread and process using the same state file draws from the same
+    budget. Within a process, waiting calls are served by priority.
+    """
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=6000, state_path=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.state_path = state_path
+        self._memory_state = None
+        self._state_lock = threading.Lock()  # serializes updates in this process; the FileLock covers others
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._counter = itertools.count()
+
+    def _fresh_state(self, now):
+        return {
+            'requests': float(self.requests_per_minute),
+            'tokens': float(self.tokens_per_minute),
+            'updated': now,
+            'blocked_until': 0.0
+        }
+
+    def _update_state(self, mutate):
+        """Load, refill, mutate and save the shared bucket state atomically"""
+        now = time.time()
+
+        def apply(state):
+            if state is None:
+                state = self._fresh_state(now)
+            elapsed = max(0.0, now - state['updated'])
+            state['requests'] = min(self.requests_per_minute,
+                                    state['requests'] + elapsed * self.requests_per_minute / 60)
+            state['tokens'] = min(self.tokens_per_minute,
+                                  state['tokens'] + elapsed * self.tokens_per_minute / 60)
+            state['updated'] = now
+            result = mutate(state, now)
+            return state, result
+
+        if not self.state_path:
+            with self._state_lock:
+                self._memory_state, result = apply(self._memory_state)
+            return result
+
+        with self._state_lock, FileLock(self.state_path + '.lock'):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = None
+            state, result = apply(state)
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+        return result
+
+    def _try_take(self, tokens):
+        """Take one request and `tokens` tokens; returns 0 or seconds to wait"""
+        def take(state, now):
+            if state['blocked_until'] > now:
+                return state['blocked_until'] - now
+            request_wait = (1 - state['requests']) * 60 / self.requests_per_minute
+            token_wait = (tokens - state['tokens']) * 60 / self.tokens_per_minute
+            wait = max(request_wait, token_wait, 0.0)
+            if wait == 0:
+                state['requests'] -= 1
+                state['tokens'] -= tokens
+            return wait
+
+        return self._update_state(take)
+
+    def acquire(self, tokens, priority=5):
+        """Block until a request of `tokens` tokens fits in both buckets; returns the tokens taken.
+
+        A request larger than a whole minute's budget takes the full bucket,
+        so that amount (not `tokens`) is what record_usage() must be given.
+        """
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._condition:
+            ticket = (priority, next(self._counter))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if self._waiting[0] == ticket:
+                        wait = self._try_take(tokens)
+                        if wait == 0:
+                            return tokens
+                    else:
+                        wait = 1.0  # a higher-priority call is ahead of us
+                    self._condition.wait(timeout=min(wait, 1.0))
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    def record_usage(self, reserved_tokens, actual_tokens):
+        """Refund (or charge) the difference between the tokens acquire() took and actual tokens"""
+        difference = reserved_tokens - actual_tokens
+
+        def adjust(state, now):
+            state['tokens'] = min(self.tokens_per_minute, state['tokens'] + difference)
+
+        self._update_state(adjust)
+        with self._condition:
+            self._condition.notify_all()
+
+    def update_from_headers(self, headers, rate_limited=False):
+        """Adapt the buckets to the provider's x-ratelimit-* / retry-after headers"""
+        if not headers:
+            headers = {}
+        remaining_requests = headers.get('x-ratelimit-remaining-requests')
+        remaining_tokens = headers.get('x-ratelimit-remaining-tokens')
+        request_reset = parse_reset_duration(headers.get('x-ratelimit-reset-requests'))
+        token_reset = parse_reset_duration(headers.get('x-ratelimit-reset-tokens'))
+        retry_after = parse_reset_duration(headers.get('retry-after'))
+
+        def adapt(state, now):
+            if remaining_tokens is not None:
+                state['tokens'] = min(state['tokens'], float(remaining_tokens))
+            if remaining_requests is not None:
+                state['requests'] = min(state['requests'], float(remaining_requests))
+                if float(remaining_requests) < 1 and request_reset:
+                    state['blocked_until'] = max(state['blocked_until'], now + request_reset)
+            if rate_limited:
+                pause = retry_after or token_reset or request_reset or 5.0
+                state['blocked_until'] = max(state['blocked_until'], now + pause)
+                state['tokens'] = min(state['tokens'], 0.0)
+
+        self._update_state(adapt)
+
+
+_shared_limiters = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_limiter(model=None):
+    """Return the process-wide limiter configured from GROQ_RPM / GROQ_TPM.
+
+    Groq enforces limits per model, so each model gets its own buckets. By
+    default the state files live in the temp directory so concurrent
+    uploader processes on the same machine share one budget.
+    """
+    requests_per_minute = int(os.getenv('GROQ_RPM', '30'))
+    tokens_per_minute = int(os.getenv('GROQ_TPM', '6000'))
+    state_path = os.getenv('GROQ_RATE_LIMIT_STATE',
+                           os.path.join(tempfile.gettempdir(), 'groq_rate_limit.json'))
+    if model:
+        root, ext = os.path.splitext(state_path)
+        state_path = f"{root}_{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}{ext}"
+    key = (requests_per_minute, tokens_per_minute, state_path)
+
+    with _shared_lock:
+        if key not in _shared_limiters:
+            _shared_limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute, state_path)
+        return _shared_limiters[key]
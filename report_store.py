@@ -0,0 +1,284 @@
+"""
+Upload history in SQLite.
+
+Every upload report goes into one database (REPORT_DB, default
+upload_reports.db) with indexes on the video file fingerprint, video ID,
+upload time and content type, so history queries and the "was this file
+already uploaded?" check are index lookups instead of globbing and parsing
+one JSON file per video. WAL mode lets parallel uploaders write while
+others read.
+
+    python report_store.py list [--type tutorial] [--since 2024-01-01] [--title cooking]
+    python report_store.py show VIDEO_ID
+    python report_store.py check video.mp4          # already uploaded?
+    python report_store.py migrate [DIRECTORY] [--archive]
+    python report_store.py stats
+"""
+
+import datetime
+import glob
+import json
+import os
+import sqlite3
+import threading
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL UNIQUE,
+    fingerprint TEXT,
+    video_file TEXT,
+    channel_id TEXT,
+    uploaded_at TEXT NOT NULL,
+    content_type TEXT,
+    title TEXT,
+    report TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_fingerprint ON reports (fingerprint);
+CREATE INDEX IF NOT EXISTS reports_uploaded_at ON reports (uploaded_at);
+CREATE INDEX IF NOT EXISTS reports_content_type ON reports (content_type, uploaded_at);
+"""
+
+# Applied in order to databases created by older versions
+_MIGRATIONS = {
+    2: "ALTER TABLE reports ADD COLUMN phash TEXT; ALTER TABLE reports ADD COLUMN duration REAL;"
+}
+
+_COLUMNS = "video_id, fingerprint, video_file, channel_id, uploaded_at, content_type, title"
+
+
+def _summary(row):
+    return dict(zip(('video_id', 'fingerprint', 'video_file', 'channel_id', 'uploaded_at',
+                     'content_type', 'title'), row))
+
+
+class ReportStore:
+    """Upload reports in SQLite, indexed for history queries and duplicate checks"""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('REPORT_DB', 'upload_reports.db')
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                connection.executescript(_SCHEMA)
+                # A new database gets every column through the migrations too
+                for target in range(max(version, 1) + 1, SCHEMA_VERSION + 1):
+                    connection.executescript(_MIGRATIONS[target])
+                connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def add(self, report, fingerprint=None, channel_id=None):
+        """Insert or replace the report for report['video_id']"""
+        analysis = report.get('video_analysis') or {}
+        content = report.get('ai_generated_content') or {}
+        uploaded_at = report.get('upload_timestamp') or datetime.datetime.now().isoformat(sep=' ')
+        perceptual = analysis.get('video_fingerprint') or {}
+        row = (report['video_id'], fingerprint or report.get('fingerprint'), report.get('video_file'),
+               channel_id or report.get('channel_id'), str(uploaded_at), analysis.get('content_type'),
+               content.get('title'), json.dumps(report, ensure_ascii=False, default=str),
+               perceptual.get('hashes'), perceptual.get('duration'))
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                f"INSERT OR REPLACE INTO reports ({_COLUMNS}, report, phash, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row
+            )
+            connection.commit()
+
+    def get(self, video_id):
+        """The full report for a video ID, or None"""
+        with self._lock:
+            row = self._connect().execute("SELECT report FROM reports WHERE video_id = ?",
+                                          (video_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_by_fingerprint(self, fingerprint):
+        """Earlier uploads of the same file content, newest first"""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {_COLUMNS} FROM reports WHERE fingerprint = ? ORDER BY uploaded_at DESC",
+                (fingerprint,)
+            ).fetchall()
+        return [_summary(row) for row in rows]
+
+    def find_upload(self, video_file):
+        """The most recent upload of this file's content, or None"""
+        from fingerprint import file_fingerprint
+
+        matches = self.find_by_fingerprint(file_fingerprint(video_file))
+        return matches[0] if matches else None
+
+    def query(self, content_type=None, since=None, until=None, title=None, channel_id=None, limit=50):
+        """Report summaries matching all given filters, newest first.
+
+        content_type matches a whole type ("tutorial/presentation") or the
+        start of either half of one ("tutorial", "interview", "music").
+        """
+        clauses, params = [], []
+        if content_type:
+            pattern = content_type.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            clauses.append("(content_type LIKE ? ESCAPE '\\' OR content_type LIKE ? ESCAPE '\\')")
+            params += [f"{pattern}%", f"%/{pattern}%"]
+        if since:
+            clauses.append("uploaded_at >= ?")
+            params.append(str(since))
+        if until:
+            clauses.append("uploaded_at < ?")
+            params.append(str(until))
+        if title:
+            clauses.append("title LIKE ?")
+            params.append(f"%{title}%")
+        if channel_id:
+            clauses.append("channel_id = ?")
+            params.append(channel_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {_COLUMNS} FROM reports {where} ORDER BY uploaded_at DESC LIMIT ?",
+                params + [int(limit)]
+            ).fetchall()
+        return [_summary(row) for row in rows]
+
+    def fingerprints(self):
+        """(video_id, VideoFingerprint) for every upload with a perceptual fingerprint"""
+        from video_fingerprint import VideoFingerprint
+
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT video_id, phash, duration FROM reports WHERE phash IS NOT NULL").fetchall()
+        return [(video_id, VideoFingerprint.from_hex(phash, duration)) for video_id, phash, duration in rows]
+
+    def missing_fingerprints(self):
+        """(video_id, video_file) for uploads without a perceptual fingerprint"""
+        with self._lock:
+            return self._connect().execute(
+                "SELECT video_id, video_file FROM reports WHERE phash IS NULL").fetchall()
+
+    def set_fingerprint(self, video_id, fingerprint):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("UPDATE reports SET phash = ?, duration = ? WHERE video_id = ?",
+                               (fingerprint.to_hex(), fingerprint.duration, video_id))
+            connection.commit()
+
+    def stats(self):
+        """{'total', 'first', 'last', 'by_content_type': {type: count}}"""
+        with self._lock:
+            connection = self._connect()
+            total, first, last = connection.execute(
+                "SELECT COUNT(*), MIN(uploaded_at), MAX(uploaded_at) FROM reports").fetchone()
+            by_type = connection.execute(
+                "SELECT COALESCE(content_type, 'unknown'), COUNT(*) FROM reports "
+                "GROUP BY content_type ORDER BY COUNT(*) DESC").fetchall()
+        return {'total': total, 'first': first, 'last': last, 'by_content_type': dict(by_type)}
+
+    def migrate_json(self, directory=".", archive=False):
+        """Import upload_report_*.json files; returns how many were imported.
+
+        The fingerprint is taken from the video file when it still exists at
+        the recorded path. With archive=True imported files are renamed to
+        *.json.migrated.
+        """
+        from fingerprint import file_fingerprint
+
+        imported = 0
+        for path in sorted(glob.glob(os.path.join(directory, "upload_report_*.json"))):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    report = json.load(f)
+                video_file = report.get('video_file')
+                fingerprint = report.get('fingerprint')
+                if not fingerprint and video_file and os.path.exists(video_file):
+                    fingerprint = file_fingerprint(video_file)
+                self.add(report, fingerprint=fingerprint)
+                imported += 1
+                if archive:
+                    os.replace(path, path + ".migrated")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Skipping {path}: {e}")
+        return imported
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def get_report_store():
+    """Process-wide store (SQLite handles sharing the file between processes)"""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = ReportStore()
+        return _shared_store
+
+
+def _print_rows(rows):
+    if not rows:
+        print("No uploads found")
+        return
+    for row in rows:
+        print(f"  {row['uploaded_at'][:19]}  {row['video_id']:<12} {(row['content_type'] or '-'):<14} "
+              f"{row['title'] or ''}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query the upload report history")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="list uploads, newest first")
+    list_parser.add_argument("--type", help="content type or the start of one, e.g. tutorial, music, "
+                                            "entertainment, interview, documentary (see stats)")
+    list_parser.add_argument("--since", help="YYYY-MM-DD")
+    list_parser.add_argument("--until", help="YYYY-MM-DD")
+    list_parser.add_argument("--title", help="title contains")
+    list_parser.add_argument("--channel", help="channel ID")
+    list_parser.add_argument("--limit", type=int, default=50)
+    show_parser = commands.add_parser("show", help="print the full report of a video")
+    show_parser.add_argument("video_id")
+    check_parser = commands.add_parser("check", help="was this file already uploaded?")
+    check_parser.add_argument("video_file")
+    migrate_parser = commands.add_parser("migrate", help="import upload_report_*.json files")
+    migrate_parser.add_argument("directory", nargs="?", default=".")
+    migrate_parser.add_argument("--archive", action="store_true", help="rename imported files to *.migrated")
+    commands.add_parser("stats", help="totals by content type")
+    args = parser.parse_args()
+
+    store = get_report_store()
+    if args.command == "list":
+        _print_rows(store.query(args.type, args.since, args.until, args.title, args.channel, args.limit))
+    elif args.command == "show":
+        report = store.get(args.video_id)
+        print(json.dumps(report, indent=2, ensure_ascii=False) if report else f"❌ No report for {args.video_id}")
+    elif args.command == "check":
+        previous = store.find_upload(args.video_file)
+        if previous:
+            print(f"⚠️ Already uploaded on {previous['uploaded_at'][:19]}: "
+                  f"https://youtube.com/watch?v={previous['video_id']} ({previous['title']})")
+        else:
+            print("✅ Not uploaded before")
+    elif args.command == "migrate":
+        count = store.migrate_json(args.directory, args.archive)
+        print(f"✅ Imported {count} report(s) into {store.path}")
+    else:
+        stats = store.stats()
+        print(f"📊 {stats['total']} uploads ({stats['first'] or '-'} → {stats['last'] or '-'})")
+        for content_type, count in stats['by_content_type'].items():
+            print(f"  {content_type}: {count}")
@@ -0,0 +1,182 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class SceneDetector:
+    """Streaming shot-boundary detector based on HSV histogram distance.
+
+    Frames are decoded sequentially, only every ``stride``-th frame is
+    retrieved and downscaled, and a cut is declared when the histogram
+    distance to the previous retrieved frame exceeds an adaptive threshold
+    (rolling mean + k * std of recent distances).
+    """
+
+    def __init__(self, stride=5, analysis_width=160, window=30, sensitivity=3.0,
+                 min_threshold=0.25, min_shot_length=1.0):
+        self.stride = max(1, int(stride))
+        self.analysis_width = analysis_width
+        self.window = window
+        self.sensitivity = sensitivity
+        self.min_threshold = min_threshold
+        self.min_shot_length = min_shot_length
+        self.reset()
+
+    def reset(self):
+        """Clear all streaming state"""
+        self.cuts = []
+        self.frames_processed = 0
+        self.decode_seconds = 0.0
+        self.metric_seconds = 0.0
+        self._previous_hist = None
+        self._recent_distances = []
+        self._last_cut_time = 0.0
+        self._last_timestamp = 0.0
+        self._shot_stats = []
+        self._start_shot_stats()
+
+    def state_dict(self):
+        """JSON-serializable streaming state, so detection can resume in another run"""
+        return {
+            'cuts': list(self.cuts),
+            'frames_processed': self.frames_processed,
+            'previous_hist': self._previous_hist.flatten().tolist() if self._previous_hist is not None else None,
+            'recent_distances': list(self._recent_distances),
+            'last_cut_time': self._last_cut_time,
+            'last_timestamp': self._last_timestamp,
+            'shot_stats': list(self._shot_stats),
+            'shot': [self._shot_samples, self._shot_brightness, self._shot_activity]
+        }
+
+    def load_state(self, state):
+        """Continue from a state_dict() snapshot"""
+        self.reset()
+        self.cuts = list(state['cuts'])
+        self.frames_processed = state['frames_processed']
+        if state['previous_hist'] is not None:
+            self._previous_hist = np.array(state['previous_hist'], dtype=np.float32).reshape(16, 4, 4)
+        self._recent_distances = list(state['recent_distances'])
+        self._last_cut_time = state['last_cut_time']
+        self._last_timestamp = state['last_timestamp']
+        self._shot_stats = list(state['shot_stats'])
+        self._shot_samples, self._shot_brightness, self._shot_activity = state['shot']
+
+    def _start_shot_stats(self):
+        """Reset the per-shot brightness/activity accumulators"""
+        self._shot_samples = 0
+        self._shot_brightness = 0.0
+        self._shot_activity = 0.0
+
+    def _current_shot_stats(self):
+        """Summary stats for the shot currently being accumulated"""
+        samples = max(1, self._shot_samples)
+        return {
+            'brightness': round(self._shot_brightness / samples, 1),
+            'activity': round(self._shot_activity / samples, 4)
+        }
+
+    def _frame_histogram(self, frame):
+        """Normalized HSV histogram and mean brightness of a downscaled frame"""
+        height, width = frame.shape[:2]
+        if width > self.analysis_width:
+            scale = self.analysis_width / width
+            frame = cv2.resize(frame, (self.analysis_width, max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        hist = cv2.calcHist([hsv], [0, 1, 2], None, [16, 4, 4], [0, 180, 0, 256, 0, 256])
+        cv2.normalize(hist, hist, alpha=1.0, norm_type=cv2.NORM_L1)
+        return hist, float(hsv[:, :, 2].mean())
+
+    def _threshold(self):
+        """Adaptive cut threshold from the recent distance window"""
+        if len(self._recent_distances) < 3:
+            return self.min_threshold * 2
+        recent = np.array(self._recent_distances)
+        return max(self.min_threshold, float(recent.mean() + self.sensitivity * recent.std()))
+
+    def process_frame(self, frame, timestamp):
+        """Feed one decoded BGR frame; returns True if a cut was detected"""
+        hist, brightness = self._frame_histogram(frame)
+        self.frames_processed += 1
+        self._last_timestamp = timestamp
+        is_cut = False
+        distance = 0.0
+
+        if self._previous_hist is not None:
+            distance = cv2.compareHist(self._previous_hist, hist, cv2.HISTCMP_BHATTACHARYYA)
+            if (distance > self._threshold() and
+                    timestamp - self._last_cut_time >= self.min_shot_length):
+                self.cuts.append(round(timestamp, 3))
+                self._last_cut_time = timestamp
+                self._shot_stats.append(self._current_shot_stats())
+                self._start_shot_stats()
+                distance = 0.0
+                is_cut = True
+            else:
+                # Cuts are kept out of the window so they don't inflate the baseline
+                self._recent_distances.append(distance)
+                if len(self._recent_distances) > self.window:
+                    self._recent_distances.pop(0)
+
+        self._previous_hist = hist
+        self._shot_samples += 1
+        self._shot_brightness += brightness
+        self._shot_activity += distance
+        return is_cut
+
+    def detect(self, cap, fps=None, frame_hook=None):
+        """Run detection over an opened cv2.VideoCapture from the first frame.
+
+        frame_hook(frame, timestamp) is called for every retrieved frame, so
+        other per-frame work can share this decode pass. grab() still decodes
+        the frames in between (only the colour conversion is skipped), so a
+        second pass or seeks afterwards would pay for decoding again.
+        """
+        self.reset()
+        fps = fps or cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+        frame_index = 0
+        clock = time.perf_counter
+        while True:
+            # grab() skips the colour conversion for frames we don't look at
+            started = clock()
+            if not cap.grab():
+                break
+            if frame_index % self.stride == 0:
+                ret, frame = cap.retrieve()
+                decoded = clock()
+                self.decode_seconds += decoded - started
+                if ret:
+                    self.process_frame(frame, frame_index / fps)
+                    self.metric_seconds += clock() - decoded
+                    if frame_hook:
+                        frame_hook(frame, frame_index / fps)
+            else:
+                self.decode_seconds += clock() - started
+            frame_index += 1
+
+        return self.finalize(frame_index / fps if frame_index else 0.0)
+
+    def finalize(self, end_time=None):
+        """Return cut timestamps, shot durations and per-shot stats seen so far"""
+        end_time = end_time if end_time is not None else self._last_timestamp
+        boundaries = [0.0] + self.cuts + [max(end_time, self.cuts[-1] if self.cuts else 0.0)]
+        shot_stats = self._shot_stats + [self._current_shot_stats()]
+
+        shots = []
+        for (start, end), stats in zip(zip(boundaries[:-1], boundaries[1:]), shot_stats):
+            shot = {
+                'start': round(start, 3),
+                'end': round(end, 3),
+                'duration': round(end - start, 3)
+            }
+            shot.update(stats)
+            shots.append(shot)
+
+        return {
+            'cuts': list(self.cuts),
+            'shots': shots,
+            'frames_analyzed': self.frames_processed
+        }
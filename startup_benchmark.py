@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark based on `python -X importtime`.
+
+Measures how long it takes to import a module (or run a command) in a fresh
+interpreter and lists the slowest imports, so heavy dependencies creeping
+back into startup are easy to spot.
+
+    python startup_benchmark.py                       # import ai_upload
+    python startup_benchmark.py quick_upload grok_ai  # other modules
+    python startup_benchmark.py --runs 10 --top 15
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into [(cumulative_us, self_us, module)]"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            # Nested imports are indented by two spaces per level after the '|'
+            rows.append((int(cumulative_us), int(self_us), name.rstrip()[1:]))
+        except ValueError:
+            continue
+    return rows
+
+
+def measure_import(module, runs=5):
+    """Import `module` in fresh interpreters; returns wall times and the last importtime profile"""
+    wall_times = []
+    rows = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                capture_output=True, text=True)
+        wall_times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{result.stderr[-500:]}")
+        rows = parse_importtime(result.stderr)
+    return wall_times, rows
+
+
+def report(module, runs=5, top=10):
+    wall_times, rows = measure_import(module, runs)
+    target = [row for row in rows if row[2] == module]
+    import_total = (target[-1][0] if target else 0) / 1e6
+    nested = [row for row in rows if row[2].startswith(' ')]
+
+    print(f"\n⏱️ import {module}")
+    print(f"   Interpreter + import: median {statistics.median(wall_times) * 1000:.0f} ms "
+          f"(min {min(wall_times) * 1000:.0f} ms, {runs} runs)")
+    print(f"   Import time: {import_total * 1000:.0f} ms across {len(rows)} modules")
+    print(f"   Slowest imports (cumulative):")
+    for cumulative_us, self_us, name in sorted(nested, reverse=True)[:top]:
+        print(f"     {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+
+    return {
+        'module': module,
+        'median_seconds': statistics.median(wall_times),
+        'import_seconds': import_total,
+        'modules_loaded': len(rows)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure interpreter startup and import cost")
+    parser.add_argument("modules", nargs="*", default=["ai_upload"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        report(module, args.runs, args.top)
@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+import pytest
+
+from analysis_accumulators import FrameMetrics, HistogramSum, RunningStats, TopK
+
+
+def test_merged_running_stats_match_numpy():
+    values = np.random.default_rng(7).normal(100.0, 15.0, 1000)
+    stats = RunningStats()
+    for part in np.array_split(values, [1, 250, 600]):
+        piece = RunningStats()
+        if len(part) == 1:
+            piece.add(part[0])
+        else:
+            piece.add_array(part)
+        stats.merge(piece)
+    stats.merge(RunningStats())
+
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.variance == pytest.approx(values.var())
+    assert (stats.minimum, stats.maximum) == (values.min(), values.max())
+    restored = RunningStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+    assert restored.to_dict() == stats.to_dict()
+
+
+def test_histogram_sum_mean():
+    histograms = HistogramSum(4)
+    histograms.add([1, 0, 2, 1])
+    histograms.merge(HistogramSum(4, [3, 2, 0, 1], samples=1))
+    assert histograms.mean().tolist() == [2.0, 1.0, 1.0, 1.0]
+
+
+def test_top_k_keeps_each_key_once():
+    first = TopK(3, [(5.0, 1.0), (9.0, 2.0), (1.0, 3.0)])
+    # The same frames seen again by an overlapping segment
+    second = TopK(3, [(9.0, 2.0), (6.0, 1.0), (4.0, 4.0)])
+    first.merge(second)
+    assert first.items() == [(9.0, 2.0), (6.0, 1.0), (4.0, 4.0)]
+
+    assert first.add(2.0, 2.0)
+    assert first.items()[0] == (9.0, 2.0) and len(first) == 3
+
+
+def test_top_k_drops_payloads_with_their_keys():
+    top = TopK(2)
+    top.add(1.0, 'a', payload='pixels a')
+    top.add(2.0, 'b', payload='pixels b')
+    top.add(3.0, 'c', payload='pixels c')
+    assert top.keys() == ['b', 'c']
+    assert top.payload('a') is None and top.payload('c') == 'pixels c'
+
+
+def test_frame_metrics_round_trip():
+    rng = np.random.default_rng(1)
+    metrics = FrameMetrics(key_frame_count=2)
+    for index in range(4):
+        metrics.add_frame(rng.integers(0, 256, (36, 64, 3), dtype=np.uint8), index * 0.5)
+    restored = FrameMetrics.from_dict(json.loads(json.dumps(metrics.to_dict())), key_frame_count=2)
+    assert restored.to_dict() == metrics.to_dict()
+    assert restored.frames == 4 and restored.motion.count == 3
+    assert len(restored.key_frames) == 2
@@ -0,0 +1,91 @@
+import shutil
+import signal
+import subprocess
+
+import numpy as np
+import pytest
+
+from audio_analyzer import AudioAnalyzer, AudioTotals
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg not installed")
+
+
+@pytest.fixture
+def tone_file(tmp_path):
+    """Twelve seconds of a tone that drops to near silence for one second in three"""
+    path = str(tmp_path / 'tone.wav')
+    subprocess.run([shutil.which('ffmpeg'), '-v', 'error', '-y', '-f', 'lavfi', '-i',
+                    "sine=frequency=440:duration=12,volume='if(lt(mod(t,3),1),0.001,1)':eval=frame",
+                    path], check=True)
+    return path
+
+
+def test_totals_round_trip():
+    totals = AudioTotals(len(AudioAnalyzer.LOUDNESS_BINS))
+    totals.blocks, totals.sum_square = 3, 0.25
+    totals.loudness_hist[[5, 600]] = [2, 1]
+    totals.loudest = [(-20.5, 0.4), (-10.0, 1.2)]
+    restored = AudioTotals(len(AudioAnalyzer.LOUDNESS_BINS), totals.to_dict())
+    assert restored.to_dict() == totals.to_dict()
+    assert np.array_equal(restored.loudness_hist, totals.loudness_hist)
+
+
+@needs_ffmpeg
+def test_piecewise_accumulation_matches_one_pass(tone_file):
+    analyzer = AudioAnalyzer(tone_file)
+    whole = analyzer.analyze_audio()
+
+    totals = AudioTotals(len(AudioAnalyzer.LOUDNESS_BINS))
+    for until in (3.0, 7.3):
+        assert analyzer.accumulate(totals, until=until, final=False)
+        assert totals.blocks == int(until / analyzer.block_seconds + 1e-9)
+    assert analyzer.accumulate(totals)
+    pieces = analyzer.summarize(totals)
+
+    assert pieces['audio_duration'] == whole['audio_duration']
+    assert pieces['silence_ratio'] == whole['silence_ratio']
+    assert pieces['loudness_lufs'] == whole['loudness_lufs']
+    assert pieces['rms_db'] == pytest.approx(whole['rms_db'], abs=0.01)
+    assert pieces['loud_moments'] == whole['loud_moments']
+
+
+@needs_ffmpeg
+def test_video_without_audio_has_no_audio(tmp_path):
+    path = str(tmp_path / 'silent.mp4')
+    subprocess.run([shutil.which('ffmpeg'), '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc=duration=1',
+                    path], check=True)
+    assert AudioAnalyzer(path).analyze_audio() == {'has_audio': False}
+
+
+@needs_ffmpeg
+def test_failed_ffmpeg_run_leaves_totals_unchanged(tone_file, tmp_path):
+    analyzer = AudioAnalyzer(tone_file)
+    totals = AudioTotals(len(AudioAnalyzer.LOUDNESS_BINS))
+    assert analyzer.accumulate(totals, until=3.0, final=False)
+    before = totals.to_dict()
+
+    analyzer.video_path = str(tmp_path / 'missing.wav')
+    assert not analyzer.accumulate(totals)
+    assert totals.to_dict() == before
+    assert AudioAnalyzer(str(tmp_path / 'missing.wav')).analyze_audio() is None
+
+
+@needs_ffmpeg
+def test_ffmpeg_is_killed_when_reading_fails(tone_file, monkeypatch):
+    processes = []
+    popen = subprocess.Popen
+
+    def recording_popen(*args, **kwargs):
+        processes.append(popen(*args, **kwargs))
+        return processes[-1]
+
+    def interrupted(stream, totals, final):
+        stream.read(1024)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(subprocess, 'Popen', recording_popen)
+    analyzer = AudioAnalyzer(tone_file)
+    monkeypatch.setattr(analyzer, '_read_blocks', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        analyzer.accumulate(AudioTotals(len(AudioAnalyzer.LOUDNESS_BINS)))
+    assert processes[0].returncode == -signal.SIGKILL
@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+
+import pytest
+
+import bandwidth
+from bandwidth import BandwidthLimiter, UploadShaper, UploadSlots, parse_rate, parse_schedule
+
+
+@pytest.mark.parametrize('value, rate', [
+    ('2MB', 2 * 1024 ** 2), ('500kb/s', 500 * 1024), ('20Mbps', 2_500_000), ('1.5 g', 1.5 * 1024 ** 3),
+    ('4096', 4096), (1000, 1000), (-5, 0), (None, 0), ('unlimited', 0), ('off', 0), ('', 0)
+])
+def test_parse_rate(value, rate):
+    assert parse_rate(value) == rate
+
+
+@pytest.mark.parametrize('value', ['fast', '2XB', '1.2.3MB', 'MB'])
+def test_parse_rate_rejects_garbage(value):
+    with pytest.raises(ValueError):
+        parse_rate(value)
+
+
+def test_parse_schedule():
+    assert parse_schedule('08:00-20:00=2MB, 20:00-08:00=unlimited,') == \
+        [(480, 1200, 2 * 1024 ** 2), (1200, 480, 0)]
+    assert parse_schedule('1MB') == [(0, 1440, 1024 ** 2)]
+    assert parse_schedule(None) == [(0, 1440, 0)]
+    assert parse_schedule(' , ') == [(0, 1440, 0)]
+
+
+@pytest.mark.parametrize('spec', ['08:00=2MB', '25:00-26:00=1MB', '08:75-09:00=1MB', 'ab-cd=1MB', '08-20=fast'])
+def test_parse_schedule_rejects_garbage(spec):
+    with pytest.raises(ValueError):
+        parse_schedule(spec)
+
+
+def test_schedule_windows_wrap_past_midnight():
+    limiter = BandwidthLimiter('08:00-20:00=2MB, 20:00-08:00=500KB')
+
+    def at(hour, minute=0):
+        return time.mktime((2026, 10, 19, hour, minute, 0, 0, 0, -1))
+
+    assert limiter.current_rate(at(8)) == 2 * 1024 ** 2
+    assert limiter.current_rate(at(19, 59)) == 2 * 1024 ** 2
+    assert limiter.current_rate(at(20)) == 500 * 1024
+    assert limiter.current_rate(at(3)) == 500 * 1024
+
+
+def test_weighted_jobs_split_the_rate(monkeypatch):
+    now = [100.0]
+    sleeps = []
+    monkeypatch.setattr(bandwidth.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(bandwidth.time, 'sleep', sleeps.append)
+    limiter = BandwidthLimiter(1000)
+    heavy, light = limiter.register('heavy', weight=3), limiter.register('light', weight=1)
+
+    # Alone, a job gets the whole rate
+    limiter.consume(light, 100)
+    assert light.next_send == pytest.approx(100.1)
+    # With the light job active, the heavy one gets three quarters
+    limiter.consume(heavy, 300)
+    assert heavy.next_send == pytest.approx(100.4)
+    limiter.consume(heavy, 300)
+    assert sleeps == [pytest.approx(0.4)] and heavy.throttled_seconds == pytest.approx(0.4)
+    assert heavy.bytes_sent == 600
+
+    # Unlimited: nothing is paced, bytes are still counted
+    limiter.set_schedule('unlimited')
+    limiter.consume(light, 10 ** 9)
+    assert len(sleeps) == 1 and light.bytes_sent == 10 ** 9 + 100
+
+
+def test_slots_can_be_resized_while_uploads_run():
+    slots = UploadSlots(1)
+    slots.acquire()
+    started = threading.Event()
+
+    def second_upload():
+        slots.acquire()
+        started.set()
+
+    thread = threading.Thread(target=second_upload, daemon=True)
+    thread.start()
+    assert not started.wait(0.2)
+    slots.set_limit(2)
+    assert started.wait(2)
+
+    # Shrinking lets running uploads finish; a new one waits for a free slot
+    slots.set_limit(1)
+    slots.release()
+    third = threading.Event()
+    threading.Thread(target=lambda: (slots.acquire(), third.set()), daemon=True).start()
+    assert not third.wait(0.2)
+    slots.release()
+    assert third.wait(2)
+
+
+def test_control_file_changes_limits_and_malformed_input_is_ignored(tmp_path):
+    control = tmp_path / 'upload_limits.json'
+    shaper = UploadShaper(schedule='1MB', max_concurrent=2, control_file=str(control))
+
+    def write(text, mtime):
+        control.write_text(text)
+        bandwidth.os.utime(control, (mtime, mtime))
+        shaper._checked = 0.0
+
+    write(json.dumps({'bandwidth': '3MB', 'max_concurrent_uploads': 4}), 1000)
+    shaper.reload_if_changed()
+    assert (shaper.limiter.current_rate(), shaper.slots.limit) == (3 * 1024 ** 2, 4)
+
+    for mtime, text in enumerate(['{not json', '[1, 2]', '7', json.dumps({'bandwidth': '09:00-=1MB'}),
+                                  json.dumps({'bandwidth': '1MB', 'max_concurrent_uploads': None}),
+                                  json.dumps({'max_concurrent_uploads': 'many'})], 2000):
+        write(text, mtime)
+        shaper.reload_if_changed()
+        assert (shaper.limiter.current_rate(), shaper.slots.limit) == (3 * 1024 ** 2, 4)
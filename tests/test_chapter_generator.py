@@ -0,0 +1,60 @@
+import pytest
+
+from chapter_generator import ChapterGenerator, format_timestamp
+
+
+def make_shots(*durations, start=0.0, brightness=None):
+    shots = []
+    for index, duration in enumerate(durations):
+        shots.append({'start': start, 'end': start + duration, 'duration': duration,
+                      'brightness': brightness[index] if brightness else 100.0, 'activity': 0.1})
+        start += duration
+    return shots
+
+
+def test_short_shots_merge_into_chapters_of_the_minimum_length():
+    chapters = ChapterGenerator().build_chapters(make_shots(12, 3, 15, 4, 20, 2, 14))
+    assert all(chapter['duration'] >= 10 for chapter in chapters)
+    assert sum(chapter['shots'] for chapter in chapters) == 7
+    assert [(chapter['start'], chapter['end']) for chapter in chapters][-1][1] == 70
+    for before, after in zip(chapters, chapters[1:]):
+        assert before['end'] == after['start']
+
+
+def test_short_shot_joins_the_visually_closer_neighbour():
+    shots = make_shots(20, 4, 20, 20, brightness=[40, 200, 210, 120])
+    chapters = ChapterGenerator().build_chapters(shots)
+    assert [(chapter['start'], chapter['end']) for chapter in chapters] == [(0, 20), (20, 44), (44, 64)]
+    assert chapters[1]['brightness'] == pytest.approx((200 * 4 + 210 * 20) / 24)
+
+
+def test_first_chapter_starts_at_zero():
+    chapters = ChapterGenerator().build_chapters(make_shots(15, 15, 15, start=0.4))
+    assert chapters[0]['start'] == 0.0
+    assert chapters[0]['duration'] == pytest.approx(15.4)
+
+
+def test_long_take_is_split_up_to_the_minimum_chapter_count():
+    chapters = ChapterGenerator().build_chapters(make_shots(60))
+    assert [(chapter['start'], chapter['end']) for chapter in chapters] == [(0, 15), (15, 30), (30, 60)]
+
+
+def test_too_short_for_chapters():
+    generator = ChapterGenerator()
+    assert generator.build_chapters([]) == []
+    assert generator.build_chapters(make_shots(9, 9, 9)) == []
+    # Long enough in total, but no split leaves three chapters of ten seconds
+    assert generator.build_chapters(make_shots(19, 12)) == []
+
+
+def test_chapter_count_is_capped():
+    chapters = ChapterGenerator(max_chapters=5).build_chapters(make_shots(*[12] * 20))
+    assert len(chapters) == 5
+
+
+def test_format_chapters():
+    generator = ChapterGenerator()
+    chapters = generator.build_chapters(make_shots(40, 3700, 30))
+    assert generator.format_chapters(chapters, ['Intro', '', 'Outro']) == \
+        "0:00 Intro\n0:40 Part 2\n1:02:20 Outro"
+    assert format_timestamp(59.9) == "0:59"
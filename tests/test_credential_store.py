@@ -0,0 +1,98 @@
+import datetime
+import pickle
+import threading
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+from credential_store import DEFAULT_CHANNEL, CredentialStore
+
+
+def utc_in(seconds):
+    """A naive UTC expiry, the way google-auth stores it"""
+    return (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=seconds)).replace(tzinfo=None)
+
+
+def make_credentials(token='token-1', expires_in=3600, refresh_token='refresh'):
+    return Credentials(token, refresh_token=refresh_token, token_uri='https://oauth2.example/token',
+                       client_id='client', client_secret='secret', expiry=utc_in(expires_in))
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    """Count Credentials.refresh calls and hand out new tokens instead of calling Google"""
+    calls = []
+    lock = threading.Lock()
+
+    def refresh(self, request):
+        with lock:
+            calls.append(self)
+            self.token = f"refreshed-{len(calls)}"
+        self.expiry = utc_in(3600)
+
+    monkeypatch.setattr(Credentials, 'refresh', refresh)
+    return calls
+
+
+def test_tokens_are_stored_per_channel(tmp_path, monkeypatch):
+    monkeypatch.delenv('YOUTUBE_CHANNEL_ID', raising=False)
+    store = CredentialStore(str(tmp_path / 'tokens'))
+    store._save('UCone', make_credentials('one'))
+    assert store.default_channel() == 'UCone'
+    store._save('UCtwo', make_credentials('two'))
+
+    assert store.channels() == ['UCone', 'UCtwo']
+    assert store.get_credentials('UCtwo', interactive=False).token == 'two'
+    with pytest.raises(Exception, match='Several channels'):
+        store.default_channel()
+    monkeypatch.setenv('YOUTUBE_CHANNEL_ID', 'UCone')
+    assert store.get_credentials(interactive=False).token == 'one'
+    with pytest.raises(Exception, match='interactive login is disabled'):
+        store.get_credentials('UCthree', interactive=False)
+
+
+def test_token_pickle_is_migrated_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv('YOUTUBE_CHANNEL_ID', raising=False)
+    with open('token.pickle', 'wb') as f:
+        pickle.dump(make_credentials('legacy'), f)
+
+    store = CredentialStore(str(tmp_path / 'tokens'))
+    assert store.get_credentials(interactive=False).token == 'legacy'
+    assert store.channels() == [DEFAULT_CHANNEL]
+    assert not (tmp_path / 'token.pickle').exists()
+    assert (tmp_path / 'token.pickle.migrated').exists()
+
+
+def test_expiring_token_is_refreshed_and_saved(tmp_path, refreshes):
+    store = CredentialStore(str(tmp_path), refresh_margin=300)
+    store._save('UCone', make_credentials(expires_in=60))
+    assert store.get_credentials('UCone', interactive=False).token == 'refreshed-1'
+    assert CredentialStore(str(tmp_path))._load('UCone').token == 'refreshed-1'
+
+    store._save('UCtwo', make_credentials(expires_in=3600))
+    assert store.get_credentials('UCtwo', interactive=False).token == 'token-1'
+    assert len(refreshes) == 1
+
+
+def test_parallel_workers_share_one_refresh(tmp_path, refreshes):
+    CredentialStore(str(tmp_path))._save('UCone', make_credentials(expires_in=60))
+    # Separate stores stand in for separate processes holding the same stale token
+    stores = [CredentialStore(str(tmp_path), refresh_margin=300) for _ in range(6)]
+    tokens = []
+    threads = [threading.Thread(target=lambda store=store: tokens.append(
+        store.get_credentials('UCone', interactive=False).token)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(refreshes) == 1
+    assert tokens == ['refreshed-1'] * 6
+
+
+def test_token_without_refresh_token_asks_for_a_new_login(tmp_path, refreshes):
+    store = CredentialStore(str(tmp_path))
+    with pytest.raises(Exception, match='credential_store.py add --channel UCone'):
+        store._refresh('UCone', make_credentials(expires_in=-10, refresh_token=None))
+    assert not refreshes
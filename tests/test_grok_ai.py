@@ -0,0 +1,117 @@
+import json
+
+from grok_ai import GrokAI
+from llm_backends import FakeBackend, LLMBackendError
+
+
+class FailingFirstModel(FakeBackend):
+    """Streams a title and part of the JSON from one model, then fails it"""
+
+    def __init__(self, failing_model, **kwargs):
+        super().__init__(latency=0, **kwargs)
+        self.failing_model = failing_model
+
+    def complete(self, model, prompt, temperature, max_tokens, on_text=None):
+        if model == self.failing_model:
+            if on_text:
+                on_text('{"selected": "  Stale Title From The Failed Model  ", "opt')
+            raise LLMBackendError("connection reset")
+        return super().complete(model, prompt, temperature, max_tokens, on_text)
+
+    def _answer(self, prompt):
+        # Truncated JSON, so the streamed title is what generate_title falls back on
+        return '{"selected": "Fresh Title From The Fallback", "options": ["Fresh'
+
+
+def make_ai(backend):
+    ai = GrokAI(backend)
+    ai.streaming = True
+    ai.model_routes['title'] = ['primary', 'fallback']
+    return ai
+
+
+def test_title_is_normalized_the_same_when_streamed_and_parsed():
+    class PaddedTitle(FakeBackend):
+        def _answer(self, prompt):
+            return json.dumps({'selected': '  "Padded Title"  ', 'options': []})
+
+    titles = []
+    result = make_ai(PaddedTitle(latency=0)).generate_title('analysis', on_title=titles.append)
+    assert titles == ['Padded Title']
+    assert result['title'] == 'Padded Title'
+
+
+def test_fallback_model_discards_the_failed_stream():
+    titles = []
+    result = make_ai(FailingFirstModel('primary')).generate_title('analysis', on_title=titles.append)
+    # The failed model's title was announced, but the result comes from the fallback's stream
+    assert titles == ['Stale Title From The Failed Model']
+    assert result['title'] == 'Fresh Title From The Fallback'
+
+
+
+def test_batches_fit_within_the_token_limit():
+    from rate_limiter import RateLimiter
+
+    class RecordingLimiter(RateLimiter):
+        def __init__(self):
+            super().__init__(requests_per_minute=30, tokens_per_minute=6000)
+            self.reserved = []
+
+        def acquire(self, tokens, priority=5):
+            self.reserved.append(tokens)
+            return min(tokens, self.tokens_per_minute)
+
+    backend = FakeBackend(latency=0)
+    backend.rate_limited = True
+    ai = GrokAI(backend)
+    limiter = RecordingLimiter()
+    for model in ai.model_routes['batch_metadata']:
+        ai._rate_limiters[model] = limiter
+    items = [{'id': str(i), 'analysis': f"Video {i}: " + "lots of detail " * 2000} for i in range(5)]
+    ai.generate_batch_metadata(items, batch_size=4)
+
+    assert len(limiter.reserved) == 2
+    assert all(tokens <= 6000 for tokens in limiter.reserved)
+
+
+def test_slow_model_is_hedged_and_the_loser_refunds_its_reservation(monkeypatch):
+    import threading
+
+    import rate_limiter
+    from rate_limiter import RateLimiter
+
+    monkeypatch.setattr(rate_limiter.time, 'time', lambda: 1000.0)  # no refill during the test
+
+    release = threading.Event()
+
+    class SlowPrimary(FakeBackend):
+        rate_limited = True
+
+        def complete(self, model, prompt, temperature, max_tokens, on_text=None):
+            if model == 'slow':
+                release.wait(5)
+                return super().complete(model, prompt, temperature, max_tokens, on_text)
+            result = super().complete(model, prompt, temperature, max_tokens, on_text)
+            result['content'] = json.dumps({'selected': 'The Hedge Won This Race', 'options': []})
+            return result
+
+    ai = make_ai(SlowPrimary(latency=0))
+    ai.streaming = False
+    ai.model_routes['title'] = ['slow', 'fast']
+    ai.hedge_after['title'] = 0.05
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=100_000)
+    ai._rate_limiters.update(slow=limiter, fast=limiter)
+
+    result = ai.generate_title('analysis')
+    assert result['title'] == 'The Hedge Won This Race'
+    assert [entry['model'] for entry in ai.usage_log] == ['fast']
+
+    # The losing call is still running; once it ends, only actual usage stays charged
+    executor = ai._hedge_executor
+    ai.shutdown()
+    release.set()
+    executor.shutdown(wait=True)
+    assert [entry['model'] for entry in ai.usage_log] == ['fast', 'slow']
+    used = sum(entry['prompt_tokens'] + entry['completion_tokens'] for entry in ai.usage_log)
+    assert limiter._update_state(lambda state, now: state['tokens']) == 100_000 - used
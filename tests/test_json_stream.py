@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from json_stream import IncrementalJSONFields
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalJSONFields()
+    completed = []
+    for i in range(0, len(text), size):
+        completed.extend(parser.feed(text[i:i + size]))
+    return parser, completed
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, 1000])
+def test_fields_complete_in_order_regardless_of_chunking(size):
+    text = 'Sure! Here it is:\n' + json.dumps({
+        'selected': 'Quote " and \\ backslash é',
+        'options': ['a', {'b': 'nested'}],
+        'reasoning': 'because'
+    })
+    parser, completed = feed_in_chunks(text, size)
+    assert completed == [('selected', 'Quote " and \\ backslash é'), ('reasoning', 'because')]
+    assert parser.fields == dict(completed)
+
+
+def test_field_is_reported_as_soon_as_its_string_closes():
+    parser = IncrementalJSONFields()
+    assert parser.feed('{"selected": "My Ti') == []
+    assert parser.feed('tle", "reas') == [('selected', 'My Title')]
+    assert parser.feed('oning": "x"}') == [('reasoning', 'x')]
+
+
+def test_non_string_values_and_nested_keys_are_skipped():
+    _, completed = feed_in_chunks('{"count": 3, "inner": {"selected": "no"}, "ok": true, "name": "yes"}', 5)
+    assert completed == [('name', 'yes')]
+
+
+def test_parser_reset_forgets_a_partial_response():
+    parser = IncrementalJSONFields()
+    parser.feed('{"selected": "Half')
+    parser.reset()
+    assert parser.feed('{"selected": "Whole"}') == [('selected', 'Whole')]
@@ -0,0 +1,85 @@
+import io
+import json
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from llm_backends import LLMBackendError, OpenAICompatibleBackend
+
+
+class BrokenStream(io.RawIOBase):
+    """Response body that yields some bytes, then fails like a dropped connection"""
+
+    def __init__(self, data, fail=True):
+        self.data = data
+        self.fail = fail
+        self.closed_by_client = False
+
+    def read(self, size=-1):
+        if self.data:
+            chunk, self.data = self.data, b''
+            return chunk
+        if self.fail:
+            raise requests.exceptions.ChunkedEncodingError("connection reset")
+        return b''
+
+    def close(self):
+        self.closed_by_client = True
+        super().close()
+
+
+class CannedAdapter(BaseAdapter):
+    def __init__(self, status, body):
+        super().__init__()
+        self.status = status
+        self.body = body
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = self.status
+        response.raw = self.body
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def sse(*chunks):
+    return b''.join(b'data: ' + json.dumps(chunk).encode() + b'\n\n' for chunk in chunks)
+
+
+def backend_with(adapter):
+    backend = OpenAICompatibleBackend(base_url='http://llm.test')
+    backend.session.mount('http://', adapter)
+    return backend
+
+
+def test_stream_dropped_mid_response_raises_backend_error_and_closes():
+    body = BrokenStream(sse({'choices': [{'delta': {'content': 'Hel'}}]}))
+    received = []
+    backend = backend_with(CannedAdapter(200, body))
+    with pytest.raises(LLMBackendError, match='broken response'):
+        backend.complete('m', 'prompt', 0.5, 10, on_text=received.append)
+    assert received == ['Hel']
+    assert body.closed_by_client
+
+
+def test_complete_stream_is_joined_and_closed():
+    body = BrokenStream(sse({'choices': [{'delta': {'content': 'Hel'}}]},
+                            {'choices': [{'delta': {'content': 'lo'}, 'finish_reason': 'stop'}],
+                             'usage': {'prompt_tokens': 3, 'completion_tokens': 2}}) + b'data: [DONE]\n\n',
+                        fail=False)
+    result = backend_with(CannedAdapter(200, body)).complete('m', 'prompt', 0.5, 10, on_text=lambda delta: None)
+    assert (result['content'], result['finish_reason'], result['completion_tokens']) == ('Hello', 'stop', 2)
+    assert body.closed_by_client
+
+
+def test_error_status_and_invalid_json_are_backend_errors():
+    with pytest.raises(LLMBackendError) as error:
+        backend_with(CannedAdapter(429, BrokenStream(b'slow down', fail=False))).complete('m', 'p', 0.5, 10)
+    assert error.value.status_code == 429
+    with pytest.raises(LLMBackendError, match='broken response'):
+        backend_with(CannedAdapter(200, BrokenStream(b'<html>', fail=False))).complete('m', 'p', 0.5, 10)
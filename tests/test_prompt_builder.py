@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+import prompt_builder
+from prompt_builder import PromptBuilder, count_tokens, truncate_to_tokens
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Use the character estimate whether or not tiktoken is installed"""
+    monkeypatch.setattr(prompt_builder, '_encoding', None)
+    monkeypatch.setattr(prompt_builder, '_encoding_loaded', True)
+
+
+def random_text(rng):
+    words = ['scene', 'motion', 'a', 'brightness', 'tutorial', 'x' * 40]
+    return '\n'.join(' '.join(rng.choice(words) for _ in range(rng.randint(0, 30)))
+                     for _ in range(rng.randint(1, 12)))
+
+
+def test_truncated_text_fits_the_budget():
+    rng = random.Random(4)
+    for _ in range(500):
+        text, budget = random_text(rng), rng.randint(0, 200)
+        trimmed = truncate_to_tokens(text, budget)
+        assert count_tokens(trimmed) <= budget
+        if count_tokens(text) <= budget:
+            assert trimmed == text
+
+
+def test_truncation_keeps_whole_lines_and_marks_a_cut_line():
+    text = "first line\nsecond line\n" + "word " * 100
+    assert truncate_to_tokens(text, 30).startswith("first line\nsecond line\nword")
+    assert truncate_to_tokens(text, 30).endswith("...")
+    assert truncate_to_tokens(text, 0) == ""
+
+
+def test_build_fills_by_priority_and_keeps_insertion_order():
+    builder = PromptBuilder(30)
+    builder.add("INSTRUCTIONS " * 3)
+    builder.add("optional detail " * 20, priority=2)
+    builder.add("analysis " * 100, priority=1, truncatable=True)
+    builder.add("footer")
+    prompt = builder.build()
+
+    sections = prompt.split('\n')
+    assert sections[0] == "INSTRUCTIONS " * 3 and sections[-1] == "footer"
+    assert "optional detail" not in prompt
+    assert sections[1].startswith("analysis") and sections[1].endswith("...")
+    assert count_tokens(prompt) <= 30
+
+
+def test_build_counts_the_separators():
+    rng = random.Random(9)
+    for _ in range(300):
+        builder = PromptBuilder(rng.randint(20, 300))
+        for _ in range(rng.randint(1, 8)):
+            builder.add(random_text(rng), priority=rng.randint(1, 3), truncatable=rng.random() < 0.5)
+        assert count_tokens(builder.build()) <= builder.budget
@@ -0,0 +1,99 @@
+import datetime
+import json
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import quota_ledger
+from quota_ledger import API_COSTS, QuotaLedger, is_quota_error, load_projects
+
+PACIFIC = ZoneInfo('America/Los_Angeles')
+INSERT = API_COSTS['videos.insert']
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Pacific wall-clock time the ledger sees; assign clock[0] to move it"""
+    now = [datetime.datetime(2026, 3, 7, 23, 59, tzinfo=PACIFIC)]
+    monkeypatch.setattr(quota_ledger, '_pacific_now', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def ledger(tmp_path, clock):
+    projects = {'main': {'client_secrets': 'credentials.json', 'daily_quota': 4000},
+                'backup': {'client_secrets': 'backup.json', 'daily_quota': 2000}}
+    return QuotaLedger(str(tmp_path / 'quota.json'), projects)
+
+
+def test_reserve_and_refund(ledger):
+    assert ledger.reserve('videos.insert', 'UCone') == 'main'
+    assert ledger.reserve('thumbnails.set', 'UCone', project='main') == 'main'
+    summary = ledger.summary()['main']
+    assert summary['used'] == INSERT + 50 and summary['channels'] == {'UCone': INSERT + 50}
+    assert summary['calls'] == {'videos.insert': 1, 'thumbnails.set': 1}
+
+    ledger.refund('videos.insert', 'UCone', 'main')
+    summary = ledger.summary()['main']
+    assert summary['used'] == 50 and summary['calls']['videos.insert'] == 0
+    assert ledger.remaining('main') == 3950
+
+
+def test_projects_fail_over_when_used_up_or_exhausted(ledger):
+    assert [ledger.reserve('videos.insert') for _ in range(4)] == ['main', 'main', 'backup', None]
+    assert ledger.remaining('main') == 4000 - 2 * INSERT
+
+    ledger.refund('videos.insert', project='backup')
+    ledger.refund('videos.insert', project='main')
+    ledger.mark_exhausted('main')
+    # The API said main is out, whatever the ledger counted
+    assert ledger.remaining('main') == 0
+    assert ledger.reserve('videos.insert') == 'backup'
+    assert ledger.reserve('videos.insert', project='main') is None
+
+
+def test_usage_resets_at_midnight_pacific(ledger, clock):
+    ledger.reserve('videos.insert')
+    ledger.mark_exhausted('backup')
+    assert quota_ledger.seconds_until_reset() == 60
+    assert quota_ledger.next_reset() == datetime.datetime(2026, 3, 8, tzinfo=PACIFIC)
+    assert ledger.predict_uploads() == 1
+
+    clock[0] = datetime.datetime(2026, 3, 8, 0, 1, tzinfo=PACIFIC)
+    assert quota_ledger.quota_day() == '2026-03-08'
+    assert ledger.remaining('main') == 4000 and ledger.remaining('backup') == 2000
+    assert ledger.predict_uploads() == 2 + 1
+    assert ledger.predict_uploads(with_thumbnail=False) == 2 + 1
+
+
+def test_next_reset_across_daylight_saving(clock):
+    # Clocks go forward at 2:00 on March 8th; the window still ends at midnight
+    clock[0] = datetime.datetime(2026, 3, 8, 12, 0, tzinfo=PACIFIC)
+    assert quota_ledger.next_reset() == datetime.datetime(2026, 3, 9, tzinfo=PACIFIC)
+    assert quota_ledger.seconds_until_reset() == 12 * 3600
+
+
+def test_old_days_are_dropped(ledger, clock):
+    for day in range(1, 12):
+        clock[0] = datetime.datetime(2026, 1, day, 12, tzinfo=PACIFIC)
+        ledger.reserve('videos.list')
+    with open(ledger.path, encoding='utf-8') as f:
+        assert len(json.load(f)) == 8
+
+
+def test_load_projects(monkeypatch):
+    monkeypatch.setenv('YOUTUBE_PROJECTS', 'main=credentials.json, backup=backup.json:20000,broken')
+    monkeypatch.setenv('YOUTUBE_DAILY_QUOTA', '12000')
+    assert load_projects() == {'main': {'client_secrets': 'credentials.json', 'daily_quota': 12000},
+                               'backup': {'client_secrets': 'backup.json', 'daily_quota': 20000}}
+    monkeypatch.delenv('YOUTUBE_PROJECTS')
+    assert list(load_projects()) == [quota_ledger.DEFAULT_PROJECT]
+
+
+def test_is_quota_error():
+    class HttpError(Exception):
+        content = b'{"error": {"errors": [{"reason": "quotaExceeded"}]}}'
+
+    assert is_quota_error(HttpError("<HttpError 403>"))
+    assert is_quota_error(Exception("dailyLimitExceeded"))
+    assert not is_quota_error(Exception("rateLimitExceeded"))
@@ -0,0 +1,104 @@
+import sys
+import threading
+
+import pytest
+
+import rate_limiter
+from grok_ai import GrokAI
+from llm_backends import FakeBackend, LLMBackendError
+from rate_limiter import RateLimiter, parse_reset_duration
+
+
+@pytest.mark.parametrize('value, seconds', [('7.66s', 7.66), ('2m59.56s', 179.56), ('120ms', 0.12),
+                                            ('1h', 3600.0), ('3', 3.0), ('soon', None), (None, None)])
+def test_parse_reset_duration(value, seconds):
+    assert parse_reset_duration(value) == (pytest.approx(seconds) if seconds is not None else None)
+
+
+@pytest.mark.parametrize('use_file', [False, True])
+def test_concurrent_updates_are_not_lost(tmp_path, monkeypatch, use_file):
+    monkeypatch.setattr(rate_limiter.time, 'time', lambda: 1000.0)  # no refill during the test
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # make thread switches inside read-modify-write likely
+    limiter = RateLimiter(30, 1_000_000, str(tmp_path / 'state.json') if use_file else None)
+    charges = 200 if use_file else 2000
+
+    def charge():
+        for _ in range(charges):
+            limiter.record_usage(0, 1)
+
+    try:
+        threads = [threading.Thread(target=charge) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert limiter._update_state(lambda state, now: state['tokens']) == 1_000_000 - 8 * charges
+
+
+def test_acquire_takes_from_both_buckets_and_waits_when_empty(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limiter.time, 'time', lambda: clock[0])
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=600)
+    limiter.acquire(100)
+    limiter.acquire(100)
+    # Both requests are used up: the next one has to wait for 30 s of refill
+    assert limiter._try_take(100) == pytest.approx(30.0)
+    clock[0] += 30.0
+    assert limiter._try_take(100) == 0
+
+
+def test_429_retry_returns_the_reservation():
+    class RateLimitedOnce(FakeBackend):
+        rate_limited = True
+
+        def __init__(self):
+            super().__init__(latency=0)
+            self.calls = 0
+
+        def complete(self, model, prompt, temperature, max_tokens, on_text=None):
+            self.calls += 1
+            if self.calls == 1:
+                raise LLMBackendError("rate limited", 429, {'retry-after': '0.01'})
+            return super().complete(model, prompt, temperature, max_tokens, on_text)
+
+    class RecordingLimiter(RateLimiter):
+        def __init__(self):
+            super().__init__(requests_per_minute=1000, tokens_per_minute=10_000_000)
+            self.usage = []
+
+        def record_usage(self, reserved_tokens, actual_tokens):
+            self.usage.append((reserved_tokens, actual_tokens))
+            super().record_usage(reserved_tokens, actual_tokens)
+
+    backend = RateLimitedOnce()
+    ai = GrokAI(backend)
+    limiter = ai._rate_limiters['model'] = RecordingLimiter()
+    ai._call_model('tags', 'model', 'Suggest tags, comma-separated', 0.5, 100)
+
+    assert backend.calls == 2
+    (refund_reserved, refund_actual), (reserved, actual) = limiter.usage
+    assert refund_reserved == reserved and refund_actual == 0 and actual > 0
+
+
+def test_reservation_larger_than_a_minute_refunds_only_what_was_taken(monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, 'time', lambda: 1000.0)
+    limiter = RateLimiter(30, 6000)
+    taken = limiter.acquire(9100)
+    assert taken == 6000
+    limiter.record_usage(taken, 5000)
+    assert limiter._update_state(lambda state, now: state['tokens']) == 1000
+
+
+def test_call_model_refunds_against_the_capped_reservation(monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, 'time', lambda: 1000.0)
+    backend = FakeBackend(latency=0)
+    backend.rate_limited = True
+    ai = GrokAI(backend)
+    limiter = ai._rate_limiters['model'] = RateLimiter(30, 6000)
+    ai._call_model('tags', 'model', 'Suggest tags, comma-separated', 0.5, 9000)
+
+    used = ai.usage_log[-1]['prompt_tokens'] + ai.usage_log[-1]['completion_tokens']
+    assert limiter._update_state(lambda state, now: state['tokens']) == 6000 - used
@@ -0,0 +1,58 @@
+import pytest
+
+from report_store import ReportStore
+
+
+def report(video_id, content_type, title, uploaded_at, channel_id='chan'):
+    return {
+        'video_id': video_id,
+        'upload_timestamp': uploaded_at,
+        'channel_id': channel_id,
+        'video_analysis': {'content_type': content_type},
+        'ai_generated_content': {'title': title}
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ReportStore(str(tmp_path / 'reports.db'))
+    store.add(report('a', 'tutorial/presentation', 'Learn Python in 10 Minutes', '2024-01-05 10:00:00'),
+              fingerprint='fa')
+    store.add(report('b', 'talking-head/interview', 'A Talk With the Team', '2024-02-10 09:00:00'))
+    store.add(report('c', 'music video/montage', '100% Montage', '2024-03-01 12:00:00', channel_id='other'))
+    store.add(report('d', 'general content', 'Behind the Scenes', '2024-03-15 18:30:00'))
+    return store
+
+
+def ids(rows):
+    return [row['video_id'] for row in rows]
+
+
+@pytest.mark.parametrize('content_type, expected', [
+    ('tutorial', ['a']),
+    ('tutorial/presentation', ['a']),
+    ('presentation', ['a']),
+    ('interview', ['b']),
+    ('music', ['c']),
+    ('montage', ['c']),
+    ('gaming', []),
+    ('%', []),
+    ('_eneral content', []),
+])
+def test_content_type_matches_either_half_by_prefix(store, content_type, expected):
+    assert ids(store.query(content_type=content_type)) == expected
+
+
+def test_filters_combine_and_results_are_newest_first(store):
+    assert ids(store.query()) == ['d', 'c', 'b', 'a']
+    assert ids(store.query(since='2024-02-01', until='2024-03-10')) == ['c', 'b']
+    assert ids(store.query(title='100%')) == ['c']
+    assert ids(store.query(channel_id='chan', limit=2)) == ['d', 'b']
+    assert ids(store.query(content_type='general', since='2024-03-01')) == ['d']
+
+
+def test_fingerprint_lookup_and_stats(store):
+    assert ids(store.find_by_fingerprint('fa')) == ['a']
+    assert store.get('a')['ai_generated_content']['title'] == 'Learn Python in 10 Minutes'
+    stats = store.stats()
+    assert stats['total'] == 4 and stats['by_content_type']['general content'] == 1
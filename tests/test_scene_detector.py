@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+import pytest
+
+from scene_detector import SceneDetector
+
+FPS = 25
+SHOT_COLOURS = [(30, 60, 200), (200, 180, 40), (40, 200, 60), (220, 220, 220)]  # BGR
+
+
+def shot_frame(colour, index, size=(120, 160)):
+    """A flat colour with a small moving square, so shots aren't perfectly static"""
+    frame = np.full(size + (3,), colour, dtype=np.uint8)
+    x = (index * 3) % (size[1] - 20)
+    frame[50:70, x:x + 20] = 128
+    return frame
+
+
+@pytest.fixture
+def cut_video(tmp_path):
+    """Four 2-second shots: cuts at 2, 4 and 6 seconds"""
+    path = str(tmp_path / 'cuts.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), FPS, (160, 120))
+    for colour in SHOT_COLOURS:
+        for index in range(2 * FPS):
+            writer.write(shot_frame(colour, index))
+    writer.release()
+    return path
+
+
+def test_cuts_between_synthetic_shots(cut_video):
+    detector = SceneDetector(stride=5)
+    hooked = []
+    cap = cv2.VideoCapture(cut_video)
+    try:
+        result = detector.detect(cap, frame_hook=lambda frame, timestamp: hooked.append(timestamp))
+    finally:
+        cap.release()
+
+    # With stride 5 a cut is reported at the first retrieved frame of the new shot
+    assert result['cuts'] == [2.0, 4.0, 6.0]
+    assert [shot['duration'] for shot in result['shots']] == [2.0, 2.0, 2.0, 2.0]
+    assert result['frames_analyzed'] == len(hooked) == 8 * FPS // 5
+    assert hooked[:3] == [0.0, 0.2, 0.4]
+
+
+def test_no_cuts_within_a_shot_or_before_min_shot_length():
+    detector = SceneDetector(stride=1, min_shot_length=1.0)
+    for index in range(50):
+        detector.process_frame(shot_frame(SHOT_COLOURS[0], index), index / FPS)
+    # Another change within min_shot_length of the last cut is not reported
+    assert detector.process_frame(shot_frame(SHOT_COLOURS[1], 0), 50 / FPS)
+    assert not detector.process_frame(shot_frame(SHOT_COLOURS[2], 0), 51 / FPS)
+    assert detector.cuts == [2.0]
+
+
+def test_state_round_trip_resumes_detection():
+    frames = [shot_frame(colour, index) for colour in SHOT_COLOURS[:2] for index in range(2 * FPS)]
+    whole = SceneDetector(stride=1)
+    for index, frame in enumerate(frames):
+        whole.process_frame(frame, index / FPS)
+
+    first, second = SceneDetector(stride=1), SceneDetector(stride=1)
+    for index, frame in enumerate(frames[:30]):
+        first.process_frame(frame, index / FPS)
+    second.load_state(first.state_dict())
+    for index, frame in enumerate(frames[30:], 30):
+        second.process_frame(frame, index / FPS)
+    assert second.finalize(4.0) == whole.finalize(4.0)
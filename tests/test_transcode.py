@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import transcode
+from transcode import Transcoder, is_faststart, plan, target_bitrate
+
+
+def box(kind, payload=b''):
+    return (8 + len(payload)).to_bytes(4, 'big') + kind + payload
+
+
+def write_mp4(path, *boxes):
+    with open(path, 'wb') as f:
+        f.write(box(b'ftyp', b'isom\0\0\0\0') + b''.join(boxes))
+    return str(path)
+
+
+class FixedStats:
+    def __init__(self, **values):
+        self.values = dict(transcode.DEFAULTS, **values)
+
+    def get(self, key):
+        return self.values[key]
+
+    def record(self, key, value):
+        pass
+
+
+def test_faststart_detection(tmp_path):
+    assert is_faststart(write_mp4(tmp_path / 'fast.mp4', box(b'moov'), box(b'mdat', b'x' * 64))) is True
+    assert is_faststart(write_mp4(tmp_path / 'slow.mp4', box(b'mdat', b'x' * 64), box(b'moov'))) is False
+    # 64-bit box size for the media data
+    large = (1).to_bytes(4, 'big') + b'free' + (24).to_bytes(8, 'big') + b'\0' * 8
+    assert is_faststart(write_mp4(tmp_path / 'large.mp4', large, box(b'moov'))) is True
+    (tmp_path / 'clip.mkv').write_bytes(b'\x1a\x45\xdf\xa3' + b'\0' * 32)
+    assert is_faststart(str(tmp_path / 'clip.mkv')) is None
+
+
+def test_target_bitrate_follows_the_ladder():
+    assert target_bitrate(1920, 1080, 30) == 8_000_000 + transcode.AUDIO_BITRATE
+    assert target_bitrate(1920, 1080, 60) == 12_000_000 + transcode.AUDIO_BITRATE
+    # Portrait video uses its short side
+    assert target_bitrate(1080, 1920, 30) == 8_000_000 + transcode.AUDIO_BITRATE
+    assert target_bitrate(320, 240, 25) == 1_000_000 + transcode.AUDIO_BITRATE
+
+
+@pytest.mark.parametrize('mode, faststart, mbps, action', [
+    ('off', False, 50, 'keep'),
+    ('remux', False, 50, 'remux'),
+    ('remux', True, 50, 'keep'),
+    ('encode', True, 50, 'encode'),
+    ('encode', True, 9, 'keep'),
+    ('encode', False, 9, 'remux'),
+])
+def test_plan(tmp_path, mode, faststart, mbps, action):
+    duration = 4.0
+    payload = b'\0' * int(mbps * 1_000_000 * duration / 8)
+    boxes = (box(b'moov'), box(b'mdat', payload)) if faststart else (box(b'mdat', payload), box(b'moov'))
+    video = write_mp4(tmp_path / 'clip.mp4', *boxes)
+    info = {'duration': duration, 'resolution': (1920, 1080), 'fps': 30.0}
+    assert plan(video, info, mode, FixedStats())['action'] == action
+
+
+def test_auto_encodes_only_when_the_upload_time_saved_pays_for_it(tmp_path):
+    video = write_mp4(tmp_path / 'clip.mp4', box(b'moov'), box(b'mdat', b'\0' * 25_000_000))
+    info = {'duration': 4.0, 'resolution': (1920, 1080), 'fps': 30.0}
+    slow_upload = FixedStats(upload_bytes_per_second=100_000)
+    fast_upload = FixedStats(upload_bytes_per_second=1_000_000_000, generate_seconds=0.0)
+    assert plan(video, info, 'auto', slow_upload)['action'] == 'encode'
+    assert plan(video, info, 'auto', fast_upload)['action'] == 'keep'
+
+
+def test_runs_of_same_named_files_get_separate_outputs(tmp_path, monkeypatch):
+    outputs = []
+
+    def fake_ffmpeg(command, **kwargs):
+        outputs.append(command[-1])
+        with open(command[-1], 'wb') as f:
+            f.write(b'remuxed')
+        return type('Completed', (), {'returncode': 0, 'stderr': b''})()
+
+    monkeypatch.setattr(transcode.subprocess, 'run', fake_ffmpeg)
+    transcoder = Transcoder(mode='remux', output_dir=str(tmp_path / 'out'), stats=FixedStats())
+    decision = {'action': 'remux', 'source_bytes': 100}
+    results = [transcoder.run(str(tmp_path / folder / 'clip.mp4'), {}, decision) for folder in ('a', 'b')]
+
+    assert outputs[0] != outputs[1]
+    assert [result['path'] for result in results] == outputs
+    assert all(os.path.basename(path).startswith('clip.remux.') for path in outputs)
@@ -0,0 +1,47 @@
+import sys
+import types
+
+import transcriber
+from transcriber import Transcriber, build_digest
+
+
+def test_short_transcript_is_passed_through():
+    transcript = {'language': 'en', 'text': 'Welcome back to the channel', 'segments': []}
+    assert build_digest(transcript) == "Transcript (en): Welcome back to the channel"
+    assert build_digest({'text': ''}) == ""
+    assert build_digest(None) == ""
+
+
+def test_long_transcript_is_condensed_to_keywords_and_excerpts():
+    segments = [{'start': i * 5.0, 'end': i * 5.0 + 5, 'text': f"now we solder the resistor onto board {i}"}
+                for i in range(300)]
+    transcript = {'language': 'en', 'text': ' '.join(seg['text'] for seg in segments), 'segments': segments}
+    digest = build_digest(transcript, max_words=100, max_keywords=3)
+
+    header, keywords, excerpts_title, *excerpts = digest.split('\n')
+    assert header == "Transcript digest (en, 2400 words spoken)"
+    assert keywords == "Key terms: now, solder, resistor"
+    assert excerpts[0] == "[0:00] now we solder the resistor onto board 0"
+    assert sum(len(line.split()) - 1 for line in excerpts) <= 100 - 3
+    # Excerpts are spread over the whole video, not just its start
+    assert excerpts[-1].startswith("[2")
+
+
+def test_model_is_loaded_once_per_process(tmp_path, monkeypatch):
+    loaded = []
+
+    class WhisperModel:
+        def __init__(self, size, **kwargs):
+            loaded.append(size)
+
+        def transcribe(self, path, **kwargs):
+            segment = types.SimpleNamespace(start=0.0, end=1.0, text=' hello ')
+            return [segment], types.SimpleNamespace(language='en', duration=1.0)
+
+    monkeypatch.setitem(sys.modules, 'faster_whisper', types.SimpleNamespace(WhisperModel=WhisperModel))
+    monkeypatch.setattr(transcriber, '_models', {})
+    for name in ('one.mp4', 'two.mp4'):
+        (tmp_path / name).write_bytes(name.encode() * 100)
+        result = Transcriber('tiny', cache_dir=str(tmp_path / 'cache')).transcribe(str(tmp_path / name))
+        assert result['text'] == 'hello' and not result['cached']
+    assert loaded == ['tiny']
@@ -0,0 +1,188 @@
+import hashlib
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import bandwidth
+import tracing
+import quota_ledger
+import report_store
+import video_fingerprint
+from fake_youtube import FakeYouTube
+
+
+@pytest.fixture
+def uploader(tmp_path, monkeypatch):
+    """An AIYouTubeUploader on the fake LLM backend, with all state files under tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('LLM_BACKEND', 'fake')
+    monkeypatch.setenv('FAKE_LLM_LATENCY', '0')
+    monkeypatch.setenv('YOUTUBE_QUOTA_LEDGER', str(tmp_path / 'quota.json'))
+    monkeypatch.setenv('REPORT_DB', str(tmp_path / 'reports.db'))
+    monkeypatch.setenv('TRANSCODE', 'off')
+    monkeypatch.setenv('ENABLE_TRANSCRIPTION', 'false')
+    monkeypatch.setenv('UPLOAD_REPORT_FILES', 'false')
+    for module, name in ((bandwidth, '_shared_shaper'), (quota_ledger, '_shared_ledger'),
+                         (report_store, '_shared_store'), (video_fingerprint, '_shared_index')):
+        monkeypatch.setattr(module, name, None)
+
+    from ai_upload import AIYouTubeUploader
+    with AIYouTubeUploader() as uploader:
+        yield uploader
+
+
+def write_clip(path, size=(320, 180), seed=3):
+    """Six seconds of video with a hard cut every two seconds"""
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 15, size)
+    rng = np.random.default_rng(seed)
+    for shot in range(3):
+        # A smooth random pattern per shot, so different seeds look different at any size
+        base = cv2.resize(rng.integers(40, 220, size=(4, 4, 3)).astype(np.uint8), size)
+        for i in range(30):
+            frame = base.copy()
+            x = width * (10 + i * 5) // 320
+            cv2.rectangle(frame, (x, height // 3), (x + width // 6, height * 2 // 3), (255, 255, 255), -1)
+            writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    return write_clip(str(tmp_path / 'clip.mp4'))
+
+
+def test_failed_upload_closes_the_media_file(uploader, video_file, monkeypatch):
+    from media_source import MmapMediaUpload
+
+    closed = []
+    original_close = MmapMediaUpload.close
+    monkeypatch.setattr(MmapMediaUpload, 'close', lambda self: closed.append(self) or original_close(self))
+
+    fake = FakeYouTube()
+    fake.fail('upload.chunk', 503, times=10)
+    with fake.installed():
+        assert uploader.upload_video_with_ai(video_file) is None
+    assert len(closed) == 1
+    assert closed[0]._file.closed
+
+
+def test_batch_leaves_near_duplicates_out_of_the_prompt(uploader, video_file, tmp_path, monkeypatch):
+    resized = write_clip(str(tmp_path / 'clip_small.mp4'), size=(240, 136))
+    other = write_clip(str(tmp_path / 'other.mp4'), seed=11)
+    spans = []
+    monkeypatch.setattr(tracing, '_listeners', [])
+    tracing.add_listener(lambda span: spans.append((span.name, span.parent_id is None)))
+    prompts = []
+    generate = uploader.grok_ai.generate_batch_metadata
+    monkeypatch.setattr(uploader.grok_ai, 'generate_batch_metadata',
+                        lambda items, *args: prompts.append(items) or generate(items, *args))
+
+    contents = uploader.generate_content_batch([video_file, resized, other])
+    # The resized copy is left for upload_video_with_ai(), which compares it with the uploaded original
+    assert sorted(contents) == sorted([video_file, other])
+    assert len(prompts[0]) == 2
+    assert ('video', True) in spans and ('analyze', False) in spans
+
+    with FakeYouTube().installed():
+        uploaded = uploader.upload_video_with_ai(video_file, ai_content=contents[video_file])
+    contents = uploader.generate_content_batch([resized])
+    assert contents[resized]['duplicate']
+    assert contents[resized]['video_id'] == uploaded['video_id']
+    assert len(prompts) == 1
+
+
+def test_close_stops_the_background_workers(uploader, monkeypatch):
+    stopped = []
+    uploader.transcriber = type('Transcriber', (), {'shutdown': lambda self: stopped.append('transcriber')})()
+    monkeypatch.setattr(uploader.transcoder, 'shutdown', lambda: stopped.append('transcoder'))
+    monkeypatch.setattr(uploader.grok_ai, 'shutdown', lambda: stopped.append('grok_ai'))
+    with uploader:
+        pass
+    assert stopped == ['transcriber', 'transcoder', 'grok_ai']
+
+
+def test_upload_end_to_end(uploader, video_file):
+    fake = FakeYouTube()
+    with fake.installed():
+        result = uploader.upload_video_with_ai(video_file, privacy='unlisted')
+
+    video = fake.videos[result['video_id']]
+    with open(video_file, 'rb') as f:
+        assert video['sha256'] == hashlib.sha256(f.read()).hexdigest()
+    assert video['snippet']['title'] == result['ai_content']['title']
+    assert video['snippet']['tags'] == result['ai_content']['tags']
+    assert video['status']['privacyStatus'] == 'unlisted'
+    assert video['mimetype'] == 'video/mp4'
+    assert video['thumbnail'] is not None
+    assert uploader.find_previous_upload(video_file)['video_id'] == result['video_id']
+
+
+class RangeRecordingYouTube(FakeYouTube):
+    """Remembers where each upload chunk started"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.chunk_starts = []
+
+    def _upload_chunk(self, request, query):
+        self.chunk_starts.append(int(request.headers['Content-Range'][len('bytes '):].split('-')[0]))
+        return super()._upload_chunk(request, query)
+
+
+def test_dropped_connection_resumes_the_upload(uploader, tmp_path):
+    # Noise doesn't compress, so the file spans several of the fake's 256 KB commit blocks
+    video_file = str(tmp_path / 'noise.mp4')
+    writer = cv2.VideoWriter(video_file, cv2.VideoWriter_fourcc(*'mp4v'), 15, (320, 180))
+    rng = np.random.default_rng(5)
+    for _ in range(45):
+        writer.write(rng.integers(0, 256, (180, 320, 3), dtype=np.uint8))
+    writer.release()
+    size = os.path.getsize(video_file)
+    assert size > 3 * 256 * 1024
+
+    fake = RangeRecordingYouTube()
+    fake.drop_at(size * 3 // 4)
+    with fake.installed():
+        result = uploader.upload_video_with_ai(video_file)
+
+    requests = fake.stats()['requests']
+    assert requests['upload.chunk'] == {'dropped': 1, 200: 1}
+    assert requests['upload.status'] == {308: 1}
+    # The retry picks up after the last whole block the fake committed before the drop
+    assert fake.chunk_starts == [0, size * 3 // 4 // (256 * 1024) * 256 * 1024]
+    video = fake.videos[result['video_id']]
+    with open(video_file, 'rb') as f:
+        assert video['sha256'] == hashlib.sha256(f.read()).hexdigest()
+    assert video['bytes'] == size
+
+
+def test_plain_upload_closes_the_media_and_refunds_quota_on_failure(tmp_path, monkeypatch, video_file):
+    import upload
+    from media_source import MmapMediaUpload
+    from youtube_transport import build_youtube_service
+
+    monkeypatch.setenv('YOUTUBE_QUOTA_LEDGER', str(tmp_path / 'quota.json'))
+    monkeypatch.setattr(quota_ledger, '_shared_ledger', None)
+    monkeypatch.setattr(upload, 'get_authenticated_service', lambda channel_id=None, project=None:
+                        build_youtube_service(None))
+    closed = []
+    original_close = MmapMediaUpload.close
+    monkeypatch.setattr(MmapMediaUpload, 'close', lambda self: closed.append(self) or original_close(self))
+    ledger = quota_ledger.get_quota_ledger()
+    before = ledger.remaining()
+
+    fake = FakeYouTube()
+    fake.fail('upload.chunk', 400)
+    with fake.installed(), pytest.raises(Exception):
+        upload.upload_video(video_file, "A title for the test video", "Description")
+    assert len(closed) == 1 and closed[0]._file.closed
+    assert ledger.remaining() == before
+
+    with fake.installed():
+        upload.upload_video(video_file, "A title for the test video", "Description")
+    assert len(closed) == 2 and fake.stats()['videos'] == 1
+    assert ledger.remaining() == before - quota_ledger.API_COSTS['videos.insert']
@@ -0,0 +1,119 @@
+import random
+
+import numpy as np
+import pytest
+
+from video_fingerprint import (DuplicateIndex, FingerprintError, FingerprintGrid, FingerprintSampler,
+                               MultiIndex, VideoFingerprint,
+                               compute_fingerprint, frame_phash)
+
+
+def random_fingerprint(rng, duration=60.0):
+    return VideoFingerprint(duration, [rng.getrandbits(64) for _ in range(16)])
+
+
+def flip_bits(fingerprint, count, rng):
+    """Copy of fingerprint with `count` distinct random bits flipped"""
+    hashes = list(fingerprint.hashes)
+    for position in rng.sample(range(64 * len(hashes)), count):
+        hashes[position // 64] ^= 1 << (position % 64)
+    return VideoFingerprint(fingerprint.duration, hashes)
+
+
+def test_distance_and_hex_round_trip():
+    rng = random.Random(1)
+    fingerprint = random_fingerprint(rng)
+    assert VideoFingerprint.from_dict(fingerprint.to_dict()).hashes == fingerprint.hashes
+    assert fingerprint.distance(flip_bits(fingerprint, 37, rng)) == 37
+
+
+def test_probe_plan_guarantees_a_shared_chunk():
+    assert MultiIndex.probe_plan(64, 160) == (2, 11)
+    assert MultiIndex.probe_plan(64, 10) == (0, 54)
+
+
+def test_search_finds_every_match_and_prunes_the_rest():
+    rng = random.Random(7)
+    index = MultiIndex()
+    for number in range(3000):
+        index.add(random_fingerprint(rng), number)
+    query = random_fingerprint(rng)
+    planted = {'near': flip_bits(query, 40, rng), 'edge': flip_bits(query, 160, rng),
+               'outside': flip_bits(query, 161, rng)}
+    for name, fingerprint in planted.items():
+        index.add(fingerprint, name)
+
+    matches = index.search(query, 160)
+
+    assert [value for _, value in matches] == ['near', 'edge']
+    # A linear scan would compute 3003 distances
+    assert index.compared < 30
+
+
+def test_search_is_exact_against_a_linear_scan():
+    rng = random.Random(3)
+    base = random_fingerprint(rng)
+    fingerprints = [flip_bits(base, rng.randrange(0, 300), rng) for _ in range(300)]
+    index = MultiIndex()
+    for number, fingerprint in enumerate(fingerprints):
+        index.add(fingerprint, number)
+
+    found = {value for _, value in index.search(base, 160)}
+
+    assert found == {number for number, fingerprint in enumerate(fingerprints)
+                     if base.distance(fingerprint) <= 160}
+
+
+class FakeStore:
+    def __init__(self, fingerprints):
+        self._fingerprints = fingerprints
+
+    def fingerprints(self):
+        return self._fingerprints
+
+
+def test_duplicate_index_filters_by_duration():
+    rng = random.Random(5)
+    original = random_fingerprint(rng, duration=100.0)
+    index = DuplicateIndex(FakeStore([('same', original),
+                                      ('longer', VideoFingerprint(130.0, original.hashes))]),
+                           max_bits_per_frame=10)
+
+    assert index.find_similar(flip_bits(original, 48, rng)) == [('same', 3.0)]
+
+
+def test_frame_phash_survives_resizing():
+    rng = np.random.default_rng(0)
+    frame = (rng.random((36, 64, 3)) * 255).astype(np.uint8).repeat(10, axis=0).repeat(10, axis=1)
+    import cv2
+    small = cv2.resize(frame, (320, 180), interpolation=cv2.INTER_AREA)
+    assert (frame_phash(frame) ^ frame_phash(small)).bit_count() <= 4
+
+
+def test_compute_fingerprint_rejects_unreadable_files(tmp_path):
+    path = tmp_path / "broken.mp4"
+    path.write_bytes(b"not a video")
+    with pytest.raises(FingerprintError):
+        compute_fingerprint(str(path))
+
+
+@pytest.mark.parametrize('max_hashes', [4096, 8])
+def test_fingerprint_grid_matches_the_sampler(max_hashes):
+    rng = np.random.default_rng(5)
+    frames = [rng.integers(0, 256, size=(24, 32, 3), dtype=np.uint8) for _ in range(403)]
+    fps, stride = 25.0, 5
+
+    sampler = FingerprintSampler(len(frames) / fps)
+    grid = FingerprintGrid(stride, max_hashes=max_hashes)
+    for index, frame in enumerate(frames):
+        if index % stride == 0:
+            sampler.offer(frame, index / fps)
+        grid.offer(index, frame if index % stride == 0 else None)
+    # Resuming from the serialized grid changes nothing
+    grid = FingerprintGrid(max_hashes=max_hashes, data=grid.to_dict())
+
+    reads = []
+    fingerprint = grid.fingerprint(len(frames), fps, lambda index: reads.append(index) or frames[index])
+    assert fingerprint.hashes == sampler.fingerprint().hashes
+    assert len(grid.hashes) <= max_hashes
+    assert bool(reads) == (max_hashes < len(frames) // stride)
@@ -0,0 +1,254 @@
+"""
+Lightweight tracing for the upload pipeline.
+
+    with tracing.span('thumbnail.render', video=path) as span:
+        ...
+        span.add('bytes', size)
+
+Spans nest through contextvars (use tracing.wrap() for work handed to
+thread pools) and are kept in memory per trace, so the upload report can
+show where each video's wall time went. Export is optional:
+
+    TRACING=false               spans become a shared no-op (near-zero cost)
+    TRACE_FILE=traces.jsonl     append every finished span as a JSON line
+    TRACE_OTLP_FILE=otlp.json   write each finished trace as OTLP/JSON
+    OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318   POST traces to a collector
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+
+SERVICE_NAME = "yt-ai-uploader"
+
+_enabled = os.getenv('TRACING', 'true').lower() not in ('0', 'false', 'no', 'off')
+_current = contextvars.ContextVar('current_span', default=None)
+_lock = threading.Lock()
+_traces = {}
+_listeners = []
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = bool(value)
+
+
+class Span:
+    """One timed operation; attributes are plain JSON values"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'status', '_token')
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = 'ok'
+        self._token = None
+
+    @property
+    def duration(self):
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e9
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, amount):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.status = 'error'
+            self.attributes['error'] = f"{exc_type.__name__}: {exc_value}"
+            self.attributes['error_type'] = exc_type.__name__
+        _current.reset(self._token)
+        _finish(self)
+        return False
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start_ns / 1e9,
+            'duration': round(self.duration, 6),
+            'status': self.status,
+            'attributes': self.attributes
+        }
+
+
+class _NoopSpan:
+    """Returned by span() while tracing is disabled"""
+
+    __slots__ = ()
+    trace_id = None
+    duration = 0.0
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, amount):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name, **attributes):
+    """Context manager timing `name` as a child of the current span"""
+    if not _enabled:
+        return _NOOP
+    parent = _current.get()
+    new_span = Span(name, parent, attributes)
+    if parent is None:
+        with _lock:
+            _traces[new_span.trace_id] = []
+    return new_span
+
+
+def record(name, duration, **attributes):
+    """Add an already-measured span (e.g. time accumulated over many frames) ending now"""
+    if not _enabled:
+        return
+    finished = Span(name, _current.get(), attributes)
+    finished.end_ns = time.time_ns()
+    finished.start_ns = finished.end_ns - int(duration * 1e9)
+    _finish(finished)
+
+
+def add_listener(callback):
+    """Call callback(span) for every finished span (e.g. to feed metrics)"""
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def current_span():
+    return _current.get() or _NOOP
+
+
+def wrap(fn):
+    """Bind fn to the current trace context, for executor.submit()"""
+    if not _enabled:
+        return fn
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def _finish(finished):
+    if finished.end_ns is None:
+        finished.end_ns = time.time_ns()
+
+    with _lock:
+        spans = _traces.get(finished.trace_id)
+        if spans is not None:
+            spans.append(finished)
+        is_root = finished.parent_id is None
+        completed = _traces.pop(finished.trace_id, None) if is_root else None
+
+    trace_file = os.getenv('TRACE_FILE')
+    if trace_file:
+        line = json.dumps(finished.to_dict(), default=str)
+        with _lock, open(trace_file, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+    for callback in _listeners:
+        try:
+            callback(finished)
+        except Exception as e:
+            print(f"⚠️ Span listener failed: {e}")
+
+    if completed:
+        _export_otlp(completed)
+
+
+def summarize(root):
+    """Per-stage totals for the trace under `root`: {name: {count, seconds, bytes}}"""
+    if not _enabled or root is _NOOP:
+        return {}
+    with _lock:
+        spans = list(_traces.get(root.trace_id, []))
+
+    stages = {}
+    for finished in spans:
+        stage = stages.setdefault(finished.name, {'count': 0, 'seconds': 0.0})
+        stage['count'] += 1
+        stage['seconds'] = round(stage['seconds'] + finished.duration, 4)
+        if 'bytes' in finished.attributes:
+            stage['bytes'] = stage.get('bytes', 0) + finished.attributes['bytes']
+    return {
+        'wall_seconds': round(root.duration, 4),
+        'stages': stages
+    }
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otlp(spans):
+    """OTLP/JSON (ExportTraceServiceRequest) for a list of spans"""
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+            'scopeSpans': [{
+                'scope': {'name': 'tracing'},
+                'spans': [{
+                    'traceId': s.trace_id,
+                    'spanId': s.span_id,
+                    'parentSpanId': s.parent_id or '',
+                    'name': s.name,
+                    'kind': 1,
+                    'startTimeUnixNano': str(s.start_ns),
+                    'endTimeUnixNano': str(s.end_ns),
+                    'attributes': [{'key': k, 'value': _otlp_value(v)} for k, v in s.attributes.items()],
+                    'status': {'code': 2 if s.status == 'error' else 1}
+                } for s in spans]
+            }]
+        }]
+    }
+
+
+def _export_otlp(spans):
+    otlp_file = os.getenv('TRACE_OTLP_FILE')
+    endpoint = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT')
+    if not otlp_file and not endpoint:
+        return
+
+    payload = to_otlp(spans)
+    if otlp_file:
+        with _lock, open(otlp_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(payload) + '\n')
+    if endpoint:
+        try:
+            import requests
+            requests.post(endpoint.rstrip('/') + '/v1/traces', json=payload, timeout=5)
+        except Exception as e:
+            print(f"⚠️ Could not export trace to {endpoint}: {e}")
@@ -0,0 +1,303 @@
+"""
+Optional pre-upload remux/re-encode with a local ffmpeg.
+
+Camera and OBS exports are often recorded at several times the bitrate
+YouTube re-encodes to, and MP4s written without faststart keep their index
+at the end of the file. With TRANSCODE enabled the uploader runs ffmpeg
+while the AI content is being generated and uploads the result instead:
+
+    TRANSCODE=off      upload the original file (default)
+    TRANSCODE=remux    only move the MP4 index to the front (-c copy, seconds)
+    TRANSCODE=encode   also re-encode files above YouTube's recommended bitrate
+    TRANSCODE=auto     re-encode only when the upload time saved outweighs the
+                       encode time not hidden behind AI generation
+
+The auto decision uses upload throughput, encode speed and generation time
+measured on earlier uploads (TRANSCODE_STATS, default transcode_stats.json).
+Encodes use libx264/AAC presets, so results don't depend on the GPU.
+
+    python transcode.py video.mp4         # show the decision for a file
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from file_lock import FileLock
+
+MODES = ('off', 'remux', 'encode', 'auto')
+
+# YouTube's recommended SDR upload bitrates in bits/s: (min height, 24-30 fps, 48-60 fps)
+BITRATE_LADDER = (
+    (2160, 40_000_000, 60_000_000),
+    (1440, 16_000_000, 24_000_000),
+    (1080, 8_000_000, 12_000_000),
+    (720, 5_000_000, 7_500_000),
+    (480, 2_500_000, 4_000_000),
+    (0, 1_000_000, 1_500_000)
+)
+AUDIO_BITRATE = 384_000
+
+# Re-encoding a file already near the ladder saves little and costs quality
+MIN_BITRATE_RATIO = 1.25
+
+# Used until the first uploads have been measured
+DEFAULTS = {
+    'upload_bytes_per_second': 2 * 1024 ** 2,
+    'encode_pixels_per_second': 50_000_000,
+    'remux_bytes_per_second': 200 * 1024 ** 2,
+    'generate_seconds': 15.0
+}
+
+
+def target_bitrate(width, height, fps):
+    """Recommended video + audio bitrate (bits/s) for a resolution and frame rate"""
+    short_side = min(width, height) if width and height else height
+    for min_height, standard, high_fps in BITRATE_LADDER:
+        if short_side >= min_height:
+            return (high_fps if fps and fps > 31 else standard) + AUDIO_BITRATE
+    return BITRATE_LADDER[-1][1] + AUDIO_BITRATE
+
+
+def is_faststart(path):
+    """True if the MP4/MOV index (moov) precedes the media data, None for other containers"""
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = 0
+            while offset + 8 <= size:
+                f.seek(offset)
+                header = f.read(16)
+                box_size = int.from_bytes(header[:4], 'big')
+                box_type = header[4:8]
+                if offset == 0 and box_type != b'ftyp':
+                    return None
+                if box_type == b'moov':
+                    return True
+                if box_type == b'mdat':
+                    return False
+                if box_size == 1:
+                    box_size = int.from_bytes(header[8:16], 'big')
+                elif box_size == 0:
+                    break
+                if box_size < 8:
+                    break
+                offset += box_size
+    except OSError:
+        return None
+    return None
+
+
+class TranscodeStats:
+    """Moving averages of upload and encode speed, shared between processes through a JSON file"""
+
+    def __init__(self, path=None, alpha=0.3):
+        self.path = path or os.getenv('TRANSCODE_STATS', 'transcode_stats.json')
+        self.alpha = alpha
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        return self._read().get(key, DEFAULTS[key])
+
+    def record(self, key, value):
+        """Blend a new measurement into the average for key"""
+        if not value or value <= 0:
+            return
+        with self._lock, FileLock(self.path + '.lock'):
+            stats = self._read()
+            previous = stats.get(key)
+            stats[key] = value if previous is None else previous + self.alpha * (value - previous)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp',
+                                             encoding='utf-8') as f:
+                json.dump(stats, f, indent=2)
+            os.replace(f.name, self.path)
+
+
+def plan(video_file, video_info, mode, stats, upload_rate=None):
+    """Decide what to do with a file: {'action': 'keep'|'remux'|'encode', 'reason', estimates...}"""
+    source_bytes = os.path.getsize(video_file)
+    duration = video_info.get('duration') or 0
+    width, height = video_info.get('resolution') or (0, 0)
+    fps = video_info.get('fps') or 30.0
+    decision = {'action': 'keep', 'mode': mode, 'source_bytes': source_bytes}
+    if mode == 'off':
+        decision['reason'] = 'disabled'
+        return decision
+
+    faststart = is_faststart(video_file)
+    target = target_bitrate(width, height, fps)
+    source_bitrate = source_bytes * 8 / duration if duration > 0 else 0
+    decision['source_bitrate'] = round(source_bitrate)
+    decision['target_bitrate'] = target
+
+    upload_rate = upload_rate or stats.get('upload_bytes_per_second')
+    if mode in ('encode', 'auto') and duration > 0 and width and \
+            source_bitrate > target * MIN_BITRATE_RATIO:
+        estimated_bytes = int(target * duration / 8)
+        upload_seconds_saved = (source_bytes - estimated_bytes) / upload_rate
+        encode_seconds = width * height * fps * duration / stats.get('encode_pixels_per_second')
+        # The encode runs during AI generation, so only the part beyond it costs wall time
+        exposed_seconds = max(0.0, encode_seconds - stats.get('generate_seconds'))
+        decision.update({
+            'estimated_bytes': estimated_bytes,
+            'estimated_encode_seconds': round(encode_seconds, 1),
+            'estimated_seconds_saved': round(upload_seconds_saved - exposed_seconds, 1)
+        })
+        if mode == 'encode' or upload_seconds_saved > exposed_seconds:
+            decision['action'] = 'encode'
+            decision['reason'] = f"{source_bitrate / 1e6:.1f} Mbps source, {target / 1e6:.1f} Mbps recommended"
+            return decision
+
+    if faststart is False:
+        decision['action'] = 'remux'
+        decision['reason'] = 'MP4 index at the end of the file'
+    elif 'estimated_seconds_saved' in decision:
+        decision['reason'] = 'encoding would not finish before it pays off'
+    else:
+        decision['reason'] = 'nothing to gain'
+    return decision
+
+
+class Transcoder:
+    """Runs the planned ffmpeg job in the background while the AI content is generated"""
+
+    def __init__(self, mode=None, preset=None, output_dir=None, stats=None):
+        self.mode = (mode or os.getenv('TRANSCODE', 'off')).lower()
+        if self.mode not in MODES:
+            raise ValueError(f"TRANSCODE must be one of {', '.join(MODES)}, not '{self.mode}'")
+        self.preset = preset or os.getenv('TRANSCODE_PRESET', 'veryfast')
+        self.output_dir = output_dir or os.getenv('TRANSCODE_DIR', os.path.join('.cache', 'transcode'))
+        self.stats = stats or TranscodeStats()
+        self.ffmpeg_path = shutil.which('ffmpeg')
+        self._executor = None
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def start_background(self, video_file, video_info, upload_rate=None):
+        """Plan and start the job; returns a Future of the result dict (or None if disabled)"""
+        if not self.enabled:
+            return None
+        if not self.ffmpeg_path:
+            print("⚠️ ffmpeg not found - uploading the original file")
+            return None
+        decision = plan(video_file, video_info, self.mode, self.stats, upload_rate)
+        if decision['action'] == 'keep':
+            return None
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        return self._executor.submit(tracing.wrap(self.run), video_file, video_info, decision)
+
+    def _command(self, video_file, video_info, decision, output):
+        command = [self.ffmpeg_path, '-v', 'error', '-nostdin', '-y', '-i', video_file,
+                   '-map', '0:v:0', '-map', '0:a?']
+        if decision['action'] == 'remux':
+            return command + ['-c', 'copy', '-movflags', '+faststart', output]
+        video_bitrate = decision['target_bitrate'] - AUDIO_BITRATE
+        fps = video_info.get('fps') or 30.0
+        # Capped CRF: simple scenes come out smaller, busy ones stay at the recommendation;
+        # closed GOPs of half the frame rate are what YouTube asks for
+        return command + [
+            '-c:v', 'libx264', '-preset', self.preset, '-crf', '18',
+            '-maxrate', str(video_bitrate), '-bufsize', str(video_bitrate * 2),
+            '-profile:v', 'high', '-pix_fmt', 'yuv420p', '-bf', '2',
+            '-g', str(max(1, int(round(fps / 2)))), '-flags', '+cgop',
+            '-c:a', 'aac', '-b:a', str(AUDIO_BITRATE), '-ar', '48000',
+            '-movflags', '+faststart', output
+        ]
+
+    def run(self, video_file, video_info, decision):
+        """Run ffmpeg; the result's 'path' is the file to upload (the original if it didn't help)"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(video_file))[0]
+        # A unique name per run: two uploads of the same file (or same-named files from
+        # different folders) in one process would otherwise write the same output
+        fd, output = tempfile.mkstemp(prefix=f"{stem}.{decision['action']}.", suffix='.mp4',
+                                      dir=self.output_dir)
+        os.close(fd)
+        result = dict(decision, path=video_file, output_bytes=decision['source_bytes'], saved_bytes=0)
+
+        started = time.perf_counter()
+        with tracing.span('transcode', action=decision['action'], bytes=decision['source_bytes']) as span:
+            try:
+                completed = subprocess.run(self._command(video_file, video_info, decision, output),
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+                if completed.returncode != 0:
+                    raise RuntimeError(completed.stderr.decode('utf-8', 'replace').strip()[-300:]
+                                       or f"ffmpeg exited with status {completed.returncode}")
+                output_bytes = os.path.getsize(output)
+            except (OSError, RuntimeError) as e:
+                print(f"⚠️ {decision['action'].capitalize()} failed, uploading the original: {e}")
+                span.set('error', str(e))
+                result.update(action='keep', error=str(e))
+                self.remove_output(dict(path=output))
+                return result
+            seconds = time.perf_counter() - started
+            result['seconds'] = round(seconds, 2)
+
+            if decision['action'] == 'encode' and output_bytes >= decision['source_bytes']:
+                # Already efficiently encoded despite the high nominal bitrate
+                result.update(action='keep', reason='re-encode was not smaller')
+                self.remove_output(dict(path=output))
+            else:
+                result.update(path=output, output_bytes=output_bytes,
+                              saved_bytes=decision['source_bytes'] - output_bytes)
+            span.set('saved_bytes', result['saved_bytes'])
+
+        if decision['action'] == 'encode':
+            width, height = video_info.get('resolution') or (0, 0)
+            pixels = width * height * (video_info.get('fps') or 30.0) * (video_info.get('duration') or 0)
+            self.stats.record('encode_pixels_per_second', pixels / seconds)
+        else:
+            self.stats.record('remux_bytes_per_second', decision['source_bytes'] / seconds)
+        return result
+
+    def remove_output(self, result):
+        """Delete a transcoded file once it has been uploaded (never the original)"""
+        path = result.get('path') if result else None
+        if path and os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.output_dir):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import cv2
+
+    parser = argparse.ArgumentParser(description="Show the pre-upload transcode decision for a video")
+    parser.add_argument("video_file")
+    parser.add_argument("--mode", choices=MODES, default='auto')
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.video_file)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    info = {
+        'fps': fps,
+        'duration': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) / fps,
+        'resolution': (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    }
+    cap.release()
+    print(json.dumps(plan(args.video_file, info, args.mode, TranscodeStats()), indent=2))
@@ -0,0 +1,179 @@
+"""
+Offline speech-to-text for the analysis prompt.
+
+Uses faster-whisper (CTranslate2, int8 on CPU) when it is installed. Transcripts
+are cached by file fingerprint and condensed into a bounded digest before they
+reach GrokAI. Run this file directly to benchmark throughput:
+
+    python transcriber.py my_video.mp4
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from fingerprint import file_fingerprint
+
+STOPWORDS = set("""
+a an and are as at be but by for from has have i if in into is it its just like me my
+of on or our so that the their them then there these they this to up was we were what
+when which who will with you your yeah okay oh um uh gonna really know think get got
+""".split())
+
+# Loaded Whisper models by (size, cpu_threads): the background worker process
+# lives across videos, so the model is loaded once rather than per video
+_models = {}
+
+
+def _load_model(model_size, cpu_threads):
+    from faster_whisper import WhisperModel
+
+    key = (model_size, cpu_threads)
+    if key not in _models:
+        _models[key] = WhisperModel(model_size, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+    return _models[key]
+
+
+class Transcriber:
+    def __init__(self, model_size=None, cache_dir=".transcript_cache", cpu_threads=2):
+        self.model_size = model_size or os.getenv('WHISPER_MODEL', 'base')
+        self.cache_dir = cache_dir
+        self.cpu_threads = cpu_threads
+        self._executor = None
+
+    @staticmethod
+    def is_available():
+        """True when the optional faster-whisper backend is installed"""
+        try:
+            import faster_whisper  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def _cache_path(self, fingerprint):
+        return os.path.join(self.cache_dir, f"{fingerprint}_{self.model_size}.json")
+
+    def transcribe(self, video_path):
+        """Transcribe a video's audio track, using the on-disk cache when possible"""
+        fingerprint = file_fingerprint(video_path)
+        cache_path = self._cache_path(fingerprint)
+
+        if os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                transcript = json.load(f)
+            transcript['cached'] = True
+            return transcript
+
+        model = _load_model(self.model_size, self.cpu_threads)
+        start = time.perf_counter()
+        segments, info = model.transcribe(video_path, vad_filter=True, beam_size=1)
+        segment_list = [
+            {'start': round(seg.start, 2), 'end': round(seg.end, 2), 'text': seg.text.strip()}
+            for seg in segments
+        ]
+        wall_seconds = time.perf_counter() - start
+
+        transcript = {
+            'language': info.language,
+            'audio_seconds': info.duration,
+            'wall_seconds': wall_seconds,
+            'realtime_factor': info.duration / wall_seconds if wall_seconds else 0.0,
+            'segments': segment_list,
+            'text': ' '.join(seg['text'] for seg in segment_list),
+            'cached': False
+        }
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(transcript, f, ensure_ascii=False)
+
+        return transcript
+
+    def start_background(self, video_path):
+        """Start transcription in a separate process; returns a Future (or None)"""
+        if not self.is_available():
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1)
+        return self._executor.submit(_transcribe_worker, video_path, self.model_size,
+                                     self.cache_dir, self.cpu_threads)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _transcribe_worker(video_path, model_size, cache_dir, cpu_threads):
+    """Process-pool entry point (must be module level to be picklable)"""
+    return Transcriber(model_size, cache_dir, cpu_threads).transcribe(video_path)
+
+
+def build_digest(transcript, max_words=250, max_keywords=12):
+    """Condense a transcript into a bounded digest for the LLM prompt.
+
+    Short transcripts are passed through; long ones become top keywords plus
+    evenly spaced timestamped excerpts, so the prompt cost stays flat no matter
+    how long the video is.
+    """
+    if not transcript or not transcript.get('text'):
+        return ""
+
+    words = transcript['text'].split()
+    if len(words) <= max_words:
+        return f"Transcript ({transcript.get('language', 'unknown')}): {transcript['text']}"
+
+    counts = Counter(
+        word for word in (re.sub(r"[^\w']", '', w.lower()) for w in words)
+        if len(word) > 2 and word not in STOPWORDS
+    )
+    keywords = ', '.join(word for word, _ in counts.most_common(max_keywords))
+
+    segments = transcript.get('segments', [])
+    excerpt_budget = max_words - max_keywords
+    excerpts = []
+    used = 0
+    if segments:
+        # Walk the transcript at an even stride until the word budget is spent
+        stride = max(1, len(segments) // max(1, excerpt_budget // 15))
+        for seg in segments[::stride]:
+            seg_words = seg['text'].split()
+            if used + len(seg_words) > excerpt_budget:
+                break
+            minutes, seconds = divmod(int(seg['start']), 60)
+            excerpts.append(f"[{minutes}:{seconds:02d}] {seg['text']}")
+            used += len(seg_words)
+
+    return (f"Transcript digest ({transcript.get('language', 'unknown')}, "
+            f"{len(words)} words spoken)\n"
+            f"Key terms: {keywords}\n"
+            f"Excerpts:\n" + '\n'.join(excerpts))
+
+
+def benchmark(video_path, model_size=None):
+    """Report transcription throughput in audio-seconds per wall-second"""
+    transcriber = Transcriber(model_size, cache_dir=os.path.join(".transcript_cache", "bench"))
+    cache_path = transcriber._cache_path(file_fingerprint(video_path))
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+
+    transcript = transcriber.transcribe(video_path)
+    print(f"🎙️ Model: {transcriber.model_size} (int8, CPU, {transcriber.cpu_threads} threads)")
+    print(f"   Audio: {transcript['audio_seconds']:.1f}s")
+    print(f"   Wall time: {transcript['wall_seconds']:.1f}s")
+    print(f"   Throughput: {transcript['realtime_factor']:.2f} audio-seconds per wall-second")
+    return transcript['realtime_factor']
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python transcriber.py <video_file> [model_size]")
+        sys.exit(1)
+    if not Transcriber.is_available():
+        print("❌ faster-whisper is not installed: pip install faster-whisper")
+        sys.exit(1)
+    benchmark(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
@@ -1,71 +1,50 @@
 import os
-import pickle
-import google_auth_oauthlib.flow
-import googleapiclient.discovery
-import googleapiclient.http
+from media_source import MmapMediaUpload
+from youtube_transport import build_youtube_service
+from credential_store import get_credential_store
+from quota_ledger import get_quota_ledger, is_quota_error, next_reset
 
-# Scopes (permissions) needed for YouTube upload
-SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
-
-def get_authenticated_service():
-    credentials = None
-
-    # Token stores user session so you don’t have to login every time
-    if os.path.exists("token.pickle"):
-        with open("token.pickle", "rb") as token:
-            credentials = pickle.load(token)
-
-    if not credentials:
-        flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(
-            "credentials.json", SCOPES
-        )
-        # Try different ports in case 8080 is busy
-        ports_to_try = [8080, 8081, 8082, 8083, 8084]
-        credentials = None
-        
-        for port in ports_to_try:
-            try:
-                print(f"🔐 Authenticating using port {port}...")
-                print("📝 Note: If you see 'Google hasn't verified this app' warning:")
-                print("   1. Click 'Advanced' (bottom left)")
-                print("   2. Click 'Go to [your project] (unsafe)'")
-                print("   3. This is normal for development/testing!")
-                credentials = flow.run_local_server(port=port)
-                break
-            except OSError as e:
-                if "10048" in str(e) or "Address already in use" in str(e):
-                    print(f"Port {port} is busy, trying next port...")
-                    continue
-                else:
-                    raise e
-        
-        if not credentials:
-            raise Exception("Could not authenticate - all ports are busy")
-
-        with open("token.pickle", "wb") as token:
-            pickle.dump(credentials, token)
-
-    return googleapiclient.discovery.build("youtube", "v3", credentials=credentials)
+def get_authenticated_service(channel_id=None, project=None):
+    credentials = get_credential_store(project).get_credentials(channel_id)
+    return build_youtube_service(credentials)
 
 def upload_video(file, title, description, category="22", privacy="public"):
-    youtube = get_authenticated_service()
-
-    request = youtube.videos().insert(
-        part="snippet,status",
-        body={
-            "snippet": {
-                "title": title,
-                "description": description,
-                "categoryId": category
+    # Never start an upload the API would reject for quota
+    ledger = get_quota_ledger()
+    project = ledger.reserve('videos.insert')
+    if project is None:
+        print(f"⏸️ Not enough YouTube API quota left today - try again after {next_reset():%Y-%m-%d %H:%M %Z}")
+        return
+
+    # Resumable, so the file is sent in memory-mapped chunks instead of read whole
+    media = MmapMediaUpload(file)
+    try:
+        youtube = get_authenticated_service(project=project)
+        request = youtube.videos().insert(
+            part="snippet,status",
+            body={
+                "snippet": {
+                    "title": title,
+                    "description": description,
+                    "categoryId": category
+                },
+                "status": {
+                    "privacyStatus": privacy
+                }
             },
-            "status": {
-                "privacyStatus": privacy
-            }
-        },
-        media_body=googleapiclient.http.MediaFileUpload(file)
-    )
-
-    response = request.execute()
+            media_body=media
+        )
+        response = request.execute()
+    except Exception as e:
+        if is_quota_error(e):
+            ledger.mark_exhausted(project)
+        else:
+            # No video was created, so the reserved units were not spent
+            ledger.refund('videos.insert', project=project)
+        raise
+    finally:
+        # Unmaps the file even when the upload fails
+        media.close()
     print("✅ Upload successful!")
     print("Video ID:", response["id"])
 
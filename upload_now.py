@@ -36,12 +36,12 @@ def main():
     print("="*60 + "\n")
     
     try:
-        uploader = AIYouTubeUploader()
-        result = uploader.upload_video_with_ai(
-            video_file=video_file,
-            custom_prompt=custom_prompt,
-            privacy=privacy
-        )
+        with AIYouTubeUploader() as uploader:
+            result = uploader.upload_video_with_ai(
+                video_file=video_file,
+                custom_prompt=custom_prompt,
+                privacy=privacy
+            )
         
         if result:
             print("\n" + "="*60)
@@ -20,48 +20,50 @@ def upload_with_retry(video_file, custom_prompt=None, privacy="unlisted", max_at
     print(f"🔒 Privacy: {privacy}")
     
     uploader = AIYouTubeUploader()
-    
-    for attempt in range(1, max_attempts + 1):
-        try:
-            print(f"\n🔄 Attempt {attempt}/{max_attempts}")
-            print("-" * 60)
+    try:
+        for attempt in range(1, max_attempts + 1):
+            try:
+                print(f"\n🔄 Attempt {attempt}/{max_attempts}")
+                print("-" * 60)
             
-            result = uploader.upload_video_with_ai(
-                video_file=video_file,
-                custom_prompt=custom_prompt,
-                privacy=privacy
-            )
+                result = uploader.upload_video_with_ai(
+                    video_file=video_file,
+                    custom_prompt=custom_prompt,
+                    privacy=privacy
+                )
             
-            if result:
-                print("\n" + "="*60)
-                print("✅ SUCCESS! VIDEO UPLOADED!")
-                print("="*60)
-                print(f"🎬 Video ID: {result['video_id']}")
-                print(f"🔗 Watch: {result['video_url']}")
-                print(f"📹 Title: {result['ai_content']['title']}")
-                print(f"🏷️ Tags: {', '.join(result['ai_content']['tags'][:5])}...")
-                return True
-            else:
+                if result:
+                    print("\n" + "="*60)
+                    print("✅ SUCCESS! VIDEO UPLOADED!")
+                    print("="*60)
+                    print(f"🎬 Video ID: {result['video_id']}")
+                    print(f"🔗 Watch: {result['video_url']}")
+                    print(f"📹 Title: {result['ai_content']['title']}")
+                    print(f"🏷️ Tags: {', '.join(result['ai_content']['tags'][:5])}...")
+                    return True
+                else:
+                    if attempt < max_attempts:
+                        wait_time = attempt * 10
+                        print(f"\n⚠️ Upload failed, retrying in {wait_time} seconds...")
+                        time.sleep(wait_time)
+                        continue
+                    else:
+                        print(f"\n❌ Upload failed after {max_attempts} attempts")
+                        return False
+                    
+            except Exception as e:
+                print(f"❌ Error: {e}")
                 if attempt < max_attempts:
                     wait_time = attempt * 10
-                    print(f"\n⚠️ Upload failed, retrying in {wait_time} seconds...")
+                    print(f"⚠️ Retrying in {wait_time} seconds...")
                     time.sleep(wait_time)
-                    continue
                 else:
-                    print(f"\n❌ Upload failed after {max_attempts} attempts")
+                    print(f"❌ Upload failed after {max_attempts} attempts")
                     return False
-                    
-        except Exception as e:
-            print(f"❌ Error: {e}")
-            if attempt < max_attempts:
-                wait_time = attempt * 10
-                print(f"⚠️ Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-            else:
-                print(f"❌ Upload failed after {max_attempts} attempts")
-                return False
     
-    return False
+        return False
+    finally:
+        uploader.close()
 
 
 def main():
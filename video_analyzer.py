@@ -1,6 +1,5 @@
 import cv2
 import os
-from moviepy.editor import VideoFileClip
 import numpy as np
 from PIL import Image
 import json
@@ -13,6 +12,9 @@ class VideoAnalyzer:
     def analyze_video(self):
         """Analyze video and extract key information"""
         try:
+            # moviepy is slow to import, so only load it when a video is analyzed
+            from moviepy.editor import VideoFileClip
+            
             # Get basic video info using moviepy
             with VideoFileClip(self.video_path) as clip:
                 self.video_info = {
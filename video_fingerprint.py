@@ -0,0 +1,370 @@
+"""
+Perceptual video fingerprints for near-duplicate detection.
+
+A fingerprint is the video's duration plus a 64-bit pHash (DCT of a 32x32
+grayscale thumbnail) of frames at fixed relative positions, so re-exports,
+re-encodes and resizes of the same video land within a few bits of each
+other while unrelated videos differ by about half of all bits. The hashes
+are taken from frames the analysis already decodes (see SceneDetector's
+frame_hook), so fingerprinting adds no extra decode pass.
+
+Fingerprints of uploaded videos are kept in the report store; DuplicateIndex
+loads them into a multi-index hash (MultiIndex), so a lookup only compares
+against the few fingerprints that share enough near-identical 16-bit chunks
+with the query instead of scanning the whole history.
+
+    python video_fingerprint.py video.mp4        # similar videos already uploaded
+    python video_fingerprint.py --backfill       # fingerprint history entries whose file still exists
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+
+SAMPLES = 16
+# Average differing bits per frame hash (of 64) still treated as the same video
+DEFAULT_MAX_BITS_PER_FRAME = 10
+
+
+CHUNK_BITS = 16
+
+
+class FingerprintError(Exception):
+    """A video could not be read for fingerprinting"""
+
+
+def _chunks(fingerprint):
+    """The fingerprint's bits as CHUNK_BITS-wide integers (4 per frame hash)"""
+    mask = (1 << CHUNK_BITS) - 1
+    return [(value >> shift) & mask for value in fingerprint.hashes for shift in range(0, 64, CHUNK_BITS)]
+
+
+def frame_phash(frame):
+    """64-bit perceptual hash of a BGR (or grayscale) frame"""
+    import cv2
+    import numpy as np
+
+    small = cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    low = cv2.dct(np.float32(small))[:8, :8]
+    bits = (low > np.median(low)).flatten()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+class VideoFingerprint:
+    """Duration plus frame hashes at SAMPLES evenly spaced positions"""
+
+    __slots__ = ('duration', 'hashes')
+
+    def __init__(self, duration, hashes):
+        self.duration = float(duration)
+        self.hashes = tuple(hashes)
+
+    def distance(self, other):
+        """Total differing bits over the aligned frame hashes"""
+        return sum((a ^ b).bit_count() for a, b in zip(self.hashes, other.hashes))
+
+    def to_hex(self):
+        return ''.join(f"{value:016x}" for value in self.hashes)
+
+    @classmethod
+    def from_hex(cls, text, duration):
+        return cls(duration, (int(text[i:i + 16], 16) for i in range(0, len(text), 16)))
+
+    def to_dict(self):
+        return {'duration': round(self.duration, 3), 'hashes': self.to_hex()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls.from_hex(data['hashes'], data['duration'])
+
+
+class FingerprintSampler:
+    """Collects frame hashes from a sequential decode pass (pass .offer as a frame hook)"""
+
+    def __init__(self, duration, samples=SAMPLES):
+        self.duration = duration
+        # Centers of `samples` equal slices, so trimmed black frames at the ends don't matter
+        self.targets = [(i + 0.5) * duration / samples for i in range(samples)]
+        self.hashes = []
+        self.seconds = 0.0
+        self._last_frame = None
+
+    def offer(self, frame, timestamp):
+        self._last_frame = frame
+        if len(self.hashes) < len(self.targets) and timestamp >= self.targets[len(self.hashes)]:
+            started = time.perf_counter()
+            self.hashes.append(frame_phash(frame))
+            self.seconds += time.perf_counter() - started
+
+    def fingerprint(self):
+        """The fingerprint, or None if no frame was seen"""
+        if self._last_frame is None:
+            return None
+        if len(self.hashes) < len(self.targets):
+            # The stream ended early (the container overstated the duration)
+            last = frame_phash(self._last_frame)
+            self.hashes.extend([last] * (len(self.targets) - len(self.hashes)))
+        return VideoFingerprint(self.duration, self.hashes)
+
+
+def compute_fingerprint(video_path, samples=SAMPLES, stride=5):
+    """Fingerprint a video by seeking to each sample position (for files outside the analysis).
+
+    Seeks land on the frames the analysis pass would hash: it only sees every
+    stride-th frame (SimpleVideoAnalyzer's scene_stride), and neighbouring
+    frames of fast-moving video can be many bits apart.
+    """
+    import math
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FingerprintError(f"Could not open video file {video_path}")
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        sampler = FingerprintSampler(frame_count / fps, samples)
+        for target in sampler.targets:
+            index = min(frame_count - 1, math.ceil(target * fps / stride - 1e-9) * stride)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = cap.read()
+            if ret:
+                sampler.offer(frame, index / fps)
+        return sampler.fingerprint()
+    finally:
+        cap.release()
+
+
+class FingerprintGrid:
+    """Hashes of every stride-th frame of a video whose final length isn't known yet.
+
+    The sample positions depend on the duration, so a growing recording keeps
+    the hash of every frame FingerprintSampler could pick. Past max_hashes the
+    grid is thinned to every other entry; fingerprint() then seeks to the
+    sample frames that were dropped (at most SAMPLES of them).
+    """
+
+    def __init__(self, stride=5, max_hashes=4096, data=None):
+        data = data or {}
+        self.stride = data.get('stride', stride)
+        self.step = data.get('step', 1)  # grid entries are every (stride * step)-th frame
+        self.max_hashes = max_hashes
+        self.hashes = [int(value, 16) if value else None for value in data.get('hashes', [])]
+
+    def offer(self, frame_index, frame):
+        """Pass every decoded frame's index (frame may be None if it wasn't retrieved)"""
+        spacing = self.stride * self.step
+        if frame_index % spacing or frame_index // spacing != len(self.hashes):
+            return
+        self.hashes.append(frame_phash(frame) if frame is not None else None)
+        if len(self.hashes) > self.max_hashes:
+            self.hashes = self.hashes[::2]
+            self.step *= 2
+
+    def fingerprint(self, frame_count, fps, read_frame, samples=SAMPLES):
+        """The fingerprint FingerprintSampler would give for the whole video, or None.
+
+        read_frame(index) returns the BGR frame at an index or None; it is only
+        called for sample frames no longer on the grid.
+        """
+        if not frame_count or not self.hashes:
+            return None
+        import math
+
+        spacing = self.stride * self.step
+        last = (frame_count - 1) // self.stride * self.stride  # the last frame the analysis would see
+        duration = frame_count / fps
+        hashes = []
+        for i in range(samples):
+            target = (i + 0.5) * duration / samples
+            index = min(last, math.ceil(target * fps / self.stride - 1e-9) * self.stride)
+            position = index // spacing
+            value = self.hashes[position] if index % spacing == 0 and position < len(self.hashes) else None
+            if value is None:
+                frame = read_frame(index)
+                value = frame_phash(frame) if frame is not None else (hashes[-1] if hashes else None)
+            if value is None:
+                return None
+            hashes.append(value)
+        return VideoFingerprint(duration, hashes)
+
+    def to_dict(self):
+        return {'stride': self.stride, 'step': self.step,
+                'hashes': [f"{value:016x}" if value is not None else '' for value in self.hashes]}
+
+
+class MultiIndex:
+    """Multi-index hashing over fingerprint chunks for radius searches in Hamming space.
+
+    Every fingerprint is split into m chunks of CHUNK_BITS bits, each with
+    its own hash table. If two fingerprints are within r bits, at most
+    r // (t + 1) chunks can differ by more than t bits (pigeonhole), so at
+    least m - r // (t + 1) chunks are within t bits. A search probes every
+    chunk's buckets within the smallest t for which that bound is positive
+    and only compares fingerprints that reached enough of them.
+    """
+
+    def __init__(self):
+        self.tables = []
+        self.entries = []
+        self.compared = 0  # full distance computations in the last search
+
+    def add(self, fingerprint, value):
+        chunks = _chunks(fingerprint)
+        if not self.tables:
+            self.tables = [{} for _ in chunks]
+        entry = len(self.entries)
+        self.entries.append((fingerprint, value))
+        for table, chunk in zip(self.tables, chunks):
+            table.setdefault(chunk, []).append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def probe_plan(chunk_count, radius):
+        """(per-chunk radius t, chunks within t every match must have)"""
+        t = 0
+        while chunk_count - radius // (t + 1) < 1:
+            t += 1
+        return t, chunk_count - radius // (t + 1)
+
+    def search(self, fingerprint, radius):
+        """[(distance, value)] for every fingerprint within radius, closest first"""
+        self.compared = 0
+        chunks = _chunks(fingerprint)
+        if not self.entries or len(chunks) != len(self.tables):
+            return []
+        t, required = self.probe_plan(len(chunks), radius)
+        hits = Counter()
+        masks = _neighbour_masks(t)
+        for table, chunk in zip(self.tables, chunks):
+            for mask in masks:
+                bucket = table.get(chunk ^ mask)
+                if bucket:
+                    hits.update(bucket)
+
+        found = []
+        for entry, count in hits.items():
+            if count >= required:
+                other, value = self.entries[entry]
+                self.compared += 1
+                d = fingerprint.distance(other)
+                if d <= radius:
+                    found.append((d, value))
+        return sorted(found, key=lambda match: match[0])
+
+
+_masks_cache = {}
+
+
+def _neighbour_masks(t):
+    """Every CHUNK_BITS-bit XOR mask with at most t bits set"""
+    if t not in _masks_cache:
+        masks = [0]
+        for bits in range(1, t + 1):
+            for positions in itertools.combinations(range(CHUNK_BITS), bits):
+                masks.append(sum(1 << position for position in positions))
+        _masks_cache[t] = masks
+    return _masks_cache[t]
+
+
+class DuplicateIndex:
+    """Near-duplicate lookup over every fingerprint in the upload history"""
+
+    def __init__(self, store=None, max_bits_per_frame=None):
+        if store is None:
+            from report_store import get_report_store
+            store = get_report_store()
+        self.store = store
+        self.max_bits_per_frame = max_bits_per_frame if max_bits_per_frame is not None else \
+            float(os.getenv('NEAR_DUPLICATE_BITS', str(DEFAULT_MAX_BITS_PER_FRAME)))
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._index is None:
+            # ~1 KB per upload: 64 chunk entries and the fingerprint itself
+            index = MultiIndex()
+            for video_id, fingerprint in self.store.fingerprints():
+                index.add(fingerprint, (video_id, fingerprint.duration))
+            self._index = index
+        return self._index
+
+    def add(self, video_id, fingerprint):
+        """Register a new upload (the report store keeps the persistent copy)"""
+        with self._lock:
+            if self._index is not None:
+                self._index.add(fingerprint, (video_id, fingerprint.duration))
+
+    def find_similar(self, fingerprint, max_bits_per_frame=None):
+        """[(video_id, average differing bits per frame)] for earlier uploads that look the same"""
+        per_frame = max_bits_per_frame if max_bits_per_frame is not None else self.max_bits_per_frame
+        radius = int(per_frame * len(fingerprint.hashes))
+        with self._lock:
+            matches = self._load().search(fingerprint, radius)
+        return [(video_id, round(distance / len(fingerprint.hashes), 1))
+                for distance, (video_id, duration) in matches
+                if _durations_match(fingerprint.duration, duration)]
+
+    def same_video(self, fingerprint, other, max_bits_per_frame=None):
+        """True if two fingerprints match by find_similar's rules (e.g. two files not uploaded yet)"""
+        per_frame = max_bits_per_frame if max_bits_per_frame is not None else self.max_bits_per_frame
+        return (fingerprint.distance(other) <= int(per_frame * len(fingerprint.hashes)) and
+                _durations_match(fingerprint.duration, other.duration))
+
+
+def _durations_match(duration, other):
+    # Cut-downs and extended versions share frames but not positions; require similar length
+    return abs(duration - other) <= max(1.0, duration * 0.02)
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+def get_duplicate_index():
+    """Process-wide index (built from the report store on first lookup)"""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = DuplicateIndex()
+        return _shared_index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Find uploaded videos that look like a file")
+    parser.add_argument("video_file", nargs="?")
+    parser.add_argument("--bits", type=float, help="max differing bits per frame hash (default 10)")
+    parser.add_argument("--backfill", action="store_true",
+                        help="fingerprint stored uploads whose video file still exists")
+    args = parser.parse_args()
+
+    index = get_duplicate_index()
+    if args.backfill:
+        added = 0
+        for video_id, video_file in index.store.missing_fingerprints():
+            if video_file and os.path.exists(video_file):
+                try:
+                    index.store.set_fingerprint(video_id, compute_fingerprint(video_file))
+                    added += 1
+                except FingerprintError as e:
+                    print(f"⚠️ Skipping {video_id}: {e}")
+        print(f"✅ Fingerprinted {added} earlier upload(s)")
+    elif args.video_file:
+        started = time.perf_counter()
+        fingerprint = compute_fingerprint(args.video_file)
+        matches = index.find_similar(fingerprint, args.bits)
+        elapsed = (time.perf_counter() - started) * 1000
+        if not matches:
+            print(f"✅ No similar uploads ({elapsed:.0f} ms)")
+        for video_id, bits in matches:
+            print(f"⚠️ Looks like https://youtube.com/watch?v={video_id} ({bits} bits/frame apart)")
+    else:
+        parser.print_help()
@@ -0,0 +1,199 @@
+"""
+Shared HTTP transport for YouTube Data API calls.
+
+googleapiclient's default httplib2 transport opens its own connections per
+client and is not thread-safe. This module adapts a pooled, keep-alive
+google-auth AuthorizedSession (requests/urllib3) to the httplib2 interface
+googleapiclient expects, so every uploader, thread and MediaFileUpload in
+the process shares one connection pool. The client is built from a
+vendored discovery document (trimmed to the resources we call), so building
+it needs no network round trip and parses little JSON.
+
+Regenerate the vendored document with:
+    python youtube_transport.py --vendor-discovery
+"""
+
+import json
+import os
+import threading
+
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest"
+DISCOVERY_CACHE = os.path.join(".cache", "youtube_discovery_v3.json")
+VENDORED_DISCOVERY = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "discovery", "youtube_v3.json")
+VENDORED_RESOURCES = ("videos", "thumbnails", "channels")
+
+_transports = {}
+_services = {}
+_lock = threading.Lock()
+_adapter_override = None
+
+
+def _credentials_key(credentials):
+    # Separately loaded copies of the same account's token share one pool
+    return getattr(credentials, 'refresh_token', None) or id(credentials)
+
+
+class PooledHttp:
+    """httplib2.Http-compatible adapter around a pooled requests session"""
+
+    def __init__(self, session, timeout=None):
+        self.session = session
+        self.timeout = timeout
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5,
+                connection_type=None):
+        import httplib2
+
+        from bandwidth import get_upload_shaper
+
+        # Upload bodies are paced by the shared bandwidth limiter when a job is active
+        body = get_upload_shaper().wrap_body(body)
+
+        # Redirects are never followed: resumable uploads use 308 to report progress
+        response = self.session.request(method, uri, data=body, headers=headers,
+                                        timeout=self.timeout, allow_redirects=False)
+        info = {key.lower(): value for key, value in response.headers.items()}
+        info['status'] = str(response.status_code)
+        resp = httplib2.Response(info)
+        resp.reason = response.reason
+        return resp, response.content
+
+    def close(self):
+        # The session is shared between services; it is closed with the process
+        pass
+
+
+def use_transport_adapter(adapter):
+    """Send all YouTube API traffic through `adapter` (a requests transport adapter such as
+    fake_youtube.FakeYouTube) instead of the network; None restores the real API"""
+    global _adapter_override
+    with _lock:
+        _adapter_override = adapter
+        _transports.clear()
+        _services.clear()
+
+
+def transport_adapter():
+    """The adapter installed with use_transport_adapter(), if any"""
+    return _adapter_override
+
+
+def get_shared_transport(credentials, pool_size=None, timeout=None):
+    """Return the process-wide pooled transport for these credentials"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    pool_size = pool_size or int(os.getenv('YOUTUBE_HTTP_POOL_SIZE', '10'))
+    timeout = timeout or float(os.getenv('YOUTUBE_HTTP_TIMEOUT', '120'))
+
+    with _lock:
+        key = _credentials_key(credentials)
+        if key not in _transports:
+            if credentials is None:
+                # Only an installed adapter (an offline fake) is reachable without a token
+                session = requests.Session()
+            else:
+                from google.auth.transport.requests import AuthorizedSession
+                session = AuthorizedSession(credentials)
+            adapter = _adapter_override or HTTPAdapter(pool_connections=2, pool_maxsize=pool_size,
+                                                       max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers['Connection'] = 'keep-alive'
+            _transports[key] = PooledHttp(session, timeout=timeout)
+        return _transports[key]
+
+
+def load_discovery_document(cache_path=DISCOVERY_CACHE):
+    """Discovery document from the vendored copy, the disk cache, the library's bundled copy, or the network"""
+    for path in (VENDORED_DISCOVERY, cache_path):
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+
+    document = _fetch_discovery_document()
+
+    # Validate before caching so a bad download isn't reused
+    json.loads(document)
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        f.write(document)
+    return document
+
+
+def _fetch_discovery_document():
+    document = None
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+        document = get_static_doc('youtube', 'v3')
+    except ImportError:
+        pass
+
+    if not document:
+        import requests
+        response = requests.get(DISCOVERY_URL, timeout=30)
+        response.raise_for_status()
+        document = response.text
+    return document
+
+
+def trim_discovery_document(document, resources=VENDORED_RESOURCES):
+    """Keep only the given resources and the schemas their methods reference"""
+    document = json.loads(document) if isinstance(document, str) else document
+    kept = {name: document['resources'][name] for name in resources}
+
+    schemas = document.get('schemas', {})
+    needed = set()
+    pending = [kept]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            ref = node.get('$ref')
+            if ref and ref not in needed and ref in schemas:
+                needed.add(ref)
+                pending.append(schemas[ref])
+            pending.extend(node.values())
+        elif isinstance(node, list):
+            pending.extend(node)
+
+    trimmed = dict(document)
+    trimmed['resources'] = kept
+    trimmed['schemas'] = {name: schemas[name] for name in sorted(needed)}
+    return trimmed
+
+
+def vendor_discovery_document(path=VENDORED_DISCOVERY):
+    """Fetch the current document and write the trimmed copy shipped with the repo"""
+    trimmed = trim_discovery_document(_fetch_discovery_document())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trimmed, f, separators=(',', ':'), sort_keys=True)
+    print(f"💾 Vendored discovery document ({trimmed['revision']}, "
+          f"{len(trimmed['schemas'])} schemas) saved to {path}")
+
+
+def build_youtube_service(credentials):
+    """Build (once per credentials) a YouTube v3 client on the shared transport"""
+    import googleapiclient.discovery
+
+    key = _credentials_key(credentials)
+    with _lock:
+        service = _services.get(key)
+    if service is not None:
+        return service
+
+    http = get_shared_transport(credentials)
+    service = googleapiclient.discovery.build_from_document(load_discovery_document(), http=http)
+
+    with _lock:
+        return _services.setdefault(key, service)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if '--vendor-discovery' in sys.argv:
+        vendor_discovery_document()
+    else:
+        print("Usage: python youtube_transport.py --vendor-discovery")